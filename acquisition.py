@@ -1,24 +1,32 @@
 import subprocess
 import hashlib
 import os
+from task_scheduler import TaskCancelled, check_cancelled, report_progress
+from instrumentation import stage, add_throughput
 
 # --- Configuration & Constants ---
 HASH_ALGORITHM = 'sha256'
 BLOCK_SIZE = 65536  # 64KB read/write buffer size for hashing and imaging (good performance balance)
+PROGRESS_INTERVAL = 64 * 1024 * 1024  # Bytes hashed between cancellation checks
 
 # --- Hash Calculation Function ---
 def calculate_hash_from_file(file_path, algorithm='sha256'):
     """Calculates the hash of a file or device in chunks for large data."""
     hash_obj = hashlib.new(algorithm)
     try:
-        # Open in binary read mode 'rb'
-        with open(file_path, 'rb') as f:
+        # Open in binary read mode 'rb'; the stage streams live MB/s to the job's progress listener
+        with open(file_path, 'rb') as f, stage(f"hash {os.path.basename(file_path)}", os.path.getsize(file_path) or None):
+            hashed = 0
             while True:
                 # Read data in fixed chunks
                 data = f.read(BLOCK_SIZE)
                 if not data:
                     break
                 hash_obj.update(data)
+                hashed += len(data)
+                add_throughput(bytes_read=len(data))
+                if hashed % PROGRESS_INTERVAL == 0:
+                    check_cancelled()
         return hash_obj.hexdigest()
     except Exception as e:
         # Crucial for error logging in a forensic tool
@@ -55,9 +63,15 @@ def perform_forensic_imaging(source_device, output_path, log_path):
         # 1. LIVE PROGRESS MONITORING (for future PySide GUI integration)
         # We read the output to get the real-time status.
         for line in process.stderr:
+            try:
+                check_cancelled()
+            except TaskCancelled:
+                process.kill()
+                process.wait()
+                raise
             if 'copied' in line or 'STATUS:' in line:
-                # In a full GUI, this line would update a QProgressBar
                 print(f"STATUS: {line.strip()}") 
+                report_progress(line.strip())
         
         # Wait for the command to finish
         process.wait()
@@ -67,6 +81,7 @@ def perform_forensic_imaging(source_device, output_path, log_path):
             print(f"Imaging FAILED with error: {error_output}")
             return False, None
             
+        add_throughput(bytes_read=os.path.getsize(output_path))
         print("\n--- Imaging Complete. Verification Check... ---")
         return True, log_path
 
@@ -1,30 +1,34 @@
-import pytsk3
 import os
 import sys
+import json
 import hashlib
 import subprocess 
-from regipy.registry import RegistryHive
-from regipy.plugins.utils import run_relevant_plugins
-from regipy.plugins.system.shimcache import ShimCachePlugin 
-
-# --- REPORTLAB IMPORTS (NEW for Phase 4) ---
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 from datetime import datetime
-import pandas as pd # Although pandas is imported, it's not strictly used in the current report logic
-
-# Define constants for file types (TSK standard)
-TSK_FS_TYPE_ENUM = {
-    pytsk3.TSK_FS_META_TYPE_UNDEF: "Unknown",
-    pytsk3.TSK_FS_META_TYPE_REG: "File", 
-    pytsk3.TSK_FS_META_TYPE_DIR: "Directory",
-    pytsk3.TSK_FS_META_TYPE_LNK: "Link",
-    pytsk3.TSK_FS_META_TYPE_FIFO: "Pipe",
-    pytsk3.TSK_FS_META_TYPE_CHR: "Character Device",
-    pytsk3.TSK_FS_META_TYPE_BLK: "Block Device"
-}
+from xml.sax.saxutils import escape
+from task_scheduler import check_cancelled, report_progress
+from instrumentation import add_throughput
+from case_store import emit_artifacts, record_outputs, recording
+
+# NOTE: pytsk3, regipy and reportlab are imported inside the functions that use them,
+# so carving or memory analysis still work (and the GUI starts quickly) without them.
+
+_TSK_FS_TYPE_NAMES = None
+
+def tsk_fs_type_names():
+    """Maps TSK meta types to display names (built on first use, when pytsk3 is loaded)."""
+    global _TSK_FS_TYPE_NAMES
+    if _TSK_FS_TYPE_NAMES is None:
+        import pytsk3
+        _TSK_FS_TYPE_NAMES = {
+            pytsk3.TSK_FS_META_TYPE_UNDEF: "Unknown",
+            pytsk3.TSK_FS_META_TYPE_REG: "File", 
+            pytsk3.TSK_FS_META_TYPE_DIR: "Directory",
+            pytsk3.TSK_FS_META_TYPE_LNK: "Link",
+            pytsk3.TSK_FS_META_TYPE_FIFO: "Pipe",
+            pytsk3.TSK_FS_META_TYPE_CHR: "Character Device",
+            pytsk3.TSK_FS_META_TYPE_BLK: "Block Device"
+        }
+    return _TSK_FS_TYPE_NAMES
 
 # --- File Signatures ---
 FILE_SIGNATURES = {
@@ -46,14 +50,19 @@ FILE_SIGNATURES = {
 }
 
 # --- File System Traversal Function ---
-def traverse_directory(directory, fs, depth):
+def traverse_directory(directory, fs, depth, parent_path=""):
     """Recursively traverses directories to list files and folders."""
+    import pytsk3
     
     indent = "  " * depth
+    type_names = tsk_fs_type_names()
+    entries = [] if recording() else None
     
     for entry in directory:
+        check_cancelled()
         if entry.info.name.name in [b".", b".."]:
             continue
+        add_throughput(items=1)
 
         try:
             file_name = entry.info.name.name.decode('utf-8')
@@ -62,7 +71,7 @@ def traverse_directory(directory, fs, depth):
         
         if entry.info.meta:
             meta_type = entry.info.meta.type
-            file_type = TSK_FS_TYPE_ENUM.get(meta_type, "Unknown")
+            file_type = type_names.get(meta_type, "Unknown")
             
             inode = entry.info.meta.addr
             size = entry.info.meta.size
@@ -70,17 +79,28 @@ def traverse_directory(directory, fs, depth):
             
             print(f"{indent}|-- [{file_type:<10}] {file_name:<40} (i-node: {inode} | Size: {size} bytes | MTime: {m_time})")
 
+            if entries is not None:
+                entries.append({
+                    "path": f"{parent_path}/{file_name}", "type": file_type, "inode": inode, "size": size,
+                    "mtime": m_time, "atime": entry.info.meta.atime, "ctime": entry.info.meta.ctime,
+                    "crtime": entry.info.meta.crtime,
+                })
+
             if meta_type == pytsk3.TSK_FS_META_TYPE_DIR:
                 try:
                     subdir = fs.open_dir(inode=inode)
-                    traverse_directory(subdir, fs, depth + 1)
+                    traverse_directory(subdir, fs, depth + 1, f"{parent_path}/{file_name}")
                 except Exception as e:
                     print(f"{indent}|-- ERROR: Cannot open subdirectory for i-node {inode}: {e}")
 
+    if entries:
+        emit_artifacts("fs_entry", entries, time_field="mtime")
+
 # --- File System Analysis Function ---
 def analyze_disk_image(image_path):
     """Opens a disk image and attempts to open the file system directly (no partition table)."""
     print(f"\n[+] Starting File System Analysis on: {image_path}")
+    import pytsk3
     
     try:
         img = pytsk3.Img_Info(image_path)
@@ -110,10 +130,12 @@ def perform_file_carving(image_path, output_directory, signatures=FILE_SIGNATURE
         os.makedirs(output_directory)
         
     carved_count = 0
+    carved_files = []
 
     try:
         with open(image_path, 'rb') as f:
             buffer = f.read()
+            add_throughput(bytes_read=len(buffer))
 
             for file_type, sigs in signatures.items():
                 header = sigs['header']
@@ -121,9 +143,11 @@ def perform_file_carving(image_path, output_directory, signatures=FILE_SIGNATURE
                 ext = sigs['ext']
                 
                 print(f"  Searching for {file_type} (.{ext}) header: {header.hex()}...")
+                report_progress(f"Carving {file_type} files ({carved_count} recovered so far)")
                 
                 offset = 0
                 while True:
+                    check_cancelled()
                     header_pos = buffer.find(header, offset)
                     if header_pos == -1:
                         break # No more headers found
@@ -138,13 +162,17 @@ def perform_file_carving(image_path, output_directory, signatures=FILE_SIGNATURE
                             out_f.write(carved_data)
                             
                         print(f"    - Carved {file_type} file of size {len(carved_data)} bytes at offset {header_pos}")
+                        carved_files.append({"type": file_type, "offset": header_pos, "size": len(carved_data), "path": output_filename})
                         carved_count += 1
+                        add_throughput(items=1)
                         
                         offset = footer_pos + len(footer)
                     else:
                         offset = header_pos + len(header)
 
             print(f"\n[+] Carving Complete. Total files recovered: {carved_count}")
+            emit_artifacts("carved_file", carved_files)
+            record_outputs([carved["path"] for carved in carved_files])
             # NOTE: Returning carved_count for the report generator (NEW)
             return carved_count
 
@@ -162,6 +190,9 @@ def analyze_registry_hive(hive_path, registry_name):
         return "ERROR: Hive file not found."
 
     try:
+        from regipy.registry import RegistryHive
+        from regipy.plugins.system.shimcache import ShimCachePlugin
+
         registry_hive = RegistryHive(hive_path)
         print("--- EXTRACTING PROGRAM EXECUTION ARTIFACTS (Shimcache/P2) ---")
         shimcache_plugin = ShimCachePlugin(registry_hive, as_json=True)
@@ -169,6 +200,7 @@ def analyze_registry_hive(hive_path, registry_name):
         results = shimcache_plugin.entries
         
         summary = f"Found {len(results)} Shimcache entries." if results else "No Shimcache entries extracted."
+        emit_artifacts("shimcache", results or [], time_field="last_mod_date")
 
         if results:
             print(f"Found {len(results)} Shimcache entries (recently executed programs):")
@@ -184,6 +216,15 @@ def analyze_registry_hive(hive_path, registry_name):
         return f"ERROR: Registry Analysis failed: {e}"
 
 
+def parse_volatility_table(output):
+    """Turns Volatility3's tab-separated text renderer output into one dict per row."""
+    lines = output.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("PID\t"):
+            columns = line.split("\t")
+            return [dict(zip(columns, row.split("\t"))) for row in lines[i + 1:] if row.strip()]
+    return []
+
 # --- New Memory Analysis Function (P2 Features) ---
 def analyze_memory_dump(memory_dump_path):
     """
@@ -203,6 +244,7 @@ def analyze_memory_dump(memory_dump_path):
         process_result = subprocess.run(process_list_command, 
                                         capture_output=True, text=True, check=True)
         print(process_result.stdout)
+        emit_artifacts("memory_process", parse_volatility_table(process_result.stdout), time_field="CreateTime")
         summary = f"Process listing successful. Found {process_result.stdout.count('Offset') - 1} processes."
         return summary
     except Exception as e:
@@ -216,6 +258,11 @@ def generate_forensic_report(case_name, report_data):
     Generates a formal, multi-section forensic report in PDF format.
     report_data is a dictionary containing structured data from analysis.
     """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib import colors
+
     report_filename = f"{case_name}_Forensic_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     doc = SimpleDocTemplate(report_filename, pagesize=letter)
     styles = getSampleStyleSheet()
@@ -261,8 +308,63 @@ def generate_forensic_report(case_name, report_data):
     # Add Memory Analysis Summary
     mem_summary = report_data.get('MemorySummary', 'No Memory Analysis performed.')
     Story.append(Paragraph(f"<b>Memory (RAM) Analysis:</b> {mem_summary}", styles['Normal']))
+
+    # Further module summaries, listed only when those modules ran (headless case runs pass them)
+    for key, label in (('NetworkSummary', 'Network (PCAP) Analysis'), ('ProtocolSummary', 'Protocol Artifacts (DNS/HTTP/TLS SNI)'),
+                       ('AndroidSummary', 'Android App Data'), ('RecoverySummary', 'Deleted SQLite Records'),
+                       ('PluginSummary', 'Plugins')):
+        if report_data.get(key):
+            Story.append(Paragraph(f"<b>{label}:</b> {escape(str(report_data[key]))}", styles['Normal']))
     
-    # --- 3. Build the PDF ---
+    # --- 3. Artifact Inventory (from the case store, when the analysis was recorded) ---
+    store_path = report_data.get('CaseStorePath')
+    stage_metrics = []
+    if store_path and os.path.exists(store_path):
+        from case_store import CaseStore
+        store = CaseStore(store_path, reader=True)
+        try:
+            counts = store.artifact_counts()
+            runs = store.runs()
+            stage_metrics = store.stage_metrics()
+        finally:
+            store.close()
+        table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        Story.append(Spacer(1, 0.2 * 72))
+        Story.append(Paragraph("<u>Artifact Inventory</u>", styles['h2']))
+        inventory_table = Table([['Artifact Type', 'Records']] + [[kind, str(count)] for kind, count in counts.items()])
+        inventory_table.setStyle(table_style)
+        Story.append(inventory_table)
+        Story.append(Paragraph("<b>Analysis Runs:</b>", styles['h3']))
+        run_rows = [['Module', 'Evidence', 'Status', 'Finished']]
+        for _, module, evidence, status, _, _, finished in runs:
+            finished_text = datetime.fromtimestamp(finished).strftime('%Y-%m-%d %H:%M:%S') if finished else 'N/A'
+            run_rows.append([module, ", ".join(os.path.basename(path) for path in json.loads(evidence)), status, finished_text])
+        runs_table = Table(run_rows)
+        runs_table.setStyle(table_style)
+        Story.append(runs_table)
+
+    # --- 4. Performance Appendix (stage metrics saved with the case) ---
+    if stage_metrics:
+        def number(value, digits):
+            return f"{value:.{digits}f}" if value is not None else 'N/A'
+
+        Story.append(Spacer(1, 0.2 * 72))
+        Story.append(Paragraph("<u>Appendix: Performance</u>", styles['h2']))
+        perf_rows = [['Module', 'Stage', 'Wall (s)', 'CPU (s)', 'MB', 'MB/s', 'Items/s', 'Peak RSS (MB)']]
+        for module, m in stage_metrics:
+            perf_rows.append([module, m['stage'], number(m['wall_s'], 2), number(m['cpu_s'], 2),
+                              number(m['bytes'] / (1024 * 1024), 1), number(m['mb_per_s'], 1),
+                              number(m['items_per_s'], 0), number(m['peak_rss_mb'], 0)])
+        perf_table = Table(perf_rows)
+        perf_table.setStyle(table_style)
+        Story.append(perf_table)
+
+    # --- 5. Build the PDF ---
     doc.build(Story)
     print(f"\n✅ REPORT GENERATED: Report saved as {report_filename}")
     return report_filename
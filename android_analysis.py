@@ -1,12 +1,171 @@
 import os
 import sys
+import csv
+import shutil
+import struct
 import sqlite3
-import pandas as pd
+import pathlib
+import tempfile
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from task_scheduler import TaskCancelled, check_cancelled, report_progress
+from case_store import emit_artifacts, record_outputs, recording
+from instrumentation import add_throughput
+from sqlite_recovery import WAL_MAGIC, WAL_HEADER_SIZE, WAL_FRAME_HEADER_SIZE, wal_checksum
 
 # Define a mock database name, representing a common mobile artifact like 'call_history.db'
 MOCK_ANDROID_DB = "app_data_android.db"
 
+EXPORT_BATCH_SIZE = 10000  # Rows per fetchmany() batch when exporting; bounds peak memory
+
+MESSAGE_COLUMNS = ["timestamp", "sender", "recipient", "content", "status"]
+
+SQLITE_HEADER = b'SQLite format 3\x00'
+SQLITE_COMPANION_SUFFIXES = ('-wal', '-shm', '-journal')
+
+WAL_COPY_SLOTS = 4                # Databases copied to temp at once so their WAL can be read
+WAL_COPY_BUDGET = 2 * 1024 ** 3   # Bytes those copies may hold in temp at once
+
+# --- Known App Artifact Definitions (P3 Mobile App Data Analysis) ---
+# A database matches an artifact when it has the table with (at least) the listed columns.
+# 'timestamp' names the column used to report the activity range of the artifact.
+ANDROID_ARTIFACT_DEFINITIONS = {
+    "Android SMS/MMS": {"table": "sms", "columns": ["address", "body", "date", "type"], "timestamp": "date"},
+    "Android Call Log": {"table": "calls", "columns": ["number", "date", "duration", "type"], "timestamp": "date"},
+    "Android Contacts": {"table": "raw_contacts", "columns": ["contact_id", "display_name"], "timestamp": None},
+    "Android Accounts": {"table": "accounts", "columns": ["name", "type"], "timestamp": None},
+    "Android Calendar Events": {"table": "Events", "columns": ["title", "dtstart"], "timestamp": "dtstart"},
+    "Android Downloads": {"table": "downloads", "columns": ["uri", "_data", "lastmod"], "timestamp": "lastmod"},
+    "WhatsApp Messages (legacy)": {"table": "messages", "columns": ["key_remote_jid", "data", "timestamp"], "timestamp": "timestamp"},
+    "WhatsApp Messages": {"table": "message", "columns": ["chat_row_id", "text_data", "timestamp"], "timestamp": "timestamp"},
+    "WhatsApp Contacts": {"table": "wa_contacts", "columns": ["jid", "display_name"], "timestamp": None},
+    "Telegram Messages": {"table": "messages_v2", "columns": ["uid", "mid", "date", "data"], "timestamp": "date"},
+    "Facebook Messenger": {"table": "messages", "columns": ["thread_key", "text", "timestamp_ms"], "timestamp": "timestamp_ms"},
+    "Chrome History": {"table": "urls", "columns": ["url", "title", "last_visit_time"], "timestamp": "last_visit_time"},
+    "Chrome Downloads": {"table": "downloads", "columns": ["target_path", "start_time", "total_bytes"], "timestamp": "start_time"},
+    "Generic Messaging App": {"table": "messages", "columns": ["sender", "recipient", "content", "timestamp", "status"], "timestamp": "timestamp"},
+}
+
+
+def wal_has_commits(wal_path):
+    """
+    True when a -wal holds at least one valid committed frame, i.e. when SQLite
+    would read rows from it. Empty, reset (stale salts) or torn WALs are ignored
+    by SQLite anyway, so those databases are opened in place without a copy.
+    """
+    try:
+        with open(wal_path, 'rb') as f:
+            header = f.read(WAL_HEADER_SIZE)
+            if len(header) < WAL_HEADER_SIZE:
+                return False
+            magic, _, page_size, _, salt1, salt2, check1, check2 = struct.unpack('>IIIIIIII', header)
+            if magic not in WAL_MAGIC or page_size < 512 or page_size > 65536 or page_size & (page_size - 1):
+                return False
+            big_endian = magic & 1
+            checksum = wal_checksum(header, 0, 24, big_endian, 0, 0)
+            if checksum != (check1, check2):
+                return False
+            frame_size = WAL_FRAME_HEADER_SIZE + page_size
+            while True:
+                frame = f.read(frame_size)
+                if len(frame) < frame_size:
+                    return False
+                _, commit_size, frame_salt1, frame_salt2, check1, check2 = struct.unpack_from('>IIIIII', frame, 0)
+                if (frame_salt1, frame_salt2) != (salt1, salt2):
+                    return False
+                checksum = wal_checksum(frame, 0, 8, big_endian, *checksum)
+                checksum = wal_checksum(frame, WAL_FRAME_HEADER_SIZE, page_size, big_endian, *checksum)
+                if checksum != (check1, check2):
+                    return False
+                if commit_size:
+                    return True
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True  # Let the copy report the read error
+
+
+class CopyBudget:
+    """Limits how many WAL databases are copied to temp at once and the bytes those copies hold."""
+
+    def __init__(self, slots, max_bytes):
+        self.slots = slots
+        self.max_bytes = max_bytes
+        self.copies = 0
+        self.bytes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        with self.condition:
+            # A copy larger than the whole budget still runs, just on its own
+            while self.copies and (self.copies >= self.slots or self.bytes + size > self.max_bytes):
+                self.condition.wait()
+            self.copies += 1
+            self.bytes += size
+
+    def release(self, size):
+        with self.condition:
+            self.copies -= 1
+            self.bytes -= size
+            self.condition.notify_all()
+
+
+WAL_COPIES = CopyBudget(WAL_COPY_SLOTS, WAL_COPY_BUDGET)
+
+
+class WalCopy:
+    """Private temp copy of a database and its -wal; cleanup() deletes it and frees its share of WAL_COPIES."""
+
+    def __init__(self, db_path):
+        self.size = os.path.getsize(db_path) + os.path.getsize(db_path + "-wal")
+        self.temp_dir = None
+        WAL_COPIES.acquire(self.size)
+        try:
+            self.temp_dir = tempfile.TemporaryDirectory(prefix="android_db_")
+            self.path = os.path.join(self.temp_dir.name, os.path.basename(db_path))
+            shutil.copyfile(db_path, self.path)
+            shutil.copyfile(db_path + "-wal", self.path + "-wal")
+        except BaseException:
+            self.cleanup()
+            raise
+
+    def cleanup(self):
+        if self.size is None:
+            return
+        if self.temp_dir is not None:
+            self.temp_dir.cleanup()
+        WAL_COPIES.release(self.size)
+        self.size = None
+
+
+def open_readonly(db_path):
+    """
+    Opens a SQLite database without ever modifying the evidence. Returns (connection, wal_copy).
+    'immutable=1' stops SQLite from taking locks or touching -wal/-shm files, but it
+    also ignores the WAL. SQLite always looks for the WAL next to the real database
+    file (it resolves symlinks), so a database whose -wal holds committed frames is
+    copied with its WAL into a private temp directory, within WAL_COPIES, and the
+    copy is opened normally. wal_copy (None when no copy was made) is released by
+    close_readonly().
+    """
+    if not wal_has_commits(db_path + "-wal"):
+        uri = pathlib.Path(db_path).resolve().as_uri() + "?mode=ro&immutable=1"
+        return sqlite3.connect(uri, uri=True), None
+
+    wal_copy = WalCopy(db_path)
+    try:
+        return sqlite3.connect(wal_copy.path), wal_copy
+    except BaseException:
+        wal_copy.cleanup()
+        raise
+
+
+def close_readonly(conn, wal_copy):
+    conn.close()
+    if wal_copy is not None:
+        wal_copy.cleanup()
+
 def setup_mock_android_db():
     """Creates a mock SQLite database to simulate an Android app artifact."""
     if os.path.exists(MOCK_ANDROID_DB):
@@ -40,10 +199,37 @@ def setup_mock_android_db():
     print(f"[Setup] Created mock database: {MOCK_ANDROID_DB}")
 
 
-def analyze_android_database(db_path):
+def format_rows(columns, rows):
+    """Formats a small result set as a fixed-width text table for the console."""
+    cells = [[str(value) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in cells]) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.ljust(widths[i]) for i, column in enumerate(columns)).rstrip()]
+    lines += ["  ".join(value.ljust(widths[i]) for i, value in enumerate(row)).rstrip() for row in cells]
+    return "\n".join(lines)
+
+
+def export_query_to_csv(conn, query, params, output_path, batch_size=EXPORT_BATCH_SIZE):
+    """Streams a query result to CSV in fetchmany() batches. Returns the number of rows written."""
+    cursor = conn.execute(query, params)
+    written = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([description[0] for description in cursor.description])
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+def analyze_android_database(db_path, export_path=None):
     """
     Connects to a SQLite database (simulating an Android app artifact) and 
     extracts key communications data.
+    Counts and filters are pushed down to SQLite, so memory use does not grow
+    with the table; export_path optionally streams all messages to CSV.
     This fulfills P3 Mobile Data Extraction and App Data Analysis features.
     """
     print(f"\n[+] Starting Android App Data Analysis on: {db_path}")
@@ -54,26 +240,46 @@ def analyze_android_database(db_path):
         return f"ERROR: Database file not found at {db_path}"
 
     try:
-        conn = sqlite3.connect(db_path)
-        
-        # --- Expert-level query: Retrieving messages and deleted status (P3 feature) ---
-        query = "SELECT timestamp, sender, recipient, content, status FROM messages ORDER BY timestamp ASC"
+        conn, wal_copy = open_readonly(db_path)
+        if wal_copy is not None:
+            print("|-- WAL present: the database was copied with its -wal, so uncheckpointed rows are included.")
         
-        # Use pandas to execute the query and format the output professionally
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        try:
+            # --- Expert-level query: aggregate messages and deleted status inside SQLite (P3 feature) ---
+            total_count, deleted_count = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(status = 'DELETED'), 0) FROM messages"
+            ).fetchone()
 
-        print(f"Successfully extracted {len(df)} records.")
-        
-        # Highlight important data like DELETED messages
-        deleted_count = len(df[df['status'] == 'DELETED'])
-        print(f"|-- Critical Finding: {deleted_count} messages marked as DELETED.")
-        
-        print("\n--- EXTRACTED MESSAGING ARTIFACTS (Top 5) ---")
-        print(df.head().to_string()) # Display results professionally
+            print(f"Successfully extracted {total_count} records.")
+            add_throughput(bytes_read=os.path.getsize(db_path), items=total_count)
+            
+            # Highlight important data like DELETED messages
+            print(f"|-- Critical Finding: {deleted_count} messages marked as DELETED.")
+            
+            # LIMIT lets SQLite keep a top-5 sorter instead of ordering the whole table
+            query = f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages ORDER BY timestamp ASC"
+            preview = conn.execute(query + " LIMIT 5").fetchall()
+            print("\n--- EXTRACTED MESSAGING ARTIFACTS (Top 5) ---")
+            print(format_rows(MESSAGE_COLUMNS, preview))
+
+            if export_path:
+                os.makedirs(os.path.dirname(os.path.abspath(export_path)), exist_ok=True)
+                exported = export_query_to_csv(conn, query, (), export_path)
+                record_outputs([export_path])
+                print(f"\n|-- Exported {exported} records to {export_path}")
+
+            if recording():
+                cursor = conn.execute(query)
+                while True:
+                    rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    emit_artifacts("android_message", [dict(zip(MESSAGE_COLUMNS, row)) for row in rows], time_field="timestamp")
+        finally:
+            close_readonly(conn, wal_copy)
         
         # Return a summary string for the PySide worker
-        return f"Android analysis complete. {len(df)} records processed ({deleted_count} deleted)."
+        return f"Android analysis complete. {total_count} records processed ({deleted_count} deleted)."
 
     except sqlite3.Error as e:
         print(f"DATABASE ERROR: Failed to read SQLite database: {e}")
@@ -82,6 +288,144 @@ def analyze_android_database(db_path):
         print(f"An unexpected error occurred: {e}")
         return f"An unexpected error occurred: {e}"
 
+# --- Batch Extraction Triage (P3 Feature) ---
+def find_sqlite_databases(extraction_dir):
+    """Walks an extraction directory and yields every file carrying the SQLite header."""
+    pending = [extraction_dir]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError as e:
+            print(f"|-- WARNING: Cannot list directory: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and not entry.name.endswith(SQLITE_COMPANION_SUFFIXES):
+                        if entry.stat().st_size < 512:
+                            continue
+                        with open(entry.path, 'rb') as f:
+                            if f.read(16) == SQLITE_HEADER:
+                                yield entry.path
+                except OSError:
+                    continue
+
+
+def discover_schema(conn):
+    """Returns {table_name_lower: (table_name, {column_name_lower, ...})} for all tables."""
+    schema = {}
+    tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    for (table,) in tables:
+        columns = conn.execute(f'PRAGMA table_info("{table.replace(chr(34), chr(34) * 2)}")').fetchall()
+        schema[table.lower()] = (table, {column[1].lower() for column in columns})
+    return schema
+
+
+def triage_android_database(db_path):
+    """
+    Opens one database read-only, discovers its schema and matches it against
+    ANDROID_ARTIFACT_DEFINITIONS. Returns a result dictionary (runs in a worker thread).
+    """
+    result = {
+        "path": db_path,
+        "tables": 0,
+        "artifacts": [],
+        "wal_present": os.path.exists(db_path + "-wal"),
+        "error": None,
+    }
+    try:
+        conn, wal_copy = open_readonly(db_path)
+        try:
+            schema = discover_schema(conn)
+            result["tables"] = len(schema)
+
+            for artifact_name, definition in ANDROID_ARTIFACT_DEFINITIONS.items():
+                match = schema.get(definition["table"].lower())
+                if match is None or not {c.lower() for c in definition["columns"]} <= match[1]:
+                    continue
+
+                table = match[0].replace('"', '""')
+                ts_column = definition["timestamp"]
+                if ts_column:
+                    rows, first_ts, last_ts = conn.execute(
+                        f'SELECT COUNT(*), MIN("{ts_column}"), MAX("{ts_column}") FROM "{table}"'
+                    ).fetchone()
+                else:
+                    rows, first_ts, last_ts = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0], None, None
+
+                result["artifacts"].append({
+                    "name": artifact_name,
+                    "table": match[0],
+                    "rows": rows,
+                    "first": first_ts,
+                    "last": last_ts,
+                })
+        finally:
+            close_readonly(conn, wal_copy)
+    except (sqlite3.Error, OSError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def analyze_android_extraction(extraction_dir, max_workers=None):
+    """
+    Batch mode: triages every SQLite database of a full phone extraction
+    concurrently and reports which known app artifacts each one contains.
+    """
+    print(f"\n[+] Starting Android Extraction Triage on: {extraction_dir}")
+
+    if not os.path.isdir(extraction_dir):
+        print(f"ERROR: Extraction directory not found at {extraction_dir}")
+        return f"ERROR: Extraction directory not found at {extraction_dir}"
+
+    # SQLite releases the GIL while it reads, so a thread pool scales across the databases
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(triage_android_database, path) for path in find_sqlite_databases(extraction_dir)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            try:
+                add_throughput(bytes_read=os.path.getsize(result["path"]), items=1)
+            except OSError:
+                add_throughput(items=1)  # Removed while the extraction was being triaged
+            try:
+                check_cancelled()
+            except TaskCancelled:
+                for pending in futures:
+                    pending.cancel()
+                raise
+            report_progress(f"Triaged {len(results)} of {len(futures)} databases")
+
+    results.sort(key=lambda r: r["path"])
+    matched = [r for r in results if r["artifacts"]]
+    failed = [r for r in results if r["error"]]
+    total_rows = 0
+
+    print(f"Databases found: {len(results)} | With known artifacts: {len(matched)} | Unreadable: {len(failed)}")
+    print("\n--- IDENTIFIED APP ARTIFACTS ---")
+    for r in matched:
+        print(f"{os.path.relpath(r['path'], extraction_dir)}{'  [WAL present: rows included]' if r['wal_present'] else ''}")
+        for artifact in r["artifacts"]:
+            total_rows += artifact["rows"] or 0
+            time_range = f" | Range: {artifact['first']} -> {artifact['last']}" if artifact["first"] is not None else ""
+            print(f"  |-- {artifact['name']:<28} table={artifact['table']:<14} rows={artifact['rows']}{time_range}")
+
+    for r in failed:
+        print(f"|-- ERROR: {os.path.relpath(r['path'], extraction_dir)}: {r['error']}")
+
+    emit_artifacts("android_app_artifact", [
+        dict(artifact, path=r["path"], wal_present=r["wal_present"]) for r in matched for artifact in r["artifacts"]
+    ])
+
+    return (f"Android extraction triage complete. {len(results)} databases scanned, "
+            f"{len(matched)} with known artifacts ({total_rows} artifact rows).")
+
 # --- Example Execution ---
 if __name__ == '__main__':
     setup_mock_android_db()
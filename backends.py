@@ -0,0 +1,110 @@
+import re
+import shutil
+import importlib
+import importlib.util
+import threading
+
+from instrumentation import stage
+
+# --- Backend Registry ---
+# Every analysis entry point the GUI/CLI can run, resolved lazily by name:
+#   name -> (module, function, third-party packages, external tools)
+# Nothing here is imported until load() is called, so a missing backend only disables
+# the actions that need it instead of stopping the whole suite from starting.
+BACKENDS = {
+    "perform_forensic_imaging": ("acquisition", "perform_forensic_imaging", [], ["dcfldd"]),
+    "verify_integrity": ("acquisition", "verify_integrity", [], []),
+    "analyze_disk_image": ("analysis", "analyze_disk_image", ["pytsk3"], []),
+    "perform_file_carving": ("analysis", "perform_file_carving", [], []),
+    "analyze_registry_hive": ("analysis", "analyze_registry_hive", ["regipy"], []),
+    "analyze_memory_dump": ("analysis", "analyze_memory_dump", [], ["vol.py"]),
+    "generate_forensic_report": ("analysis", "generate_forensic_report", ["reportlab"], []),
+    "generate_super_timeline": ("timeline_generator", "generate_super_timeline", [], []),
+    "analyze_pcap_file": ("network_analysis", "analyze_pcap_file", ["scapy"], []),
+    "extract_protocol_artifacts": ("protocol_extraction", "extract_protocol_artifacts", [], []),
+    "analyze_android_database": ("android_analysis", "analyze_android_database", [], []),
+    "analyze_android_extraction": ("android_analysis", "analyze_android_extraction", [], []),
+    "recover_deleted_records": ("sqlite_recovery", "recover_deleted_records", [], []),
+}
+
+# Modules report most failures by returning a message instead of raising, e.g.
+# "ERROR: ...", "DATABASE ERROR: ...", "Protocol extraction failed: ..."
+FAILURE_RESULT = re.compile(r"^(ERROR|DATABASE ERROR|An unexpected error occurred|[A-Za-z ]+ failed):")
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+class BackendUnavailable(ImportError):
+    """Raised by load() when a backend's module, packages or tools are missing."""
+
+
+def missing_requirements(name):
+    """
+    Returns what a backend lacks (empty list when it can run). Uses find_spec and
+    shutil.which only, so checking never imports the heavy packages themselves.
+    """
+    module, _, packages, tools = BACKENDS[name]
+    missing = []
+    if importlib.util.find_spec(module) is None:
+        missing.append(f"module {module}.py")
+    missing += [f"package {package}" for package in packages if importlib.util.find_spec(package) is None]
+    missing += [f"tool {tool}" for tool in tools if shutil.which(tool) is None]
+    return missing
+
+
+def load(name):
+    """Imports the backend's module on first use and returns its entry-point function."""
+    func = _loaded.get(name)
+    if func is not None:
+        return func
+    with _load_lock:
+        if name not in _loaded:
+            module, function, packages, _ = BACKENDS[name]
+            missing = [item for item in missing_requirements(name) if not item.startswith("tool ")]
+            if missing:
+                raise BackendUnavailable(f"{name} is unavailable (missing {', '.join(missing)}).")
+            _loaded[name] = getattr(importlib.import_module(module), function)
+        return _loaded[name]
+
+
+def run_backend(name, *args, **kwargs):
+    """Job entry point: loads the backend in the worker thread, then runs it as one instrumented stage."""
+    with stage(name):
+        return load(name)(*args, **kwargs)
+
+
+def result_failure(result):
+    """
+    Returns the failure a backend reported through its return value (False, a
+    (False, ...) tuple or an error message string), or None for a real result.
+    """
+    success = result[0] if isinstance(result, (tuple, list)) and result else result
+    if success is False:
+        return "Check console for details."
+    if isinstance(result, str) and FAILURE_RESULT.match(result):
+        return result
+    return None
+
+
+def run_pipeline_step(name, *args):
+    """
+    Runs a backend that reports failure through its return value (see
+    result_failure) and raises instead, so the job fails and the scheduler
+    cancels the dependent steps.
+    """
+    result = run_backend(name, *args)
+    failure = result_failure(result)
+    if failure is not None:
+        raise RuntimeError(f"{name} reported a failure. {failure}")
+    return result
+
+
+def availability_report():
+    """One line per backend, for the startup console / CLI."""
+    lines = []
+    for name in BACKENDS:
+        missing = missing_requirements(name)
+        status = "OK" if not missing else f"UNAVAILABLE: missing {', '.join(missing)}"
+        lines.append(f"|-- {name:<28} [{status}]")
+    return lines
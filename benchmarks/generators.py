@@ -0,0 +1,395 @@
+import os
+import json
+import random
+import shutil
+import sqlite3
+import struct
+import subprocess
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# --- Configuration & Constants ---
+SEED = 20240601                    # Every generator is deterministic for a given seed and size
+BASE_TIME = 1700000000             # Epoch seconds used for file, packet and message times
+CHUNK_SIZE = 4 * 1024 * 1024       # Raw image filler written per chunk
+PLANT_INTERVAL = 1024 * 1024       # One planted file per MB of raw image
+FS_UUID = "4b1d0000-0000-4000-8000-000000000001"
+PCAP_SNAPLEN = 65535
+LINKTYPE_ETHERNET = 1
+
+# Planted files use a lowercase-only body, so no carving footer (FFD9, %%EOF, 00 3B) occurs early
+PLANTED_FILES = {
+    "JPEG": (b'\xFF\xD8\xFF\xE0\x00\x10JFIF\x00', b'\xFF\xD9', "jpg"),
+    "PDF": (b'%PDF-1.4\n', b'\n%%EOF', "pdf"),
+    "GIF": (b'GIF89a', b'\x00\x3B', "gif"),
+}
+BODY_ALPHABET = b'abcdefghijklmnopqrstuvwxyz'
+_BODY_TABLE = bytes(BODY_ALPHABET[b % len(BODY_ALPHABET)] for b in range(256))
+
+
+# --- Helpers ---
+def _sidecar(path):
+    return path + ".json"
+
+
+def cached_metadata(path, params):
+    """Returns the metadata of a previously generated file with identical parameters, or None."""
+    try:
+        with open(_sidecar(path), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if metadata.get("params") != params or not os.path.exists(path):
+        return None
+    return metadata
+
+
+def save_metadata(path, params, **values):
+    metadata = dict(values, params=params, path=os.path.abspath(path))
+    with open(_sidecar(path), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def text_bytes(rng, size):
+    return rng.randbytes(size).translate(_BODY_TABLE)
+
+
+def planted_file(rng, file_type, size):
+    header, footer, _ = PLANTED_FILES[file_type]
+    return header + text_bytes(rng, max(0, size - len(header) - len(footer))) + footer
+
+
+# --- Raw Image With Planted Files (hashing, imaging, verification, carving) ---
+def generate_raw_image(path, size_mb, seed=SEED):
+    """
+    Pseudo-random image of size_mb MB with one JPEG/PDF/GIF planted per MB at a
+    known offset. The filler never contains a carving header, so the carver must
+    recover exactly the planted files.
+    """
+    params = {"size_mb": size_mb, "seed": seed}
+    metadata = cached_metadata(path, params)
+    if metadata:
+        return metadata
+
+    print(f"[Generate] Raw image {path} ({size_mb} MB)")
+    rng = random.Random(seed)
+    headers = [header for header, _, _ in PLANTED_FILES.values()]
+    planted = {file_type: 0 for file_type in PLANTED_FILES}
+    total = size_mb * 1024 * 1024
+    temp_path = path + ".partial"
+    with open(temp_path, 'wb') as f:
+        for chunk_start in range(0, total, CHUNK_SIZE):
+            chunk = bytearray(rng.randbytes(min(CHUNK_SIZE, total - chunk_start)))
+            for header in headers:  # Break up (rare) accidental headers in the filler
+                position = chunk.find(header)
+                while position != -1:
+                    chunk[position] ^= 0x01
+                    position = chunk.find(header, position + 1)
+            for plant_offset in range(PLANT_INTERVAL // 2, len(chunk), PLANT_INTERVAL):
+                file_type = list(PLANTED_FILES)[(chunk_start + plant_offset) // PLANT_INTERVAL % len(PLANTED_FILES)]
+                data = planted_file(rng, file_type, rng.randrange(4096, 65536))
+                chunk[plant_offset:plant_offset + len(data)] = data
+                planted[file_type] += 1
+            f.write(chunk)
+    os.replace(temp_path, path)
+    return save_metadata(path, params, size_bytes=total, planted=planted, planted_total=sum(planted.values()))
+
+
+# --- File System Image (FS walk) ---
+def generate_fs_image(path, size_mb, file_count, seed=SEED):
+    """
+    ext4 image built with mkfs.ext4 -d from a generated tree of file_count files
+    (planted JPEG/PDF/GIF plus text) with fixed MAC times. Returns None when
+    mkfs.ext4 is not available.
+    """
+    params = {"size_mb": size_mb, "file_count": file_count, "seed": seed}
+    metadata = cached_metadata(path, params)
+    if metadata:
+        return metadata
+    mkfs = shutil.which("mkfs.ext4")
+    if mkfs is None:
+        print("[Generate] mkfs.ext4 not found; file system image skipped.")
+        return None
+
+    print(f"[Generate] ext4 image {path} ({size_mb} MB, {file_count} files)")
+    rng = random.Random(seed)
+    source_dir = tempfile.mkdtemp(prefix="bench_fs_", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        directories = set()
+        for i in range(file_count):
+            directory = os.path.join(source_dir, f"dir_{i // 500:04d}", f"sub_{i // 50 % 10}")
+            if directory not in directories:
+                os.makedirs(directory, exist_ok=True)
+                directories.add(directory)
+            file_type = ("JPEG", "PDF", "GIF", None)[i % 4]
+            if file_type:
+                data = planted_file(rng, file_type, rng.randrange(512, 8192))
+                name = f"file_{i:07d}.{PLANTED_FILES[file_type][2]}"
+            else:
+                data = text_bytes(rng, rng.randrange(16, 2048))
+                name = f"file_{i:07d}.txt"
+            file_path = os.path.join(directory, name)
+            with open(file_path, 'wb') as f:
+                f.write(data)
+            os.utime(file_path, (BASE_TIME + i * 3, BASE_TIME + i * 2))
+
+        env = dict(os.environ, E2FSPROGS_FAKE_TIME=str(BASE_TIME))
+        temp_path = path + ".partial"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        subprocess.run([mkfs, "-q", "-F", "-U", FS_UUID, "-E", f"hash_seed={FS_UUID}", "-d", source_dir,
+                        temp_path, f"{size_mb}M"], check=True, env=env, capture_output=True)
+        os.replace(temp_path, path)
+    finally:
+        shutil.rmtree(source_dir, ignore_errors=True)
+    return save_metadata(path, params, size_bytes=size_mb * 1024 * 1024, files=file_count)
+
+
+# --- PCAP With Known Flows (pcap analysis, protocol extraction) ---
+def _ipv4(src, dst, proto, payload):
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(payload), 0, 0, 64, proto, 0, bytes(src), bytes(dst))
+    return header + payload
+
+
+def _ethernet(payload):
+    return b'\x02\x00\x00\x00\x00\x02' + b'\x02\x00\x00\x00\x00\x01' + b'\x08\x00' + payload
+
+
+def _udp(sport, dport, payload):
+    return struct.pack('!HHHH', sport, dport, 8 + len(payload), 0) + payload
+
+
+def _tcp(sport, dport, payload):
+    return struct.pack('!HHIIBBHHH', sport, dport, 1, 1, 0x50, 0x18, 65535, 0, 0) + payload
+
+
+def _dns_query(domain, query_id):
+    qname = b''.join(bytes([len(label)]) + label.encode('ascii') for label in domain.split('.')) + b'\x00'
+    return struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0) + qname + struct.pack('!HH', 1, 1)
+
+
+def _tls_client_hello(server_name):
+    name = server_name.encode('ascii')
+    sni = struct.pack('!HBH', len(name) + 3, 0, len(name)) + name
+    extensions = struct.pack('!HH', 0, len(sni)) + sni
+    body = b'\x03\x03' + bytes(32) + b'\x00' + b'\x00\x02\x13\x01' + b'\x01\x00' + struct.pack('!H', len(extensions)) + extensions
+    handshake = b'\x01' + len(body).to_bytes(3, 'big') + body
+    return b'\x16\x03\x01' + struct.pack('!H', len(handshake)) + handshake
+
+
+def flow_frames(flow):
+    """The four frames of one known flow: DNS query, HTTP request, TLS ClientHello, bulk data."""
+    client = (10, 0, flow // 250 % 250, flow % 250 + 1)
+    server = (93, 184, flow // 250 % 250, flow % 250 + 1)
+    resolver = (10, 255, 255, 53)
+    domain = f"host{flow}.bench.example"
+    sport = 20000 + flow % 40000
+    return [
+        _ethernet(_ipv4(client, resolver, 17, _udp(sport, 53, _dns_query(domain, flow & 0xFFFF)))),
+        _ethernet(_ipv4(client, server, 6, _tcp(sport, 80, f"GET /item/{flow} HTTP/1.1\r\nHost: {domain}\r\n\r\n".encode('ascii')))),
+        _ethernet(_ipv4(client, server, 6, _tcp(sport + 1, 443, _tls_client_hello(domain)))),
+        _ethernet(_ipv4(server, client, 6, _tcp(443, sport + 1, b'\x17\x03\x03' + bytes(1200)))),
+    ]
+
+
+def generate_pcap(path, packet_count, flow_count=1000):
+    """
+    Classic pcap of packet_count Ethernet frames cycling through flow_count known
+    flows. Each flow yields three protocol artifacts (DNS query, HTTP request,
+    TLS SNI) per four packets, so the expected extraction result is known.
+    """
+    params = {"packet_count": packet_count, "flow_count": flow_count}
+    metadata = cached_metadata(path, params)
+    if metadata:
+        return metadata
+
+    print(f"[Generate] PCAP {path} ({packet_count} packets, {flow_count} flows)")
+    frames = [frame for flow in range(flow_count) for frame in flow_frames(flow)]
+    temp_path = path + ".partial"
+    artifacts = 0
+    with open(temp_path, 'wb', buffering=CHUNK_SIZE) as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, PCAP_SNAPLEN, LINKTYPE_ETHERNET))
+        for i in range(packet_count):
+            frame = frames[i % len(frames)]
+            usec = i * 100  # 10k packets per second
+            f.write(struct.pack('<IIII', BASE_TIME + usec // 1000000, usec % 1000000, len(frame), len(frame)))
+            f.write(frame)
+            if i % 4 != 3:
+                artifacts += 1
+    os.replace(temp_path, path)
+    return save_metadata(path, params, size_bytes=os.path.getsize(path), packets=packet_count, expected_artifacts=artifacts)
+
+
+# --- SQLite Databases (Android analysis) ---
+def _message_rows(rows, seed):
+    rng = random.Random(seed)
+    start = datetime.fromtimestamp(BASE_TIME, timezone.utc)
+    for i in range(rows):
+        yield (f"+1555{rng.randrange(10 ** 7):07d}", f"+1555{rng.randrange(10 ** 7):07d}",
+               f"benchmark message {i} " + "x" * rng.randrange(0, 120),
+               (start + timedelta(seconds=i * 7)).strftime('%Y-%m-%d %H:%M:%S'),
+               "DELETED" if i % 20 == 0 else ("READ" if i % 3 else "SENT"))
+
+
+def generate_messages_db(path, rows, seed=SEED):
+    """messages table in the layout of android_analysis.setup_mock_android_db; every 20th row is DELETED."""
+    params = {"rows": rows, "seed": seed}
+    metadata = cached_metadata(path, params)
+    if metadata:
+        return metadata
+
+    print(f"[Generate] Messages database {path} ({rows} rows)")
+    temp_path = path + ".partial"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("""
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY,
+            sender TEXT,
+            recipient TEXT,
+            content TEXT,
+            timestamp DATETIME,
+            status TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO messages VALUES (NULL, ?, ?, ?, ?, ?)", _message_rows(rows, seed))
+    conn.commit()
+    conn.close()
+    os.replace(temp_path, path)
+    return save_metadata(path, params, size_bytes=os.path.getsize(path), rows=rows, deleted=(rows + 19) // 20)
+
+
+def generate_wal_database(path, rows, seed=SEED, batch=10):
+    """
+    WAL-mode items table (SQLite recovery) with the WAL kept: rows are inserted in
+    random rowid order, batch per transaction, so pages are split and rebuilt and
+    older frames hold stale copies of live cells in their free space; then every
+    10th row is deleted. The recovery must report exactly the deleted rows.
+    """
+    params = {"rows": rows, "seed": seed, "batch": batch}
+    metadata = cached_metadata(path, params)
+    if metadata:
+        return metadata
+
+    print(f"[Generate] WAL database {path} ({rows} rows)")
+    rng = random.Random(seed)
+    build_path = path + ".build"
+    for suffix in ("", "-wal", "-shm"):
+        for stale in (path + suffix, build_path + suffix):
+            if os.path.exists(stale):
+                os.remove(stale)
+    conn = sqlite3.connect(build_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, note TEXT)")
+    ids = list(range(1, rows + 1))
+    rng.shuffle(ids)
+    for start in range(0, rows, batch):
+        conn.executemany("INSERT INTO items VALUES (?, ?, ?)",
+                         [(i, f"item{i}", "n" * rng.randrange(51)) for i in ids[start:start + batch]])
+        conn.commit()
+    deleted = list(range(10, rows + 1, 10))
+    for start in range(0, len(deleted), batch):
+        conn.executemany("DELETE FROM items WHERE id = ?", [(i,) for i in deleted[start:start + batch]])
+        conn.commit()
+    # Copied while the connection is open: closing it would checkpoint and delete the -wal
+    shutil.copyfile(build_path, path)
+    shutil.copyfile(build_path + "-wal", path + "-wal")
+    conn.close()
+    os.remove(build_path)
+    return save_metadata(path, params, size_bytes=os.path.getsize(path) + os.path.getsize(path + "-wal"),
+                         rows=rows, deleted_names=[f"item{i}" for i in deleted])
+
+
+# Per app: (relative database path, CREATE TABLE, row template)
+ANDROID_APP_DATABASES = [
+    ("com.android.providers.telephony/databases/mmssms.db",
+     "CREATE TABLE sms (_id INTEGER PRIMARY KEY, address TEXT, body TEXT, date INTEGER, type INTEGER)",
+     lambda i: (None, f"+1555{i:07d}", f"sms {i}", (BASE_TIME + i) * 1000, i % 2 + 1)),
+    ("com.android.providers.contacts/databases/calllog.db",
+     "CREATE TABLE calls (_id INTEGER PRIMARY KEY, number TEXT, date INTEGER, duration INTEGER, type INTEGER)",
+     lambda i: (None, f"+1555{i:07d}", (BASE_TIME + i) * 1000, i % 600, i % 3 + 1)),
+    ("com.whatsapp/databases/msgstore.db",
+     "CREATE TABLE message (_id INTEGER PRIMARY KEY, chat_row_id INTEGER, text_data TEXT, timestamp INTEGER)",
+     lambda i: (None, i % 50, f"whatsapp {i}", (BASE_TIME + i) * 1000)),
+    ("com.android.chrome/app_chrome/Default/History",
+     "CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT, last_visit_time INTEGER)",
+     lambda i: (None, f"https://site{i % 500}.example/{i}", f"Page {i}", 13300000000000000 + i * 1000000)),
+]
+
+
+def _write_wal_database(db_path, schema, insert, rows):
+    """
+    WAL-mode database as found on a running phone: the first three quarters of the
+    rows are checkpointed into the main file, the rest exist only in the -wal.
+    """
+    build_path = db_path + ".build"
+    conn = sqlite3.connect(build_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute(schema)
+    split = len(rows) * 3 // 4
+    conn.executemany(insert, rows[:split])
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.executemany(insert, rows[split:])
+    conn.commit()
+    # Copied while the connection is open: closing it would checkpoint and delete the -wal
+    shutil.copyfile(build_path, db_path)
+    shutil.copyfile(build_path + "-wal", db_path + "-wal")
+    conn.close()
+    os.remove(build_path)
+
+
+def generate_android_extraction(directory, database_count, rows_per_database, seed=SEED, wal_every=2):
+    """
+    Phone extraction tree (data/data/<package>/...) holding database_count SQLite
+    databases that match known app artifacts, plus non-SQLite files the triage must skip.
+    Every wal_every-th database is in WAL mode with a quarter of its rows only in its -wal.
+    """
+    params = {"database_count": database_count, "rows_per_database": rows_per_database, "seed": seed,
+              "wal_every": wal_every}
+    metadata = cached_metadata(directory, params)
+    if metadata:
+        return metadata
+
+    print(f"[Generate] Android extraction {directory} ({database_count} databases x {rows_per_database} rows)")
+    rng = random.Random(seed)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    for n in range(database_count):
+        relative, schema, row = ANDROID_APP_DATABASES[n % len(ANDROID_APP_DATABASES)]
+        user_dir = os.path.join(directory, "data", "user", str(n // len(ANDROID_APP_DATABASES)))
+        db_path = os.path.join(user_dir, relative)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        placeholders = ", ".join("?" * len(row(0)))
+        insert = f"INSERT INTO {schema.split()[2]} VALUES ({placeholders})"
+        if wal_every and n % wal_every == wal_every - 1:
+            _write_wal_database(db_path, schema, insert, [row(i) for i in range(rows_per_database)])
+        else:
+            conn = sqlite3.connect(db_path)
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute(schema)
+            conn.executemany(insert, (row(i) for i in range(rows_per_database)))
+            conn.commit()
+            conn.close()
+        with open(os.path.join(os.path.dirname(db_path), "cache.bin"), 'wb') as f:
+            f.write(rng.randbytes(4096))
+    return save_metadata(directory, params, databases=database_count, rows=database_count * rows_per_database,
+                         wal_databases=database_count // wal_every if wal_every else 0)
+
+
+if __name__ == '__main__':
+    # Demo: generates the smallest evidence set in ./bench_demo
+    demo_dir = "bench_demo"
+    os.makedirs(demo_dir, exist_ok=True)
+    print(generate_raw_image(os.path.join(demo_dir, "raw.dd"), 8))
+    print(generate_fs_image(os.path.join(demo_dir, "fs.img"), 16, 200))
+    print(generate_pcap(os.path.join(demo_dir, "flows.pcap"), 10000, 100))
+    print(generate_messages_db(os.path.join(demo_dir, "messages.db"), 10000))
+    print(generate_wal_database(os.path.join(demo_dir, "wal_items.db"), 500))
+    print(generate_android_extraction(os.path.join(demo_dir, "extraction"), 8, 100))
@@ -0,0 +1,404 @@
+import os
+import sys
+import json
+import time
+import csv
+import random
+import shutil
+import sqlite3
+import argparse
+import subprocess
+import platform
+import resource
+import importlib.util
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generators import (generate_raw_image, generate_fs_image, generate_pcap, generate_messages_db,
+                                   generate_wal_database, generate_android_extraction)
+from log_sink import LogSink
+
+# --- Configuration & Constants ---
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIRECTORY = os.path.join(BENCHMARK_DIR, "data")        # Generated evidence, reused across runs
+RESULTS_DIRECTORY = os.path.join(BENCHMARK_DIR, "results")
+# Floors are ~60% of the slowest MB/s measured per tier (imaging: no dcfldd measurement yet); RSS ceilings ~1.5x measured
+THRESHOLDS_FILE = os.path.join(BENCHMARK_DIR, "thresholds.json")
+DEFAULT_TOLERANCE = 0.25  # Allowed slowdown / RSS growth against a --baseline result file
+MB = 1024 * 1024
+
+# Evidence sizes per tier
+SIZES = {
+    "small": {"raw_image_mb": 64, "fs_image_mb": 64, "fs_files": 2000, "pcap_packets": 200000,
+              "scapy_packets": 50000, "message_rows": 200000, "wal_rows": 5000, "android_databases": 40, "android_rows": 5000},
+    "medium": {"raw_image_mb": 1024, "fs_image_mb": 512, "fs_files": 20000, "pcap_packets": 2000000,
+               "scapy_packets": 200000, "message_rows": 2000000, "wal_rows": 50000, "android_databases": 200, "android_rows": 20000},
+    "large": {"raw_image_mb": 8192, "fs_image_mb": 4096, "fs_files": 200000, "pcap_packets": 20000000,
+              "scapy_packets": 1000000, "message_rows": 10000000, "wal_rows": 200000, "android_databases": 1000, "android_rows": 50000},
+}
+
+
+# --- Measurement Helpers (benchmark child process) ---
+def measure(func, *args):
+    """Runs func(*args) and returns (result, wall seconds, CPU seconds)."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = func(*args)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def outcome(seconds, cpu_seconds, bytes_processed, items, error=None):
+    return {"seconds": seconds, "cpu_seconds": cpu_seconds, "bytes": bytes_processed, "items": items, "error": error}
+
+
+# --- Benchmarks (each runs in its own process; setup is not timed) ---
+def bench_hashing(evidence, work_dir):
+    from acquisition import calculate_hash_from_file
+    raw = evidence["raw_image"]
+    digest, seconds, cpu = measure(calculate_hash_from_file, raw["path"], 'sha256')
+    return outcome(seconds, cpu, raw["size_bytes"], 1, None if digest else "hashing failed")
+
+
+def bench_imaging(evidence, work_dir):
+    from acquisition import perform_forensic_imaging
+    raw = evidence["raw_image"]
+    output = os.path.join(work_dir, "imaged.dd")
+    try:
+        (success, _), seconds, cpu = measure(perform_forensic_imaging, raw["path"], output, os.path.join(work_dir, "imaging.log"))
+    finally:
+        if os.path.exists(output):
+            os.remove(output)
+    return outcome(seconds, cpu, raw["size_bytes"], 1, None if success else "imaging reported failure")
+
+
+def bench_verification(evidence, work_dir):
+    from acquisition import verify_integrity
+    raw = evidence["raw_image"]
+    copy = os.path.join(work_dir, "verify_copy.dd")
+    shutil.copyfile(raw["path"], copy)
+    try:
+        matched, seconds, cpu = measure(verify_integrity, raw["path"], copy, os.path.join(work_dir, "verify.log"))
+    finally:
+        os.remove(copy)
+    return outcome(seconds, cpu, 2 * raw["size_bytes"], 2, None if matched else "hash mismatch on identical copy")
+
+
+def bench_carving(evidence, work_dir):
+    from analysis import perform_file_carving
+    raw = evidence["raw_image"]
+    output_dir = os.path.join(work_dir, "carved")
+    try:
+        carved, seconds, cpu = measure(perform_file_carving, raw["path"], output_dir)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    error = None if carved == raw["planted_total"] else f"carved {carved} files, {raw['planted_total']} planted"
+    return outcome(seconds, cpu, raw["size_bytes"], carved, error)
+
+
+def bench_fs_walk(evidence, work_dir):
+    from analysis import analyze_disk_image
+    fs_image = evidence["fs_image"]
+    _, seconds, cpu = measure(analyze_disk_image, fs_image["path"])
+    return outcome(seconds, cpu, fs_image["size_bytes"], fs_image["files"])
+
+
+def bench_pcap_scapy(evidence, work_dir):
+    from network_analysis import analyze_pcap_file
+    pcap = evidence["scapy_pcap"]
+    summary, seconds, cpu = measure(analyze_pcap_file, pcap["path"])
+    error = None if f"Total packets: {pcap['packets']}." in summary else summary
+    return outcome(seconds, cpu, pcap["size_bytes"], pcap["packets"], error)
+
+
+def bench_pcap_protocols(evidence, work_dir):
+    from protocol_extraction import extract_protocol_artifacts
+    pcap = evidence["pcap"]
+    db_path = os.path.join(work_dir, "protocol_artifacts.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    _, seconds, cpu = measure(extract_protocol_artifacts, pcap["path"], db_path)
+    conn = sqlite3.connect(db_path)
+    stored = conn.execute("SELECT COUNT(*) FROM protocol_artifacts").fetchone()[0]
+    conn.close()
+    os.remove(db_path)
+    error = None if stored == pcap["expected_artifacts"] else f"{stored} artifacts, {pcap['expected_artifacts']} expected"
+    return outcome(seconds, cpu, pcap["size_bytes"], pcap["packets"], error)
+
+
+def bench_android_database(evidence, work_dir):
+    from android_analysis import analyze_android_database
+    database = evidence["messages_db"]
+    summary, seconds, cpu = measure(analyze_android_database, database["path"])
+    error = summary if "ERROR" in str(summary) else None
+    return outcome(seconds, cpu, database["size_bytes"], database["rows"], error)
+
+
+def bench_sqlite_recovery(evidence, work_dir):
+    from sqlite_recovery import recover_deleted_records
+    database = evidence["wal_db"]
+    output_dir = os.path.join(work_dir, "recovered")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    try:
+        _, seconds, cpu = measure(recover_deleted_records, database["path"], output_dir)
+        csv_path = os.path.join(output_dir, "recovered_items.csv")
+        names = []
+        if os.path.exists(csv_path):
+            with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+                names = [row["name"] for row in csv.DictReader(f)]
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    # A live row in the output is a false deletion claim; a repeated one is a copy from another frame
+    deleted = set(database["deleted_names"])
+    live = [name for name in names if name not in deleted and name.startswith("item") and name[4:].isdigit()]
+    recovered = [name for name in names if name in deleted]
+    error = None
+    if live:
+        error = f"{len(live)} live rows reported as deleted (e.g. {live[0]})"
+    elif len(set(recovered)) != len(recovered):
+        error = f"{len(recovered) - len(set(recovered))} deleted rows were reported more than once"
+    return outcome(seconds, cpu, database["size_bytes"], len(names), error)
+
+
+def bench_android_extraction(evidence, work_dir):
+    from android_analysis import analyze_android_extraction
+    extraction = evidence["android_extraction"]
+    size = sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(extraction["path"]) for name in files)
+    summary, seconds, cpu = measure(analyze_android_extraction, extraction["path"])
+    # Rows that exist only in the -wal files must be counted too
+    error = None if f"({extraction['rows']} artifact rows)" in str(summary) else summary
+    return outcome(seconds, cpu, size, extraction["databases"], error)
+
+
+def run_cli_case(manifest):
+    """Runs cli.py on a case manifest in a child process. Returns (exit code, {event name: [events]})."""
+    completed = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "cli.py"), manifest],
+                               capture_output=True, text=True)
+    events = {}
+    for line in completed.stdout.splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        events.setdefault(event.get("event"), []).append(event)
+    return completed.returncode, events
+
+
+def bench_cli_case(evidence, work_dir):
+    """
+    Headless case run over a copy of the messages database plus a corrupt SQLite
+    file: the corrupt file's task must fail and the CLI must exit with
+    EXIT_TASK_FAILED. The copy then loses its DELETED rows and the case is run
+    again: the case store must hold only the new run's messages.
+    """
+    from cli import EXIT_TASK_FAILED
+    database = evidence["messages_db"]
+    case_dir = os.path.join(work_dir, "cli_case")
+    shutil.rmtree(case_dir, ignore_errors=True)
+    os.makedirs(case_dir)
+    messages = os.path.join(case_dir, "messages.db")
+    shutil.copyfile(database["path"], messages)
+    corrupt = os.path.join(case_dir, "corrupt.db")
+    with open(corrupt, 'wb') as f:
+        f.write(random.Random(database["rows"]).randbytes(64 * 1024))
+    manifest = os.path.join(case_dir, "case.json")
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump({"case_name": "bench_case", "android_databases": [messages, corrupt]}, f)
+
+    try:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        (exit_code, events), seconds, _ = measure(run_cli_case, manifest)
+        cpu = sum(getattr(resource.getrusage(resource.RUSAGE_CHILDREN), field) - getattr(usage, field)
+                  for field in ("ru_utime", "ru_stime"))
+
+        conn = sqlite3.connect(messages)
+        conn.execute("DELETE FROM messages WHERE status = 'DELETED'")
+        conn.commit()
+        conn.close()
+        _, rerun_events = run_cli_case(manifest)
+    finally:
+        shutil.rmtree(case_dir, ignore_errors=True)
+    failed = [event["name"] for event in events.get("finished", []) if event["state"] == "FAILED"]
+    stored = rerun_events.get("case_finished", [{}])[0].get("artifacts", {}).get("android_message")
+    expected = database["rows"] - database["deleted"]
+    error = None
+    if exit_code != EXIT_TASK_FAILED:
+        error = f"exit code {exit_code} with a corrupt evidence file, {EXIT_TASK_FAILED} expected"
+    elif failed != ["analyze_android_database"]:
+        error = f"failed tasks {failed}, only the corrupt database's expected"
+    elif stored != expected:
+        error = f"{stored} android_message artifacts after the evidence changed, {expected} expected"
+    return outcome(seconds, cpu, database["size_bytes"], database["rows"], error)
+
+
+# name -> (function, evidence it needs, Python packages, external tools)
+BENCHMARKS = {
+    "hashing": (bench_hashing, ["raw_image"], [], []),
+    "imaging": (bench_imaging, ["raw_image"], [], ["dcfldd"]),
+    "verification": (bench_verification, ["raw_image"], [], []),
+    "carving": (bench_carving, ["raw_image"], [], []),
+    "fs_walk": (bench_fs_walk, ["fs_image"], ["pytsk3"], []),
+    "pcap_scapy": (bench_pcap_scapy, ["scapy_pcap"], ["scapy"], []),
+    "pcap_protocols": (bench_pcap_protocols, ["pcap"], [], []),
+    "android_database": (bench_android_database, ["messages_db"], [], []),
+    "sqlite_recovery": (bench_sqlite_recovery, ["wal_db"], [], []),
+    "android_extraction": (bench_android_extraction, ["android_extraction"], [], []),
+    "cli_case": (bench_cli_case, ["messages_db"], [], []),
+}
+
+
+def run_benchmark(name, evidence, work_dir):
+    """Child-process entry point: runs one benchmark with module output sent to a log file."""
+    func = BENCHMARKS[name][0]
+    log_sink = LogSink(os.path.join(work_dir, f"{name}.log"))
+    sys.stdout = log_sink
+    try:
+        result = func(evidence, work_dir)
+    except Exception as e:
+        result = outcome(0.0, 0.0, 0, 0, f"{type(e).__name__}: {e}")
+    finally:
+        sys.stdout = sys.__stdout__
+        log_sink.close()
+    # ru_maxrss is in KB on Linux; a fresh process per benchmark makes it that benchmark's peak
+    # (external tools such as dcfldd run as children and are counted separately)
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    result["peak_rss_mb"] = peak_kb / 1024
+    return result
+
+
+# --- Evidence ---
+def prepare_evidence(names, size, data_dir):
+    """Generates (or reuses) the evidence the selected benchmarks need."""
+    tier = SIZES[size]
+    needed = {key for name in names for key in BENCHMARKS[name][1]}
+    os.makedirs(data_dir, exist_ok=True)
+    evidence = {}
+    if "raw_image" in needed:
+        evidence["raw_image"] = generate_raw_image(os.path.join(data_dir, f"raw_{tier['raw_image_mb']}mb.dd"), tier["raw_image_mb"])
+    if "fs_image" in needed:
+        evidence["fs_image"] = generate_fs_image(os.path.join(data_dir, f"ext4_{tier['fs_files']}files.img"),
+                                                 tier["fs_image_mb"], tier["fs_files"])
+    if "pcap" in needed:
+        evidence["pcap"] = generate_pcap(os.path.join(data_dir, f"flows_{tier['pcap_packets']}.pcap"), tier["pcap_packets"])
+    if "scapy_pcap" in needed:
+        evidence["scapy_pcap"] = generate_pcap(os.path.join(data_dir, f"flows_{tier['scapy_packets']}.pcap"), tier["scapy_packets"])
+    if "messages_db" in needed:
+        evidence["messages_db"] = generate_messages_db(os.path.join(data_dir, f"messages_{tier['message_rows']}.db"), tier["message_rows"])
+    if "wal_db" in needed:
+        evidence["wal_db"] = generate_wal_database(os.path.join(data_dir, f"wal_items_{tier['wal_rows']}.db"), tier["wal_rows"])
+    if "android_extraction" in needed:
+        evidence["android_extraction"] = generate_android_extraction(
+            os.path.join(data_dir, f"extraction_{tier['android_databases']}x{tier['android_rows']}"),
+            tier["android_databases"], tier["android_rows"])
+    return evidence
+
+
+def skip_reason(name, evidence):
+    _, needs, packages, tools = BENCHMARKS[name]
+    missing = [f"package {package}" for package in packages if importlib.util.find_spec(package) is None]
+    missing += [f"tool {tool}" for tool in tools if shutil.which(tool) is None]
+    missing += [f"{key} evidence" for key in needs if not evidence.get(key)]
+    return f"missing {', '.join(missing)}" if missing else None
+
+
+# --- Regression Checks ---
+def find_regressions(results, size, thresholds, baseline, tolerance):
+    """Returns a failure message per benchmark that errored or regressed past a threshold or the baseline."""
+    failures = []
+    limits = thresholds.get(size, {})
+    previous = {result["name"]: result for result in (baseline or {}).get("results", []) if result.get("status") == "ok"}
+    for result in results:
+        name = result["name"]
+        if result["status"] == "skipped":
+            continue
+        if result["status"] != "ok":
+            failures.append(f"{name}: {result['error']}")
+            continue
+        limit = limits.get(name, {})
+        if "min_mb_per_s" in limit and result["mb_per_s"] < limit["min_mb_per_s"]:
+            failures.append(f"{name}: {result['mb_per_s']:.1f} MB/s is below the {limit['min_mb_per_s']} MB/s threshold")
+        if "max_peak_rss_mb" in limit and result["peak_rss_mb"] > limit["max_peak_rss_mb"]:
+            failures.append(f"{name}: peak RSS {result['peak_rss_mb']:.0f} MB exceeds the {limit['max_peak_rss_mb']} MB threshold")
+        if name in previous:
+            before = previous[name]
+            if result["mb_per_s"] < before["mb_per_s"] * (1 - tolerance):
+                failures.append(f"{name}: {result['mb_per_s']:.1f} MB/s regressed from {before['mb_per_s']:.1f} MB/s (baseline)")
+            if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+                failures.append(f"{name}: peak RSS {result['peak_rss_mb']:.0f} MB grew from {before['peak_rss_mb']:.0f} MB (baseline)")
+    return failures
+
+
+# --- Entry Point ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the analysis backends on deterministic synthetic evidence.")
+    parser.add_argument("--size", choices=list(SIZES), default="small", help="Evidence size tier (default: small)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--data-dir", default=DATA_DIRECTORY, help="Where generated evidence is kept and reused")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/<size>_<time>.json)")
+    parser.add_argument("--baseline", default=None, help="Earlier result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed regression against the baseline (fraction)")
+    parser.add_argument("--no-thresholds", action="store_true", help=f"Ignore {os.path.basename(THRESHOLDS_FILE)}")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    evidence = prepare_evidence(names, args.size, args.data_dir)
+    work_dir = os.path.join(args.data_dir, "work")
+    os.makedirs(work_dir, exist_ok=True)
+
+    print(f"\n[--- BENCHMARKS ({args.size}) ---]")
+    print(f"{'benchmark':<20} {'seconds':>9} {'MB/s':>9} {'items/s':>11} {'peak RSS':>10}  status")
+    results = []
+    spawn = multiprocessing.get_context("spawn")
+    for name in names:
+        result = {"name": name}
+        reason = skip_reason(name, evidence)
+        if reason:
+            result.update(status="skipped", error=reason)
+            print(f"{name:<20} {'-':>9} {'-':>9} {'-':>11} {'-':>10}  skipped ({reason})")
+            results.append(result)
+            continue
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            result.update(pool.submit(run_benchmark, name, {key: evidence[key] for key in BENCHMARKS[name][1]}, work_dir).result())
+        seconds = max(result["seconds"], 1e-9)
+        result["mb_per_s"] = result["bytes"] / MB / seconds
+        result["items_per_s"] = result["items"] / seconds
+        result["status"] = "ok" if result["error"] is None else "failed"
+        status = "ok" if result["error"] is None else f"FAILED ({result['error']})"
+        print(f"{name:<20} {result['seconds']:>9.2f} {result['mb_per_s']:>9.1f} {result['items_per_s']:>11.0f} "
+              f"{result['peak_rss_mb']:>7.0f} MB  {status}")
+        results.append(result)
+
+    report = {
+        "size": args.size,
+        "tier": SIZES[args.size],
+        "time": datetime.now().isoformat(timespec='seconds'),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"{args.size}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    thresholds = {}
+    if not args.no_thresholds and os.path.exists(THRESHOLDS_FILE):
+        with open(THRESHOLDS_FILE, 'r', encoding='utf-8') as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    failures = find_regressions(results, args.size, thresholds, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
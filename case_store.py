@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import pathlib
+import threading
+from datetime import datetime, timezone
+
+from task_scheduler import TaskCancelled, report_progress
+
+# --- Configuration & Constants ---
+CASE_DB_NAME = "case.db"
+INSERT_BATCH_SIZE = 5000  # Artifact rows per executemany()
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS evidence (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    module TEXT NOT NULL,
+    evidence TEXT NOT NULL,       -- JSON list of evidence paths
+    evidence_hash TEXT NOT NULL,  -- Combined hash of the evidence contents
+    params TEXT NOT NULL,         -- JSON of the call arguments
+    status TEXT NOT NULL,         -- RUNNING, DONE, FAILED, CANCELLED, SUPERSEDED
+    result TEXT,                  -- JSON of the module's return value
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_key ON runs (module, evidence_hash, params);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    ts TEXT,                      -- 'YYYY-MM-DD HH:MM:SS' UTC when the artifact has a time
+    data TEXT NOT NULL            -- JSON object
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_kind ON artifacts (kind, ts);
+CREATE INDEX IF NOT EXISTS idx_artifacts_run ON artifacts (run_id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_ts ON artifacts (ts);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    data TEXT NOT NULL            -- JSON of the stage metrics (times, bytes, items, throughput, memory)
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_run ON metrics (run_id);
+CREATE TABLE IF NOT EXISTS outputs (
+    run_id INTEGER NOT NULL,
+    path TEXT NOT NULL            -- File or directory the run wrote (CSV exports, artifact DBs, carved files)
+);
+CREATE INDEX IF NOT EXISTS idx_outputs_run ON outputs (run_id);
+"""
+
+_context = threading.local()
+
+
+# --- Module-Facing API (no-ops unless a recorded run is active on this thread) ---
+def recording():
+    """True when artifacts emitted on this thread are stored (lets modules skip extra work otherwise)."""
+    return getattr(_context, 'run', None) is not None
+
+
+def emit_artifacts(kind, rows, time_field=None):
+    """
+    Stores structured artifact rows (dicts) for the run active on this thread.
+    time_field names the key holding the artifact's time: epoch seconds or an
+    ISO-style string; it is normalised into the indexed ts column.
+    """
+    run = getattr(_context, 'run', None)
+    if run is None or not rows:
+        return
+    store, run_id = run
+    store.add_artifacts(run_id, kind, rows, time_field)
+
+
+def record_metrics(metrics):
+    """Saves one stage's performance metrics (see instrumentation.Stage) with the run active on this thread."""
+    run = getattr(_context, 'run', None)
+    if run is None:
+        return
+    store, run_id = run
+    store.add_metrics(run_id, metrics)
+
+
+def record_outputs(paths):
+    """Notes files or directories written by the run active on this thread; reuse requires them to still exist."""
+    run = getattr(_context, 'run', None)
+    if run is None:
+        return
+    store, run_id = run
+    store.add_outputs(run_id, paths)
+
+
+def normalise_timestamp(value):
+    """
+    Epoch seconds / datetime / ISO string -> 'YYYY-MM-DD HH:MM:SS' (UTC), or None.
+    Times with a UTC offset are converted; naive times are taken as UTC.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not isinstance(value, datetime):
+        text = str(value).strip()
+        try:
+            value = datetime.fromisoformat(text)
+        except ValueError:
+            return text[:19]  # Not ISO 8601: kept as text, cut to the same width
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+# --- Case Store ---
+class CaseStore:
+    """
+    Per-case SQLite store of structured artifacts and analysis runs.
+
+    Runs are keyed by module, evidence content hash and call parameters: record()
+    returns the stored result instead of re-running a module whose inputs did not
+    change. Evidence hashes are cached against file size and mtime, so re-opening
+    a case does not re-hash unchanged images.
+
+    reader=True opens an existing store read-only (SQLite mode=ro) for queries
+    (reports, timelines) while the application that owns it may still be running
+    analyses; it never writes to the case database.
+    """
+
+    def __init__(self, db_path, reader=False):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        if reader:
+            self.conn = self.connect_readonly(check_same_thread=False)
+            return
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        # One connection shared by all job threads; writes are serialised by the lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(STORE_SCHEMA)
+        # Runs left RUNNING by a crash or kill never finished
+        with self.lock:
+            self.conn.execute("UPDATE runs SET status = 'FAILED' WHERE status = 'RUNNING'")
+            self.conn.commit()
+
+    def connect_readonly(self, **kwargs):
+        """Opens a connection that cannot write to the store (SQLite URI mode=ro)."""
+        uri = pathlib.Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True, **kwargs)
+
+    # --- Evidence Hashing ---
+    def evidence_hash(self, path):
+        """SHA-256 of a file (or of a directory's file listing), cached by size and mtime."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock:
+            cached = self.conn.execute("SELECT size, mtime_ns, sha256 FROM evidence WHERE path = ?", (path,)).fetchone()
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        if os.path.isdir(path):
+            digest = self.directory_digest(path)
+        else:
+            from acquisition import calculate_hash_from_file
+            report_progress(f"Hashing evidence {os.path.basename(path)}")
+            digest = calculate_hash_from_file(path, 'sha256')
+            if digest is None:
+                raise OSError(f"Cannot hash evidence file {path}")
+
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO evidence VALUES (?, ?, ?, ?)", (path, stat.st_size, stat.st_mtime_ns, digest))
+            self.conn.commit()
+        return digest
+
+    def directory_digest(self, path):
+        """Directories (phone extractions) are keyed by their file listing: relative path, size, mtime."""
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                try:
+                    stat = os.stat(full)
+                except OSError:
+                    continue
+                digest.update(f"{os.path.relpath(full, path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8', 'replace'))
+        return digest.hexdigest()
+
+    # --- Runs ---
+    def run_key(self, module, evidence, args):
+        combined = hashlib.sha256("\n".join(self.evidence_hash(path) for path in evidence).encode()).hexdigest()
+        params = json.dumps(args, default=str, sort_keys=True)
+        return combined, params
+
+    def find_run(self, module, evidence_hash, params):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, result FROM runs WHERE module = ? AND evidence_hash = ? AND params = ? AND status = 'DONE' "
+                "ORDER BY id DESC LIMIT 1", (module, evidence_hash, params)).fetchone()
+        return row
+
+    def begin_run(self, module, evidence, evidence_hash, params):
+        """
+        Opens a run. Earlier runs of the module over the same evidence paths with the
+        same parameters are superseded whatever their evidence hash: when the evidence
+        changed, only the new run's artifacts stay live. Other parameters are kept.
+        """
+        evidence_json = json.dumps([os.path.abspath(path) for path in evidence])
+        with self.lock:
+            previous = [row[0] for row in self.conn.execute(
+                "SELECT id FROM runs WHERE module = ? AND evidence = ? AND params = ? AND status != 'SUPERSEDED'",
+                (module, evidence_json, params))]
+            for run_id in previous:
+                self.conn.execute("DELETE FROM artifacts WHERE run_id = ?", (run_id,))
+                self.conn.execute("DELETE FROM metrics WHERE run_id = ?", (run_id,))
+                self.conn.execute("DELETE FROM outputs WHERE run_id = ?", (run_id,))
+                self.conn.execute("UPDATE runs SET status = 'SUPERSEDED' WHERE id = ?", (run_id,))
+            cursor = self.conn.execute(
+                "INSERT INTO runs (module, evidence, evidence_hash, params, status, started) VALUES (?, ?, ?, ?, 'RUNNING', ?)",
+                (module, evidence_json, evidence_hash, params, time.time()))
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def finish_run(self, run_id, status, result):
+        with self.lock:
+            self.conn.execute("UPDATE runs SET status = ?, result = ?, finished = ? WHERE id = ?",
+                              (status, json.dumps(result, default=str), time.time(), run_id))
+            self.conn.commit()
+
+    def record(self, module, evidence, func, *args):
+        """
+        Scheduler job body: runs func(*args) as a recorded run of module over the
+        evidence paths, or returns the stored result when the same module already
+        completed on identical evidence with identical arguments and the files it
+        wrote (record_outputs) are all still present. A run whose module returned
+        an error result is stored as FAILED and is never reused.
+        """
+        from backends import result_failure
+        evidence_hash, params = self.run_key(module, evidence, args)
+        previous = self.find_run(module, evidence_hash, params)
+        # Stores written before error results were marked FAILED may hold them as DONE
+        if previous is not None and result_failure(json.loads(previous[1]) if previous[1] is not None else None):
+            previous = None
+        if previous is not None:
+            missing = self.missing_outputs(previous[0])
+            if not missing:
+                print(f"[Case] {module}: evidence and parameters unchanged, reusing stored results (run {previous[0]}).")
+                report_progress("unchanged input; reusing stored results")
+                return json.loads(previous[1]) if previous[1] is not None else None
+            print(f"[Case] {module}: {len(missing)} output(s) of run {previous[0]} no longer exist "
+                  f"(e.g. {missing[0]}); running it again.")
+
+        run_id = self.begin_run(module, evidence, evidence_hash, params)
+        _context.run = (self, run_id)
+        try:
+            result = func(*args)
+        except TaskCancelled as e:
+            self.finish_run(run_id, "CANCELLED", str(e))
+            raise
+        except BaseException as e:
+            self.finish_run(run_id, "FAILED", str(e))
+            raise
+        finally:
+            _context.run = None
+        if result_failure(result) is not None:
+            print(f"[Case] {module}: the module reported a failure; run {run_id} is stored as FAILED and will not be reused.")
+            self.finish_run(run_id, "FAILED", result)
+        else:
+            self.finish_run(run_id, "DONE", result)
+        return result
+
+    # --- Artifacts ---
+    def add_artifacts(self, run_id, kind, rows, time_field=None):
+        records = [
+            (run_id, kind, normalise_timestamp(row.get(time_field)) if time_field else None, json.dumps(row, default=str))
+            for row in rows
+        ]
+        with self.lock:
+            for start in range(0, len(records), INSERT_BATCH_SIZE):
+                self.conn.executemany("INSERT INTO artifacts VALUES (?, ?, ?, ?)", records[start:start + INSERT_BATCH_SIZE])
+            self.conn.commit()
+
+    def add_outputs(self, run_id, paths):
+        with self.lock:
+            self.conn.executemany("INSERT INTO outputs VALUES (?, ?)", [(run_id, os.path.abspath(path)) for path in paths])
+            self.conn.commit()
+
+    def missing_outputs(self, run_id):
+        with self.lock:
+            paths = [row[0] for row in self.conn.execute("SELECT path FROM outputs WHERE run_id = ?", (run_id,))]
+        return [path for path in paths if not os.path.exists(path)]
+
+    def add_metrics(self, run_id, metrics):
+        with self.lock:
+            self.conn.execute("INSERT INTO metrics VALUES (?, ?, ?)", (run_id, metrics["stage"], json.dumps(metrics)))
+            self.conn.commit()
+
+    def stage_metrics(self):
+        """(module, metrics dict) of every stage of the current runs, in run order."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT runs.module, metrics.data FROM metrics JOIN runs ON runs.id = metrics.run_id "
+                "WHERE runs.status != 'SUPERSEDED' ORDER BY metrics.rowid").fetchall()
+        return [(module, json.loads(data)) for module, data in rows]
+
+    def artifact_counts(self):
+        """{kind: rows} over all current runs."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT kind, COUNT(*) FROM artifacts GROUP BY kind ORDER BY kind").fetchall())
+
+    def runs(self):
+        """Latest non-superseded runs as (id, module, evidence, status, result, started, finished)."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, module, evidence, status, result, started, finished FROM runs "
+                "WHERE status != 'SUPERSEDED' ORDER BY id").fetchall()
+
+    def iter_artifacts(self, kind=None, start=None, end=None, batch_size=INSERT_BATCH_SIZE):
+        """Streams (kind, ts, data dict) ordered by time, optionally filtered by kind and [start, end]."""
+        clauses, params = [], []
+        if kind is not None:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # A separate read-only connection lets job threads keep writing while this is consumed
+        conn = self.connect_readonly()
+        try:
+            cursor = conn.execute(f"SELECT kind, ts, data FROM artifacts {where} ORDER BY ts", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row_kind, ts, data in rows:
+                    yield row_kind, ts, json.loads(data)
+        finally:
+            conn.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,332 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+from case_store import CaseStore, CASE_DB_NAME
+from instrumentation import enable_memory_tracing, profile_path_for, profiled
+from backends import availability_report, missing_requirements, run_backend, run_pipeline_step
+from log_sink import LogSink
+from plugin_runtime import PluginRuntime, PLUGIN_WORKERS, discover_plugins
+from task_scheduler import TaskScheduler, CPU_SLOTS, DONE, FAILED, CANCELLED, disk_resource, thread_runner
+
+# --- Configuration & Constants ---
+# Case manifest keys and what they hold (paths are relative to the manifest file):
+#   case_name            report / output naming (default: manifest file name)
+#   output_dir           where the case store, carved files, artifact DBs, message exports, logs and the report go
+#                        (default: <case_name>_output); re-running a manifest skips unchanged work
+#   images               [{"path": image, "source": original device/file (optional, enables verification),
+#                          "log": imaging hash log (optional)}] or plain paths
+#   hives                [{"path": hive, "name": "SYSTEM"}] or plain paths
+#   memory_dumps, pcaps, android_extractions, android_databases, sqlite_databases   lists of paths
+#   plugins              plugin names to run against every image
+#   timeline             true to build a super timeline from the case store once all tasks finish
+MANIFEST_LISTS = ("images", "hives", "memory_dumps", "pcaps", "android_extractions", "android_databases",
+                  "sqlite_databases", "plugins")
+
+EXIT_OK = 0
+EXIT_TASK_FAILED = 1
+EXIT_BAD_MANIFEST = 2
+
+
+class JsonProgress:
+    """Writes one JSON object per line to the real stdout (module prints go to the log file)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.__stdout__
+        self.lock = threading.Lock()
+        self.started = {}
+
+    def event(self, event, **fields):
+        record = {"event": event, "time": round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def job_started(self, job):
+        self.started[job.id] = time.time()
+        self.event("started", job=job.id, name=job.name)
+
+    def job_progress(self, job, message):
+        self.event("progress", job=job.id, name=job.name, message=message)
+
+    def job_finished(self, job):
+        elapsed = time.time() - self.started[job.id] if job.id in self.started else None
+        self.event("finished", job=job.id, name=job.name, state=job.state,
+                   result=job.result if job.state == DONE else None,
+                   error=str(job.error) if job.error is not None else None,
+                   seconds=round(elapsed, 3) if elapsed is not None else None, metrics=job.metrics)
+
+
+# --- Manifest Handling ---
+def load_manifest(manifest_path):
+    """Reads the case manifest and resolves every evidence path against the manifest's directory."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict):
+        raise ValueError("manifest must be a JSON object")
+
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    resolve = lambda path: os.path.normpath(os.path.join(base, os.path.expanduser(path)))
+
+    manifest.setdefault("case_name", os.path.splitext(os.path.basename(manifest_path))[0])
+    manifest["output_dir"] = resolve(manifest.get("output_dir", f"{manifest['case_name']}_output"))
+    for key in MANIFEST_LISTS:
+        manifest.setdefault(key, [])
+        if not isinstance(manifest[key], list):
+            raise ValueError(f"'{key}' must be a list")
+
+    manifest["images"] = [entry if isinstance(entry, dict) else {"path": entry} for entry in manifest["images"]]
+    for image in manifest["images"]:
+        image["path"] = resolve(image["path"])
+        if image.get("source"):
+            image["source"] = resolve(image["source"])
+            image["log"] = resolve(image.get("log", image["path"] + ".log"))
+
+    manifest["hives"] = [entry if isinstance(entry, dict) else {"path": entry} for entry in manifest["hives"]]
+    for hive in manifest["hives"]:
+        hive["path"] = resolve(hive["path"])
+        hive.setdefault("name", os.path.basename(hive["path"]).upper())
+
+    for key in ("memory_dumps", "pcaps", "android_extractions", "android_databases", "sqlite_databases"):
+        manifest[key] = [resolve(path) for path in manifest[key]]
+
+    missing = [entry["path"] for entry in manifest["images"] + manifest["hives"] if not os.path.exists(entry["path"])]
+    missing += [path for key in ("memory_dumps", "pcaps", "android_extractions", "android_databases", "sqlite_databases")
+                for path in manifest[key] if not os.path.exists(path)]
+    if missing:
+        raise ValueError(f"evidence not found: {', '.join(missing)}")
+    return manifest
+
+
+def stem(path):
+    return os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+
+
+# --- Pipeline ---
+class CasePipeline:
+    """Queues every analysis a case manifest asks for and collects the results for the report."""
+
+    def __init__(self, manifest, progress, workers=None, profile=()):
+        self.manifest = manifest
+        self.progress = progress
+        self.profile = set(profile)  # Backend / plugin names whose runs are profiled with cProfile
+        limits = {"cpu": workers or CPU_SLOTS, "plugin": PLUGIN_WORKERS}
+        self.scheduler = TaskScheduler(limits=limits, runner=self.run_job)
+        self.plugin_runtime = None
+        self.store = CaseStore(os.path.join(manifest["output_dir"], CASE_DB_NAME))
+        self.jobs = {}  # report section -> [jobs]
+        self.deferred = []  # Jobs that became runnable while the case was still being queued
+
+    def run_job(self, job, done):
+        if self.deferred is not None:
+            self.deferred.append((job, done))
+            return
+        self.progress.job_started(job)
+        thread_runner(job, done)
+
+    def start(self):
+        """Starts the jobs that became runnable while the case was being queued (keeps the event stream ordered)."""
+        deferred, self.deferred = self.deferred, None
+        for job, done in deferred:
+            self.run_job(job, done)
+
+    def body(self, name, func, *args):
+        """Recorded call of a job: func(*args), under cProfile when the name was passed to --profile."""
+        if name in self.profile:
+            return (profiled, profile_path_for(name), func) + args
+        return (func,) + args
+
+    def submit(self, section, backend, *args, evidence=(), depends_on=(), checked=False):
+        """
+        Queues a backend if it can run here; unavailable backends are reported as skipped.
+        Error results fail the job (run_pipeline_step), so they count towards EXIT_TASK_FAILED.
+        checked=True marks a verification step, whose run is keyed on the image only.
+        """
+        missing = [item for item in missing_requirements(backend) if not item.startswith("tool ")]
+        if missing:
+            self.progress.event("skipped", name=backend, reason=f"missing {', '.join(missing)}")
+            return None
+        resources = [disk_resource(path) for path in evidence] + ["cpu"]
+        # Runs are keyed on the analysed evidence (for verification: the image, not the source device)
+        recorded = evidence[-1:] if checked else list(evidence)
+        job = self.scheduler.submit(self.store.record, backend, recorded,
+                                    *self.body(backend, run_pipeline_step, backend, *args),
+                                    name=backend, resources=resources,
+                                    depends_on=[dep for dep in depends_on if dep is not None],
+                                    on_finished=self.progress.job_finished, on_progress=self.progress.job_progress)
+        self.progress.event("queued", job=job.id, name=job.name, evidence=list(evidence))
+        self.jobs.setdefault(section, []).append(job)
+        return job
+
+    def queue_case(self):
+        manifest = self.manifest
+        output_dir = manifest["output_dir"]
+
+        plugins = {}
+        if manifest["plugins"]:
+            available = discover_plugins()
+            for name in manifest["plugins"]:
+                if name not in available or available[name]["missing"]:
+                    self.progress.event("skipped", name=name, reason="plugin not found or missing requirements")
+                else:
+                    plugins[name] = available[name]
+            if plugins:
+                self.plugin_runtime = PluginRuntime()
+
+        for image in manifest["images"]:
+            path = image["path"]
+            verify = None
+            if image.get("source"):
+                # Analysis of an image waits for its hash verification and is cancelled if it fails
+                verify = self.submit("verification", "verify_integrity", image["source"], path, image["log"],
+                                     evidence=[image["source"], path], checked=True)
+            self.submit("filesystem", "analyze_disk_image", path, evidence=[path], depends_on=[verify])
+            self.submit("carving", "perform_file_carving", path, os.path.join(output_dir, "carved", stem(path)),
+                        evidence=[path], depends_on=[verify])
+            for name, plugin in plugins.items():
+                job = self.scheduler.submit(self.store.record, name, [path],
+                                            *self.body(name, self.plugin_runtime.run, plugin, path,
+                                                       os.path.join(output_dir, "plugins", stem(path))),
+                                            name=name, resources=[disk_resource(path), "plugin"],
+                                            depends_on=[verify] if verify is not None else [],
+                                            on_finished=self.progress.job_finished, on_progress=self.progress.job_progress)
+                self.progress.event("queued", job=job.id, name=name, evidence=[path])
+                self.jobs.setdefault("plugins", []).append(job)
+
+        for hive in manifest["hives"]:
+            self.submit("registry", "analyze_registry_hive", hive["path"], hive["name"], evidence=[hive["path"]])
+        for dump in manifest["memory_dumps"]:
+            self.submit("memory", "analyze_memory_dump", dump, evidence=[dump])
+        for pcap in manifest["pcaps"]:
+            self.submit("network", "analyze_pcap_file", pcap, evidence=[pcap])
+            self.submit("protocols", "extract_protocol_artifacts", pcap,
+                        os.path.join(output_dir, f"{stem(pcap)}_artifacts.db"), evidence=[pcap])
+        for extraction in manifest["android_extractions"]:
+            self.submit("android", "analyze_android_extraction", extraction, evidence=[extraction])
+        for database in manifest["android_databases"]:
+            self.submit("android", "analyze_android_database", database,
+                        os.path.join(output_dir, "android", f"{stem(database)}_messages.csv"), evidence=[database])
+        for database in manifest["sqlite_databases"]:
+            self.submit("recovery", "recover_deleted_records", database,
+                        os.path.join(output_dir, "recovered", stem(database)), evidence=[database])
+
+    def summary(self, section):
+        """Joins the result strings of a report section ('' when nothing ran)."""
+        lines = []
+        for job in self.jobs.get(section, []):
+            if job.state == DONE:
+                lines.append(str(job.result))
+            else:
+                lines.append(f"{job.name} {job.state.lower()}: {job.error}")
+        return " ".join(lines)
+
+    def report_data(self):
+        carved = sum(job.result or 0 for job in self.jobs.get("carving", []) if job.state == DONE)
+        return {
+            'CaseID': self.manifest["case_name"],
+            'AcquisitionTime': self.manifest.get("acquisition_time", 'N/A'),
+            'SourceHash': self.manifest.get("source_hash", 'N/A'),
+            'CarvedCount': carved,
+            'RegistrySummary': self.summary("registry") or 'No Registry Analysis performed.',
+            'MemorySummary': self.summary("memory") or 'No Memory Analysis performed.',
+            'NetworkSummary': self.summary("network"),
+            'ProtocolSummary': self.summary("protocols"),
+            'AndroidSummary': self.summary("android"),
+            'RecoverySummary': self.summary("recovery"),
+            'PluginSummary': self.summary("plugins"),
+            'CaseStorePath': self.store.db_path,
+        }
+
+    def close(self):
+        if self.plugin_runtime is not None:
+            self.plugin_runtime.shutdown()
+        self.store.close()
+
+
+# --- Entry Point ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a full forensic case pipeline headless from a JSON case manifest.")
+    parser.add_argument("manifest", nargs="?", help="Path to the case manifest (.json)")
+    parser.add_argument("--workers", type=int, default=None, help=f"Concurrent CPU-bound tasks (default: {CPU_SLOTS})")
+    parser.add_argument("--log-file", default=None, help="Module console output (default: <output_dir>/logs/)")
+    parser.add_argument("--profile", nargs="+", default=[], metavar="NAME",
+                        help="cProfile these backends/plugins (stats go to <output_dir>/profiles/)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Report the peak Python heap of every stage (tracemalloc; slower)")
+    parser.add_argument("--list-backends", action="store_true", help="Print backend availability and exit")
+    args = parser.parse_args(argv)
+    # Relative paths on the command line refer to the caller's directory (the run changes into output_dir)
+    if args.log_file:
+        args.log_file = os.path.abspath(args.log_file)
+
+    progress = JsonProgress()
+    if args.list_backends:
+        for line in availability_report():
+            print(line)
+        return EXIT_OK
+    if not args.manifest:
+        parser.error("a case manifest is required")
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        progress.event("error", message=f"Invalid case manifest: {e}")
+        return EXIT_BAD_MANIFEST
+
+    # Relative outputs of the modules (reports, plugin_output, ...) land in the case directory
+    os.makedirs(manifest["output_dir"], exist_ok=True)
+    os.chdir(manifest["output_dir"])
+    log_sink = LogSink(args.log_file)
+    sys.stdout = sys.stderr = log_sink
+
+    if args.trace_memory:
+        enable_memory_tracing()
+    pipeline = CasePipeline(manifest, progress, args.workers, args.profile)
+    progress.event("case_started", case=manifest["case_name"], output_dir=manifest["output_dir"], log_file=log_sink.log_path)
+    try:
+        pipeline.queue_case()
+        pipeline.start()
+        pipeline.scheduler.wait()
+
+        if manifest.get("timeline"):
+            # Runs after every task so the store holds all artifacts; file system times come from recorded listings
+            try:
+                timeline = run_backend("generate_super_timeline", None, os.path.join(manifest["output_dir"], "timeline"),
+                                       pipeline.store.db_path)
+                progress.event("timeline", result=timeline)
+            except Exception as e:
+                progress.event("error", message=f"Timeline generation failed: {e}")
+
+        report = None
+        if not missing_requirements("generate_forensic_report"):
+            try:
+                report = run_backend("generate_forensic_report", manifest["case_name"], pipeline.report_data())
+            except Exception as e:
+                progress.event("error", message=f"Report generation failed: {e}")
+        else:
+            progress.event("skipped", name="generate_forensic_report", reason="missing reportlab")
+
+        states = {}
+        for job in pipeline.scheduler.snapshot():
+            states[job.state] = states.get(job.state, 0) + 1
+        progress.event("case_finished", case=manifest["case_name"], jobs=states, artifacts=pipeline.store.artifact_counts(),
+                       report=os.path.abspath(report) if report else None)
+        return EXIT_TASK_FAILED if states.get(FAILED) or states.get(CANCELLED) else EXIT_OK
+    except KeyboardInterrupt:
+        pipeline.scheduler.cancel_all()
+        pipeline.scheduler.wait(timeout=30)
+        progress.event("case_cancelled", case=manifest["case_name"])
+        return EXIT_TASK_FAILED
+    finally:
+        pipeline.close()
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        log_sink.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource  # Unix only; peak RSS is reported as unavailable elsewhere
+except ImportError:
+    resource = None
+
+from case_store import record_metrics
+from task_scheduler import current_job, report_progress
+
+# --- Configuration & Constants ---
+LIVE_INTERVAL = 1.0          # Seconds between live throughput updates of a running stage
+PROFILE_DIRECTORY = "profiles"
+PROFILE_TOP_FUNCTIONS = 25   # Functions listed in the console after a profiled task
+MB = 1024 * 1024
+
+_context = threading.local()
+
+
+# --- Memory ---
+def rss_mb():
+    """Current resident set size of the process in MB (None where it cannot be read)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """High-water resident set size of the process in MB (None where it cannot be read)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB on Linux
+
+
+def enable_memory_tracing():
+    """Starts tracemalloc so stages also report the peak Python heap (slows allocation-heavy code)."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable_memory_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+# --- Stages ---
+class Stage:
+    """
+    Measures one analysis stage: wall and CPU time, bytes read, items processed,
+    throughput and memory. Modules report work with add_throughput(); running
+    totals go to the job's progress listener (the GUI status bar) every
+    LIVE_INTERVAL seconds. On exit the metrics are printed, attached to the
+    current job and saved with the case when the run is recorded. Totals of a
+    nested stage roll up into the enclosing one.
+
+    CPU time is that of the stage's own thread. The traced heap peak is
+    process-wide, so concurrent jobs are included in it.
+    """
+
+    def __init__(self, name, total_bytes=None):
+        self.name = name
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.items = 0
+        self.traced_peak = 0
+        self.metrics = None
+
+    def __enter__(self):
+        stages = getattr(_context, 'stages', None)
+        if stages is None:
+            stages = _context.stages = []
+        stages.append(self)
+        self.start_rss = rss_mb()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.next_report = time.monotonic() + LIVE_INTERVAL
+        self.start_cpu = time.thread_time()
+        self.start_wall = time.perf_counter()
+        return self
+
+    def add(self, bytes_read=0, items=0):
+        self.bytes_read += bytes_read
+        self.items += items
+        now = time.monotonic()
+        if now >= self.next_report:
+            self.next_report = now + LIVE_INTERVAL
+            report_progress(self.status())
+
+    def status(self):
+        elapsed = max(time.perf_counter() - self.start_wall, 1e-9)
+        parts = []
+        if self.bytes_read:
+            total = f" of {self.total_bytes / MB:.0f}" if self.total_bytes else ""
+            parts.append(f"{self.bytes_read / MB:.0f}{total} MB at {self.bytes_read / MB / elapsed:.1f} MB/s")
+        if self.items:
+            parts.append(f"{self.items} items at {self.items / elapsed:.0f}/s")
+        return f"{self.name}: {', '.join(parts) or 'running'} ({elapsed:.0f}s)"
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.thread_time() - self.start_cpu
+        stages = _context.stages
+        stages.pop()
+        if tracemalloc.is_tracing():
+            self.traced_peak = max(self.traced_peak, tracemalloc.get_traced_memory()[1])
+
+        seconds = max(wall, 1e-9)
+        end_rss = rss_mb()
+        self.metrics = {
+            "stage": self.name,
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu, 3),
+            "bytes": self.bytes_read,
+            "items": self.items,
+            "mb_per_s": round(self.bytes_read / MB / seconds, 2),
+            "items_per_s": round(self.items / seconds, 1),
+            "rss_start_mb": round(self.start_rss, 1) if self.start_rss is not None else None,
+            "rss_end_mb": round(end_rss, 1) if end_rss is not None else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+            "traced_peak_mb": round(self.traced_peak / MB, 1) if self.traced_peak else None,
+            "status": "ok" if exc_type is None else exc_type.__name__,
+        }
+        if stages:
+            parent = stages[-1]
+            parent.bytes_read += self.bytes_read
+            parent.items += self.items
+            parent.traced_peak = max(parent.traced_peak, self.traced_peak)
+
+        job = current_job()
+        if job is not None:
+            job.metrics.append(self.metrics)
+        record_metrics(self.metrics)
+        print(f"[Perf] {self.summary()}")
+        return False
+
+    def summary(self):
+        m = self.metrics
+        text = f"{m['stage']}: {m['wall_s']:.2f}s wall, {m['cpu_s']:.2f}s CPU"
+        if m["bytes"]:
+            text += f", {m['bytes'] / MB:.1f} MB at {m['mb_per_s']:.1f} MB/s"
+        if m["items"]:
+            text += f", {m['items']} items at {m['items_per_s']:.0f}/s"
+        if m["rss_end_mb"] is not None:
+            text += f", RSS {m['rss_end_mb']:.0f} MB"
+        if m["peak_rss_mb"] is not None:
+            text += f" (process peak {m['peak_rss_mb']:.0f} MB)"
+        if m["traced_peak_mb"] is not None:
+            text += f", traced heap peak {m['traced_peak_mb']:.1f} MB"
+        if m["status"] != "ok":
+            text += f" [{m['status']}]"
+        return text
+
+
+def stage(name, total_bytes=None):
+    """Context manager measuring one stage: with stage("carving", size) as s: ... s.add(bytes_read=n)."""
+    return Stage(name, total_bytes)
+
+
+def add_throughput(bytes_read=0, items=0):
+    """Counts work for the innermost running stage on this thread (no-op outside a stage)."""
+    stages = getattr(_context, 'stages', None)
+    if stages:
+        stages[-1].add(bytes_read, items)
+
+
+# --- Profiling ---
+def profile_path_for(name):
+    return os.path.join(PROFILE_DIRECTORY, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof")
+
+
+def profiled(profile_path, func, *args, **kwargs):
+    """
+    Runs func under cProfile (the calling thread only, i.e. one task), saves the
+    stats to profile_path and prints the most expensive functions.
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        os.makedirs(os.path.dirname(os.path.abspath(profile_path)), exist_ok=True)
+        profiler.dump_stats(profile_path)
+        listing = io.StringIO()
+        pstats.Stats(profiler, stream=listing).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        print(listing.getvalue())
+        print(f"[Perf] Profile saved to {profile_path} (inspect with: python -m pstats {profile_path})")
+
+
+if __name__ == '__main__':
+    # Demo: a hashing stage with live throughput, nested in a profiled call
+    import hashlib
+
+    def hash_random_data(total_mb):
+        digest = hashlib.sha256()
+        with stage("demo hashing", total_mb * MB):
+            for _ in range(total_mb):
+                data = os.urandom(MB)
+                digest.update(data)
+                add_throughput(bytes_read=len(data), items=1)
+        return digest.hexdigest()
+
+    enable_memory_tracing()
+    print(profiled(profile_path_for("demo"), hash_random_data, 64))
@@ -0,0 +1,97 @@
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+# --- Configuration & Constants ---
+LOG_DIRECTORY = "logs"
+RING_BUFFER_LINES = 10000       # Most recent lines kept in memory (tail() / console history)
+MAX_LINES_PER_FLUSH = 2000      # Lines handed to the UI per drain(); older pending lines are skipped
+FILE_BUFFER_SIZE = 1024 * 1024  # The log file is written through a 1MB buffer and flushed on drain()
+
+
+class LogSink:
+    """
+    Thread-safe replacement for sys.stdout/sys.stderr.
+
+    write() only splits text into lines and queues them; it never touches a widget.
+    Every line goes to the log file, the last RING_BUFFER_LINES stay in memory, and the
+    UI pulls batches with drain() on a timer. When output arrives faster than the UI
+    drains it, only the newest MAX_LINES_PER_FLUSH lines are shown and a marker points
+    to the log file, so printing cannot stall the analysis threads or the GUI.
+    """
+
+    def __init__(self, log_path=None, ring_size=RING_BUFFER_LINES, max_pending=MAX_LINES_PER_FLUSH):
+        if log_path is None:
+            os.makedirs(LOG_DIRECTORY, exist_ok=True)
+            log_path = os.path.join(LOG_DIRECTORY, f"suite_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        self.log_path = log_path
+        self.log_file = open(log_path, 'a', encoding='utf-8', buffering=FILE_BUFFER_SIZE)
+        self.lock = threading.Lock()
+        self.history = deque(maxlen=ring_size)
+        self.pending = deque(maxlen=max_pending)
+        self.skipped = 0
+        self.partial = threading.local()  # print() writes text and newline separately; keep lines per thread
+
+    # --- File-like Interface (used as sys.stdout / sys.stderr) ---
+    def write(self, text):
+        partial = self.partial
+        if text == '\n':
+            # Fast path: print() writes the message and its line terminator separately
+            line = getattr(partial, 'text', '')
+            partial.text = ''
+            self.emit_line(line)
+        elif '\n' not in text:
+            partial.text = getattr(partial, 'text', '') + text
+        else:
+            *lines, partial.text = (getattr(partial, 'text', '') + text).split('\n')
+            for line in lines:
+                self.emit_line(line)
+        return len(text)
+
+    def flush(self):
+        pass  # Draining is driven by the UI timer (or close() when headless)
+
+    def isatty(self):
+        return False
+
+    # --- Sink ---
+    def emit_line(self, line):
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.write(line + '\n')
+            if not line or line.isspace():
+                return
+            self.history.append(line)
+            if len(self.pending) == self.pending.maxlen:
+                self.skipped += 1
+            self.pending.append(line)
+
+    def drain(self):
+        """Returns the queued lines as one block of text for the console (or '' when idle)."""
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.flush()
+            if not self.pending:
+                return ''
+            lines = list(self.pending)
+            self.pending.clear()
+            skipped, self.skipped = self.skipped, 0
+        if skipped:
+            lines.insert(0, f"[... {skipped} lines not shown; full output in {self.log_path}]")
+        return '\n'.join(lines)
+
+    def tail(self, count=100):
+        """Returns the last count lines from the ring buffer."""
+        with self.lock:
+            return list(self.history)[-count:]
+
+    def close(self):
+        trailing = getattr(self.partial, 'text', '')
+        if trailing:
+            self.partial.text = ''
+            self.emit_line(trailing)
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
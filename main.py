@@ -1,70 +1,78 @@
 import sys
 import os
+import json
 import subprocess 
 import hashlib 
+from datetime import datetime
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                                QHBoxLayout, QPushButton, QMenuBar, QFileDialog, 
-                               QTextEdit, QLabel, QProgressDialog)
-from PySide6.QtCore import QThread, Signal, Slot, Qt
+                               QPlainTextEdit, QLabel, QProgressDialog)
+from PySide6.QtCore import QThread, QTimer, Signal, Slot, Qt
 
-# NEW IMPORT for Plugin System
-import importlib.util 
+# Analysis modules (and pytsk3/regipy/reportlab/scapy behind them) are loaded lazily
+# through the backend registry when a task first runs
+from backends import availability_report, missing_requirements, run_backend, run_pipeline_step
+from case_store import CaseStore, CASE_DB_NAME
+from instrumentation import disable_memory_tracing, enable_memory_tracing, profile_path_for, profiled
+from log_sink import LogSink
+from plugin_runtime import PluginRuntime, PLUGIN_WORKERS, discover_plugins
+from task_scheduler import TaskScheduler, TaskCancelled, disk_resource, DEFAULT_PRIORITY, PENDING, CANCELLED
 
-# Import your core analysis script functions
-from acquisition import perform_forensic_imaging, verify_integrity
-from analysis import perform_file_carving, analyze_disk_image, analyze_registry_hive, analyze_memory_dump 
-from timeline_generator import generate_super_timeline 
-from network_analysis import analyze_pcap_file 
-# NEW IMPORT: Import the function from the new android_analysis.py script
-from android_analysis import analyze_android_database 
 
+# --- Configuration & Constants ---
+CONSOLE_MAX_LINES = 5000          # Lines kept in the console widget
+CONSOLE_FLUSH_INTERVAL_MS = 100   # How often queued output is appended to the console
 
-# --- Console Output Redirect Class ---
-class ConsoleRedirector(object):
-    def __init__(self, widget):
-        self.widget = widget
+# --- Pipeline Steps (used by the acquisition chain) ---
+ACQUISITION_PIPELINE = ["perform_forensic_imaging", "verify_integrity", "analyze_disk_image", "perform_file_carving"]
+ACQUISITION_REPORT = "generate_forensic_report"  # Optional last step: skipped with a warning when unavailable
 
-    def write(self, text):
-        if text.strip():
-            self.widget.append(text.strip())
-
-    def flush(self):
-        pass 
+def generate_pipeline_report(case_name, acquisition_time, carve_job, case_store_path=None):
+    """Final step of the acquisition chain: reports using the result of the carving job."""
+    return run_backend("generate_forensic_report", case_name, {'AcquisitionTime': acquisition_time, 'CarvedCount': carve_job.result or 0,
+                                                               'CaseStorePath': case_store_path})
 
 # --- 1. Worker Thread Class ---
 class ForensicWorker(QThread):
+    """Runs one scheduler Job on a QThread."""
     finished = Signal(str, str)
     progress_update = Signal(str)
+    job_completed = Signal(int)
     
-    def __init__(self, func, *args, **kwargs):
+    def __init__(self, job):
         super().__init__()
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
-        self.setObjectName(f"WORKER-{self.func.__name__.upper()}")
+        self.job = job
+        self.result = None
+        self.error = None
+        self.setObjectName(f"WORKER-{job.name.upper()}")
+        # Analysis functions call task_scheduler.report_progress(); forward it to the GUI thread
+        job.on_progress = lambda job, message: self.progress_update.emit(f"[{job.name}] {message}")
 
     def run(self):
-        self.progress_update.emit(f"Running task: {self.func.__name__}...")
+        self.progress_update.emit(f"Running task: {self.job.name}...")
         
         try:
-            if self.func == perform_forensic_imaging:
-                success, log_path = self.func(*self.args)
-                if success:
-                    self.finished.emit(self.func.__name__, f"Acquisition complete. Log: {log_path}")
-                else:
-                    self.finished.emit(self.func.__name__, "Acquisition failed. Check console for details.")
+            self.result = self.job.run()
             
-            # --- Analysis Logic, including ALL domains ---
-            elif self.func in [analyze_disk_image, perform_file_carving, analyze_registry_hive, analyze_memory_dump, generate_super_timeline, analyze_pcap_file, analyze_android_database] or hasattr(self.func, '__self__') and isinstance(self.func.__self__, object):
-                result = self.func(*self.args) 
-                
-                if isinstance(result, str) and result:
-                     self.finished.emit(self.func.__name__, result)
+            if self.job.name == "perform_forensic_imaging":
+                success, log_path = self.result
+                if success:
+                    self.finished.emit(self.job.name, f"Acquisition complete. Log: {log_path}")
                 else:
-                    self.finished.emit(self.func.__name__, f"Analysis for {self.func.__name__} finished successfully.")
+                    self.finished.emit(self.job.name, "Acquisition failed. Check console for details.")
+            elif isinstance(self.result, str) and self.result:
+                self.finished.emit(self.job.name, self.result)
+            else:
+                self.finished.emit(self.job.name, f"Analysis for {self.job.name} finished successfully.")
 
+        except TaskCancelled as e:
+            self.error = e
+            self.finished.emit(self.job.name, f"Task cancelled: {e}")
         except Exception as e:
-            self.finished.emit(self.func.__name__, f"Task failed with critical error: {e}")
+            self.error = e
+            self.finished.emit(self.job.name, f"Task failed with critical error: {e}")
+
+        self.job_completed.emit(self.job.id)
 
 # --- 2. Main Application Window Class ---
 class DigitalForensicsSuite(QMainWindow):
@@ -76,7 +84,7 @@ class DigitalForensicsSuite(QMainWindow):
         # --- Apply Dark Theme Stylesheet ---
         dark_stylesheet = """
         QMainWindow { background-color: #1e1e1e; color: #d4d4d4; }
-        QTextEdit { background-color: #252526; color: #d4d4d4; border: 1px solid #3c3c3c; font-family: 'Consolas', 'Courier New', monospace; }
+        QPlainTextEdit { background-color: #252526; color: #d4d4d4; border: 1px solid #3c3c3c; font-family: 'Consolas', 'Courier New', monospace; }
         QLabel { color: #569cd6; font-weight: bold; }
         QMenuBar { background-color: #333333; color: #d4d4d4; }
         QMenuBar::item:selected { background-color: #007acc; }
@@ -91,62 +99,81 @@ class DigitalForensicsSuite(QMainWindow):
         self.current_image_path = None
         self.current_hive_path = None
         self.current_dump_path = None
-        self.current_worker = None
         self.plugins = {} 
+        self.case_store = None  # Open CaseStore: analyses are recorded and unchanged inputs are not re-run
+        
+        # --- Task Scheduling ---
+        # Jobs are dispatched from the GUI thread only: the runner starts a QThread per job
+        # and job_done() is called back from the on_job_completed slot.
+        self.scheduler = TaskScheduler(limits={"plugin": PLUGIN_WORKERS}, runner=self.start_job_worker)
+        self.plugin_runtime = PluginRuntime()
+        self.workers = {}
+        self.started_jobs = set()
         
         # --- UI Components ---
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.layout = QVBoxLayout(self.central_widget)
         
-        # Output Console
-        self.console = QTextEdit()
+        # Output Console (bounded: older lines are dropped from the widget, the log file keeps everything)
+        self.console = QPlainTextEdit()
         self.console.setReadOnly(True)
-        self.console.setFontPointSize(10)
+        self.console.setMaximumBlockCount(CONSOLE_MAX_LINES)
+        console_font = self.console.font()
+        console_font.setPointSize(10)
+        self.console.setFont(console_font)
         self.layout.addWidget(QLabel("Analysis Console:"))
         self.layout.addWidget(self.console)
         
-        # Redirect stdout and stderr
-        sys.stdout = ConsoleRedirector(self.console)
-        sys.stderr = ConsoleRedirector(self.console) 
+        # Redirect stdout and stderr into the log sink; the console pulls batches on a timer
+        self.log_sink = LogSink()
+        sys.stdout = self.log_sink
+        sys.stderr = self.log_sink
+        self.console_timer = QTimer(self)
+        self.console_timer.timeout.connect(self.flush_console)
+        self.console_timer.start(CONSOLE_FLUSH_INTERVAL_MS)
         
         # Status Bar
         self.statusBar().showMessage("Ready for operation.")
         
         self.load_plugins()
+        self.report_backends()
         self.create_menu()
 
 
+    # --- Console Logging ---
+    def log(self, message):
+        print(message)
+
+    @Slot()
+    def flush_console(self):
+        text = self.log_sink.drain()
+        if text:
+            self.console.appendPlainText(text)
+
+    def closeEvent(self, event):
+        self.console_timer.stop()
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        self.scheduler.cancel_all()
+        self.plugin_runtime.shutdown()
+        if self.case_store is not None:
+            self.case_store.close()
+        self.log_sink.close()
+        super().closeEvent(event)
+
     def load_plugins(self):
-        self.plugins = {}
-        plugin_root = os.path.join(os.path.dirname(__file__), 'plugins')
-        
-        self.log("\n[+] Scanning for and loading external plugins...")
-        
-        if os.path.exists(plugin_root):
-            for name in os.listdir(plugin_root):
-                if os.path.isdir(os.path.join(plugin_root, name)) and not name.startswith('__'):
-                    plugin_file_name = f"{name}_parser.py"
-                    plugin_file_path = os.path.join(plugin_root, name, plugin_file_name)
-
-                    if not os.path.exists(plugin_file_path):
-                        continue
-
-                    try:
-                        spec = importlib.util.spec_from_file_location(name, plugin_file_path)
-                        module = importlib.util.module_from_spec(spec)
-                        sys.modules[name] = module
-                        spec.loader.exec_module(module)
-                        
-                        plugin_class = getattr(module, 'get_plugin_class')()
-                        
-                        self.plugins[plugin_class.NAME] = plugin_class
-                        self.log(f"|-- LOADED PLUGIN: {plugin_class.NAME}")
-                        
-                    except Exception as e:
-                        self.log(f"|-- FAILED to load plugin {name}: {e}")
-        
-        self.log(f"Loaded {len(self.plugins)} plugins.")
+        # Only the plugin.json manifests are read here; plugin code is imported in a worker process when it runs
+        self.log("\n[+] Scanning for external plugins...")
+        self.plugins = discover_plugins()
+        for name, manifest in self.plugins.items():
+            status = f" [UNAVAILABLE: missing {', '.join(manifest['missing'])}]" if manifest["missing"] else ""
+            self.log(f"|-- FOUND PLUGIN: {name}{status}")
+        self.log(f"Found {len(self.plugins)} plugins.")
+
+    def report_backends(self):
+        self.log("\n[+] Analysis backends (loaded on first use):")
+        for line in availability_report():
+            self.log(line)
 
     def create_menu(self):
         menu_bar = self.menuBar()
@@ -170,16 +197,25 @@ class DigitalForensicsSuite(QMainWindow):
         carve_action = analysis_menu.addAction("Start &Data Carving...")
         carve_action.triggered.connect(self.start_carving_analysis)
         
-        timeline_action = analysis_menu.addAction("&Super Timeline Generation (Plaso)")
+        timeline_action = analysis_menu.addAction("&Super Timeline Generation")
         timeline_action.triggered.connect(self.start_timeline_analysis)
         
         network_action = analysis_menu.addAction("&Network Analysis (Scapy/PCAP)")
         network_action.triggered.connect(self.start_network_analysis)
         
+        protocol_action = analysis_menu.addAction("&Protocol Artifact Extraction (DNS/HTTP/TLS SNI)")
+        protocol_action.triggered.connect(self.start_protocol_extraction)
+        
         # Android Forensics Analysis (P3 Feature) <<< ADDED
         android_action = analysis_menu.addAction("&Android App Data Analysis")
         android_action.triggered.connect(self.start_android_analysis)
         
+        android_batch_action = analysis_menu.addAction("Android &Extraction Batch Triage...")
+        android_batch_action.triggered.connect(self.start_android_extraction_triage)
+        
+        recovery_action = analysis_menu.addAction("Recover Deleted S&QLite Records (Freelist/WAL/Journal)...")
+        recovery_action.triggered.connect(self.start_sqlite_recovery)
+        
         analysis_menu.addSeparator()
 
         reg_action = analysis_menu.addAction("&Windows Registry Analysis (Regipy)")
@@ -188,20 +224,144 @@ class DigitalForensicsSuite(QMainWindow):
         mem_action = analysis_menu.addAction("&Memory Analysis (Volatility3)")
         mem_action.triggered.connect(self.start_memory_analysis)
         
+        # --- Case Menu ---
+        case_menu = menu_bar.addMenu("&Case")
+        open_case_action = case_menu.addAction("&Open/Create Case Store...")
+        open_case_action.triggered.connect(self.open_case_store)
+        summary_action = case_menu.addAction("Show Case &Summary")
+        summary_action.triggered.connect(self.show_case_summary)
+        
+        # --- Tasks Menu ---
+        tasks_menu = menu_bar.addMenu("&Tasks")
+        queue_action = tasks_menu.addAction("Show Task &Queue")
+        queue_action.triggered.connect(self.show_task_queue)
+        cancel_action = tasks_menu.addAction("&Cancel All Tasks")
+        cancel_action.triggered.connect(self.cancel_all_tasks)
+        tasks_menu.addSeparator()
+        self.profile_action = tasks_menu.addAction("&Profile Next Task (cProfile)")
+        self.profile_action.setCheckable(True)
+        trace_action = tasks_menu.addAction("&Trace Python Memory (tracemalloc)")
+        trace_action.setCheckable(True)
+        trace_action.toggled.connect(self.toggle_memory_tracing)
+        
         # --- Plugins Menu ---
         if self.plugins:
             plugins_menu = menu_bar.addMenu("&Plugins")
-            for name, plugin_class in self.plugins.items():
+            for name, manifest in self.plugins.items():
                 action = plugins_menu.addAction(name)
-                action.triggered.connect(lambda checked, p=plugin_class: self.run_plugin(p))
+                action.setToolTip(manifest["description"])
+                action.triggered.connect(lambda checked, m=manifest: self.run_plugin(m))
+
+
+    # --- Task Scheduling ---
+    def submit_task(self, func, *args, name=None, resources=("cpu",), depends_on=(), priority=DEFAULT_PRIORITY):
+        """Queues an analysis function. Jobs touching the same evidence file run one at a time."""
+        if self.profile_action.isChecked():
+            self.profile_action.setChecked(False)
+            profile_path = profile_path_for(name or func.__name__)
+            self.log(f"[Perf] Profiling {name or func.__name__}; the profile is saved to {profile_path}.")
+            func, args = profiled, (profile_path, func) + args
+        job = self.scheduler.submit(func, *args, name=name, resources=resources, depends_on=depends_on,
+                                    priority=priority, on_finished=self.job_settled)
+        if job.state == PENDING:
+            self.log(f"Queued task #{job.id}: {job.name} (waiting for resources or earlier steps).")
+        return job
+
+    def backend_ready(self, backend):
+        """Logs why a backend cannot run. Missing external tools only warn (the backend reports the failure)."""
+        missing = missing_requirements(backend)
+        if any(not item.startswith("tool ") for item in missing):
+            self.log(f"ERROR: {backend} is unavailable (missing {', '.join(missing)}).")
+            return False
+        if missing:
+            self.log(f"WARNING: {backend} needs {', '.join(missing)} on PATH; the task may fail.")
+        return True
+
+    def recorded(self, module, evidence, func, *args):
+        """Job body and arguments; with a case store open the call runs as a recorded (reusable) run."""
+        if self.case_store is None:
+            return (func,) + args
+        return (self.case_store.record, module, list(evidence), func) + args
+
+    def submit_backend(self, backend, *args, evidence=(), record=True, **options):
+        """
+        Queues an analysis backend by name; its module is imported on the worker thread.
+        evidence lists the input files: they are locked while the job runs and key its stored results.
+        record=False runs it outside the case store (for backends that read the store themselves).
+        """
+        if not self.backend_ready(backend):
+            return None
+        options.setdefault("resources", [disk_resource(path) for path in evidence] + ["cpu"])
+        body = self.recorded(backend, evidence, run_backend, backend, *args) if record else (run_backend, backend) + args
+        return self.submit_task(*body, name=backend, **options)
 
+    def start_job_worker(self, job, done):
+        """Scheduler runner: executes the job on its own QThread."""
+        worker = ForensicWorker(job)
+        worker.finished.connect(self.task_finished)
+        worker.progress_update.connect(self.statusBar().showMessage)
+        worker.job_completed.connect(self.on_job_completed)
+        self.workers[job.id] = worker
+        self.started_jobs.add(job.id)
+        worker.start()
+
+    @Slot(int)
+    def on_job_completed(self, job_id):
+        worker = self.workers.pop(job_id)
+        worker.wait()  # run() returns right after emitting; let the thread exit before dropping it
+        self.scheduler.job_done(worker.job, worker.result, worker.error)
+
+    def job_settled(self, job):
+        # Jobs that ran report through task_finished; only queued jobs that never started are logged here
+        if job.state == CANCELLED and job.id not in self.started_jobs:
+            self.log(f"Task #{job.id} {job.name} cancelled before it started: {job.error}")
+
+    def show_task_queue(self):
+        jobs = self.scheduler.snapshot()
+        self.log(f"\n[--- TASK QUEUE ({self.scheduler.active_count()} active) ---]")
+        for job in jobs:
+            waits_for = f" | after #{', #'.join(map(str, job.depends_on))}" if job.depends_on else ""
+            self.log(f"|-- #{job.id:<4} {job.state:<10} {job.name} (priority {job.priority}{waits_for})")
+
+    def cancel_all_tasks(self):
+        self.log("Cancelling all queued and running tasks...")
+        self.scheduler.cancel_all()
+
+    def toggle_memory_tracing(self, enabled):
+        if enabled:
+            enable_memory_tracing()
+            self.log("[Perf] tracemalloc on: stages report their peak Python heap (allocation-heavy tasks run slower).")
+        else:
+            disable_memory_tracing()
+            self.log("[Perf] tracemalloc off.")
+
+    # --- Case Store ---
+    def open_case_store(self):
+        db_path, _ = QFileDialog.getSaveFileName(self, "Open or Create Case Store", CASE_DB_NAME, "Case Store (*.db)",
+                                                 options=QFileDialog.DontConfirmOverwrite)
+        if not db_path:
+            return
+        if self.case_store is not None:
+            self.case_store.close()
+        self.case_store = CaseStore(db_path)
+        self.log(f"[Case] Recording analysis results to {db_path}. Re-running a module on unchanged evidence reuses its stored results.")
+        self.show_case_summary()
+
+    def show_case_summary(self):
+        if self.case_store is None:
+            self.log("ERROR: No case store is open (Case -> Open/Create Case Store).")
+            return
+        self.log(f"\n[--- CASE SUMMARY: {self.case_store.db_path} ---]")
+        for kind, count in self.case_store.artifact_counts().items():
+            self.log(f"|-- {kind:<24} {count} artifacts")
+        for run_id, module, evidence, status, _, _, _ in self.case_store.runs():
+            self.log(f"|-- run #{run_id:<4} {status:<10} {module} on {', '.join(os.path.basename(path) for path in json.loads(evidence))}")
 
     @Slot(str, str)
     def task_finished(self, func_name, message):
         self.log(f"*** TASK FINISHED: {func_name} ***")
         self.log(message)
         self.statusBar().showMessage(f"Task {func_name} completed.")
-        self.current_worker = None
 
     def start_acquisition_dialog(self):
         self.log("Opening acquisition dialog...")
@@ -209,11 +369,32 @@ class DigitalForensicsSuite(QMainWindow):
         output_image, _ = QFileDialog.getSaveFileName(self, "Save Output Forensic Image (.dd)")
         if source_device and output_image:
             log_file = output_image + ".log"
+            case_name = os.path.splitext(os.path.basename(output_image))[0]
+            acquisition_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             self.log(f"Acquisition setup: Source={source_device}, Output={output_image}")
+            if not all([self.backend_ready(backend) for backend in ACQUISITION_PIPELINE]):
+                return
             self.statusBar().showMessage("Acquisition in progress...")
-            self.current_worker = ForensicWorker(perform_forensic_imaging, source_device, output_image, log_file)
-            self.current_worker.finished.connect(self.task_finished)
-            self.current_worker.start()
+            
+            # Full pipeline: imaging -> verify -> FS catalog + carving -> report.
+            # A failed or cancelled step cancels everything that depends on it.
+            source, image = disk_resource(source_device), disk_resource(output_image)
+            imaging = self.submit_task(run_pipeline_step, "perform_forensic_imaging", source_device, output_image, log_file,
+                                       name="perform_forensic_imaging", resources=[source, image], priority=DEFAULT_PRIORITY - 5)
+            verify = self.submit_task(run_pipeline_step, "verify_integrity", source_device, output_image, log_file,
+                                      name="verify_integrity", resources=[source, image, "cpu"], depends_on=[imaging])
+            catalog = self.submit_task(*self.recorded("analyze_disk_image", [output_image], run_backend, "analyze_disk_image", output_image),
+                                       name="analyze_disk_image", resources=[image, "cpu"], depends_on=[verify])
+            carve = self.submit_task(*self.recorded("perform_file_carving", [output_image], run_backend, "perform_file_carving", output_image, "carved_files_output"),
+                                     name="perform_file_carving", resources=[image, "cpu"], depends_on=[verify])
+            missing = missing_requirements(ACQUISITION_REPORT)
+            if missing:
+                self.log(f"WARNING: {ACQUISITION_REPORT} is unavailable (missing {', '.join(missing)}); "
+                         f"the acquisition runs without the final report.")
+                return
+            case_store_path = self.case_store.db_path if self.case_store is not None else None
+            self.submit_task(generate_pipeline_report, case_name, acquisition_time, carve, case_store_path,
+                             name="generate_forensic_report", depends_on=[catalog, carve])
     
     def start_integrity_check(self):
         if not self.current_image_path:
@@ -235,9 +416,7 @@ class DigitalForensicsSuite(QMainWindow):
             return
         self.log(f"Starting File System Analysis on {self.current_image_path}...")
         self.statusBar().showMessage("Analyzing file system...")
-        self.current_worker = ForensicWorker(analyze_disk_image, self.current_image_path)
-        self.current_worker.finished.connect(self.task_finished)
-        self.current_worker.start()
+        self.submit_backend("analyze_disk_image", self.current_image_path, evidence=[self.current_image_path])
 
     def start_carving_analysis(self):
         if not self.current_image_path:
@@ -246,21 +425,22 @@ class DigitalForensicsSuite(QMainWindow):
         output_dir = "carved_files_output"
         self.log(f"Starting Data Carving on {self.current_image_path}...")
         self.statusBar().showMessage("Carving unallocated space...")
-        self.current_worker = ForensicWorker(perform_file_carving, self.current_image_path, output_dir)
-        self.current_worker.finished.connect(self.task_finished)
-        self.current_worker.start()
+        self.submit_backend("perform_file_carving", self.current_image_path, output_dir, evidence=[self.current_image_path])
         
     def start_timeline_analysis(self):
         if not self.current_image_path:
             self.log("ERROR: Please load a forensic image first (File -> Load Forensic Image).")
             return
             
-        self.log(f"Starting Plaso Super Timeline Generation on {self.current_image_path}...")
+        self.log(f"Starting Super Timeline Generation on {self.current_image_path}...")
         self.statusBar().showMessage("Generating super timeline... (This may take a while)")
         
-        self.current_worker = ForensicWorker(generate_super_timeline, self.current_image_path)
-        self.current_worker.finished.connect(self.task_finished)
-        self.current_worker.start()
+        # File system times come from the image; an open case store adds every other timestamped artifact
+        case_store_path = self.case_store.db_path if self.case_store is not None else None
+        if case_store_path is None:
+            self.log("NOTE: No case store is open; the timeline holds file system events only.")
+        self.submit_backend("generate_super_timeline", self.current_image_path, "timeline_output", case_store_path,
+                            evidence=[self.current_image_path], record=False)
 
     def start_network_analysis(self):
         # Load the PCAP file
@@ -270,58 +450,78 @@ class DigitalForensicsSuite(QMainWindow):
             self.log(f"Starting Network Traffic Analysis on {pcap_path}...")
             self.statusBar().showMessage("Analyzing network packets...")
             
-            self.current_worker = ForensicWorker(analyze_pcap_file, pcap_path)
-            self.current_worker.finished.connect(self.task_finished)
-            self.current_worker.start()
+            self.submit_backend("analyze_pcap_file", pcap_path, evidence=[pcap_path])
+            
+    def start_protocol_extraction(self):
+        pcap_path, _ = QFileDialog.getOpenFileName(self, "Select Network Capture File (.pcap, .pcapng)", filter="Captures (*.pcap *.pcapng *.cap);;All Files (*)")
+        
+        if pcap_path:
+            self.log(f"Starting Protocol Artifact Extraction on {pcap_path}...")
+            self.statusBar().showMessage("Extracting DNS/HTTP/TLS artifacts...")
+            
+            self.submit_backend("extract_protocol_artifacts", pcap_path, evidence=[pcap_path])
             
     def start_android_analysis(self):
         # Load the SQLite database file
         db_path, _ = QFileDialog.getOpenFileName(self, "Select Android App Database File (.db, .sqlite)", filter="SQLite Databases (*.db *.sqlite);;All Files (*)")
         
         if db_path:
-            # We must import the function from the new script (already imported at the top)
-            # No need to import again if 'from android_analysis import analyze_android_database' is at the top
-            from android_analysis import analyze_android_database
-            
             self.log(f"Starting Android Data Analysis on {db_path}...")
             self.statusBar().showMessage("Analyzing mobile app data...")
             
-            # Start the analysis task in a background thread
-            self.current_worker = ForensicWorker(analyze_android_database, db_path)
-            self.current_worker.finished.connect(self.task_finished)
-            self.current_worker.start()
+            # Start the analysis task in a background thread; all messages are streamed to CSV
+            export_path = os.path.join("android_output", os.path.splitext(os.path.basename(db_path))[0] + "_messages.csv")
+            self.submit_backend("analyze_android_database", db_path, export_path, evidence=[db_path])
+
+    def start_android_extraction_triage(self):
+        extraction_dir = QFileDialog.getExistingDirectory(self, "Select Android Data Extraction Directory")
+        
+        if extraction_dir:
+            self.log(f"Starting Android Extraction Triage on {extraction_dir}...")
+            self.statusBar().showMessage("Triaging all app databases in the extraction...")
+            
+            self.submit_backend("analyze_android_extraction", extraction_dir, evidence=[extraction_dir])
+
+    def start_sqlite_recovery(self):
+        db_path, _ = QFileDialog.getOpenFileName(self, "Select SQLite Database (companion -wal/-journal files are used automatically)", filter="SQLite Databases (*.db *.sqlite);;All Files (*)")
+        
+        if db_path:
+            output_dir = "recovered_records_output"
+            self.log(f"Starting Deleted Record Recovery on {db_path}...")
+            self.statusBar().showMessage("Scanning freelist, unallocated space and WAL/journal pages...")
+            
+            self.submit_backend("recover_deleted_records", db_path, output_dir, evidence=[db_path])
 
     def start_registry_analysis(self):
         hive_path, _ = QFileDialog.getOpenFileName(self, "Select Registry Hive File (e.g., SYSTEM_TEST_HIVE.DAT)", filter="Registry Hives (*.dat *.hiv);;All Files (*)")
         if hive_path:
             self.log(f"Starting Registry Analysis on {hive_path}...")
             self.statusBar().showMessage("Analyzing Registry...")
-            self.current_worker = ForensicWorker(analyze_registry_hive, hive_path, "SYSTEM")
-            self.current_worker.finished.connect(self.task_finished)
-            self.current_worker.start()
+            self.submit_backend("analyze_registry_hive", hive_path, "SYSTEM", evidence=[hive_path])
 
     def start_memory_analysis(self):
         dump_path, _ = QFileDialog.getOpenFileName(self, "Select Memory Dump File (.dmp, .raw)", filter="Memory Dumps (*.dmp *.raw);;All Files (*)")
         if dump_path:
             self.log(f"Starting Volatility3 Memory Analysis on {dump_path}...")
             self.statusBar().showMessage("Analyzing RAM dump...")
-            self.current_worker = ForensicWorker(analyze_memory_dump, dump_path)
-            self.current_worker.finished.connect(self.task_finished)
-            self.current_worker.start()
+            self.submit_backend("analyze_memory_dump", dump_path, evidence=[dump_path])
 
-    def run_plugin(self, plugin_class):
-        if not self.current_image_path and plugin_class.TARGET_TYPE == "disk_image":
+    def run_plugin(self, manifest):
+        if not self.current_image_path and manifest["target_type"] == "disk_image":
             self.log("ERROR: Plugin requires a loaded forensic image (File -> Load Forensic Image).")
             return
+        if manifest["missing"]:
+            self.log(f"ERROR: Plugin {manifest['name']} is unavailable (missing {', '.join(manifest['missing'])}).")
+            return
             
-        self.log(f"Starting Plugin: {plugin_class.NAME}...")
-        self.statusBar().showMessage(f"Running custom plugin: {plugin_class.NAME}...")
-        
-        plugin_instance = plugin_class(self.current_image_path, "plugin_output")
+        self.log(f"Starting Plugin: {manifest['name']}...")
+        self.statusBar().showMessage(f"Running custom plugin: {manifest['name']}...")
         
-        self.current_worker = ForensicWorker(plugin_instance.run)
-        self.current_worker.finished.connect(self.task_finished)
-        self.current_worker.start()
+        # The job thread only waits on the plugin's worker process; the "plugin" slots match the pool size
+        resources = [disk_resource(self.current_image_path), "plugin"] if self.current_image_path else ["plugin"]
+        evidence = [self.current_image_path] if self.current_image_path else []
+        self.submit_task(*self.recorded(manifest["name"], evidence, self.plugin_runtime.run, manifest, self.current_image_path, "plugin_output"),
+                         name=manifest["name"], resources=resources)
 
 if __name__ == '__main__':
     QThread.currentThread().setObjectName("MAIN_GUI_THREAD")
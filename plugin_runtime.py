@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+import importlib.util
+
+from case_store import emit_artifacts, record_outputs
+from instrumentation import stage, add_throughput
+from task_scheduler import TaskCancelled, check_cancelled, report_progress
+
+# --- Configuration & Constants ---
+PLUGIN_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugins")
+MANIFEST_NAME = "plugin.json"
+REQUIRED_KEYS = ("name", "entry_point")
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugin_worker.py")
+
+PLUGIN_WORKERS = max(1, min(4, os.cpu_count() or 1))  # Plugin processes running at once (scheduler "plugin" slots)
+PLUGIN_TIMEOUT = 6 * 60 * 60                          # Default seconds before a plugin run is killed (manifest "timeout")
+CANCEL_GRACE = 10                                     # Seconds a cancelled plugin gets to stop before it is killed
+POLL_INTERVAL = 0.2                                   # Seconds between cancellation checks while waiting
+
+
+# --- Discovery (main process; never imports plugin code) ---
+def discover_plugins(plugin_root=PLUGIN_ROOT):
+    """
+    Reads every plugins/<name>/plugin.json. Returns {plugin name: manifest}.
+    Missing Python packages listed under "requires" are recorded, not imported.
+    """
+    plugins = {}
+    if not os.path.isdir(plugin_root):
+        return plugins
+
+    for directory in sorted(os.listdir(plugin_root)):
+        manifest_path = os.path.join(plugin_root, directory, MANIFEST_NAME)
+        if directory.startswith('__') or not os.path.isfile(manifest_path):
+            continue
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"|-- FAILED to read manifest of plugin {directory}: {e}")
+            continue
+        missing_keys = [key for key in REQUIRED_KEYS if key not in manifest]
+        if missing_keys:
+            print(f"|-- FAILED to load plugin {directory}: manifest lacks {', '.join(missing_keys)}")
+            continue
+
+        manifest.setdefault("description", "")
+        manifest.setdefault("target_type", "disk_image")
+        manifest.setdefault("requires", [])
+        manifest.setdefault("timeout", PLUGIN_TIMEOUT)
+        manifest["package"] = f"{os.path.basename(plugin_root)}.{directory}"
+        manifest["search_path"] = os.path.dirname(plugin_root)
+        manifest["missing"] = [package for package in manifest["requires"] if importlib.util.find_spec(package) is None]
+        plugins[manifest["name"]] = manifest
+    return plugins
+
+
+# --- Application Side ---
+class PluginRuntime:
+    """
+    Runs every plugin in its own process (plugin_worker.py, which never imports the
+    GUI). A scheduler job calls run(), which blocks its own thread (never the GUI)
+    while relaying the plugin's progress, console output and artifact rows.
+
+    A plugin that crashes, exits or hangs only fails its own run. Cancelling asks the
+    plugin to stop at its next check_cancelled() and kills the process if it has not
+    exited after CANCEL_GRACE seconds; a run exceeding the manifest's "timeout" is killed.
+    """
+
+    def __init__(self, on_artifacts=None):
+        self.on_artifacts = on_artifacts  # Extra callback(manifest, kind, rows) on the job thread
+        self.lock = threading.Lock()
+        self.processes = set()
+
+    def run(self, manifest, image_path, output_dir):
+        """Scheduler job body: one instrumented stage per plugin run (items = artifact rows received)."""
+        with stage(manifest["name"]):
+            result = self.run_in_process(manifest, image_path, output_dir)
+        record_outputs([output_dir])
+        return result
+
+    def run_in_process(self, manifest, image_path, output_dir):
+        if manifest["missing"]:
+            raise RuntimeError(f"Plugin {manifest['name']} is unavailable (missing {', '.join(manifest['missing'])}).")
+
+        process = subprocess.Popen([sys.executable, WORKER_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, encoding='utf-8', errors='replace', bufsize=1)
+        with self.lock:
+            self.processes.add(process)
+        messages = queue.Queue()
+        reader = threading.Thread(target=self.read_messages, args=(process, messages), daemon=True)
+        reader.start()
+        try:
+            process.stdin.write(json.dumps({"manifest": manifest, "image_path": image_path, "output_dir": output_dir}) + "\n")
+            process.stdin.flush()
+            outcome = self.relay(manifest, process, messages)
+        finally:
+            self.stop(process)
+            reader.join()
+            with self.lock:
+                self.processes.discard(process)
+
+        if outcome["type"] == "result":
+            print(f"[{manifest['name']}] {outcome['rows']} artifact rows streamed back.")
+            return outcome["value"]
+        if outcome.get("cancelled"):
+            raise TaskCancelled(f"Task {manifest['name']} cancelled.")
+        raise RuntimeError(f"Plugin {manifest['name']} failed: {outcome['error']}")
+
+    def relay(self, manifest, process, messages):
+        """Forwards worker messages until the plugin finishes; enforces cancellation and the timeout."""
+        deadline = time.monotonic() + manifest["timeout"]
+        kill_at = None  # Set once cancellation was requested
+        artifact_rows = 0
+        outcome = None
+        while True:
+            if kill_at is None:
+                try:
+                    check_cancelled()
+                except TaskCancelled:
+                    self.send_cancel(process)  # The plugin stops at its next check_cancelled()
+                    kill_at = time.monotonic() + CANCEL_GRACE
+            now = time.monotonic()
+            if kill_at is not None and now > kill_at:
+                process.kill()
+                return {"type": "error", "error": "killed after cancellation", "cancelled": True}
+            if now > deadline:
+                process.kill()
+                return {"type": "error", "error": f"timed out after {manifest['timeout']} s and was killed"}
+
+            try:
+                message = messages.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if message is None:  # Worker output closed: the process exited
+                break
+
+            if message["type"] == "progress":
+                report_progress(message["message"])
+            elif message["type"] == "log":
+                print(message["line"])
+            elif message["type"] == "artifacts":
+                artifact_rows += len(message["rows"])
+                add_throughput(items=len(message["rows"]))
+                emit_artifacts(message["kind"], message["rows"], message["time_field"])
+                if self.on_artifacts is not None:
+                    self.on_artifacts(manifest, message["kind"], message["rows"])
+            elif message["type"] in ("result", "error"):
+                outcome = message
+                break
+
+        if outcome is None:
+            code = process.wait()
+            return {"type": "error", "error": f"worker process exited with code {code} before reporting a result",
+                    "cancelled": kill_at is not None}
+        if outcome["type"] == "error" and kill_at is not None:
+            outcome["cancelled"] = True
+        outcome["rows"] = artifact_rows
+        return outcome
+
+    @staticmethod
+    def read_messages(process, messages):
+        """Reader thread: parses the worker's JSON lines; anything else (native crash output) is logged."""
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                message = None
+            messages.put(message if isinstance(message, dict) and "type" in message else {"type": "log", "line": line})
+        messages.put(None)
+
+    @staticmethod
+    def send_cancel(process):
+        try:
+            process.stdin.write("cancel\n")
+            process.stdin.flush()
+        except (OSError, ValueError):
+            pass  # Already exited
+
+    @staticmethod
+    def stop(process):
+        """Makes sure the worker is gone: closes its stdin (it cancels itself on EOF), then kills it."""
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=CANCEL_GRACE)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def shutdown(self):
+        """Kills plugin processes that are still running (application exit)."""
+        with self.lock:
+            processes, self.processes = list(self.processes), set()
+        for process in processes:
+            process.kill()
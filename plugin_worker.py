@@ -0,0 +1,139 @@
+import sys
+import json
+import threading
+import importlib
+import traceback
+
+from task_scheduler import Job, TaskCancelled, DEFAULT_PRIORITY
+
+# Runs ONE plugin in its own process, started by plugin_runtime.PluginRuntime as
+#   python plugin_worker.py
+# Kept free of GUI and analysis imports so a plugin process only loads what the plugin needs.
+#
+# Protocol (JSON, one object per line, UTF-8):
+#   stdin   first line: {"manifest": ..., "image_path": ..., "output_dir": ...}; then "cancel" (or EOF)
+#   stdout  {"type": "progress", "message"} | {"type": "log", "line"} |
+#           {"type": "artifacts", "kind", "rows", "time_field"} |
+#           {"type": "result", "value"} | {"type": "error", "error", "cancelled"}
+
+# --- Configuration & Constants ---
+EMIT_BATCH_SIZE = 1000  # Artifact rows per message sent back to the app
+
+
+class MessageChannel:
+    """Writes protocol messages to the real stdout; safe to use from plugin threads."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def send(self, message_type, **fields):
+        fields["type"] = message_type
+        line = json.dumps(fields, default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class PluginContext:
+    """What a plugin receives inside its worker process."""
+
+    def __init__(self, manifest, image_path, output_dir, channel):
+        self.manifest = manifest
+        self.image_path = image_path
+        self.output_dir = output_dir
+        self.channel = channel
+        self.image = None
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def open_image(self):
+        """Read-only TSK handle on the case image, opened once per plugin run."""
+        if self.image is None:
+            import pytsk3
+            self.image = pytsk3.Img_Info(self.image_path)
+        return self.image
+
+    def emit(self, kind, rows, time_field=None):
+        """
+        Streams artifact rows (dicts) back to the application in batches (safe to call
+        from plugin threads); they land in the case store like any module's artifacts.
+        """
+        with self.lock:
+            buffer = self.buffers.setdefault((kind, time_field), [])
+            buffer.extend(rows)
+            if len(buffer) < EMIT_BATCH_SIZE:
+                return
+            self.buffers[(kind, time_field)] = []
+        self.channel.send("artifacts", kind=kind, rows=buffer, time_field=time_field)
+
+    def flush(self):
+        with self.lock:
+            buffers, self.buffers = self.buffers, {}
+        for (kind, time_field), rows in buffers.items():
+            if rows:
+                self.channel.send("artifacts", kind=kind, rows=rows, time_field=time_field)
+
+
+class _LineWriter:
+    """sys.stdout/sys.stderr for the plugin: forwards complete lines to the application console."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.partial = ""
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            *lines, self.partial = (self.partial + text).split('\n')
+        for line in lines:
+            if line.strip():
+                self.channel.send("log", line=line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def watch_for_cancel(cancel_event):
+    """Sets the job's cancel flag when the application sends "cancel" or goes away (EOF)."""
+    for line in sys.stdin:
+        if line.strip() == "cancel":
+            break
+    cancel_event.set()
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    channel = MessageChannel(sys.stdout)
+    request = json.loads(sys.stdin.readline())
+    manifest = request["manifest"]
+    if manifest["search_path"] not in sys.path:
+        sys.path.insert(0, manifest["search_path"])
+
+    # Binding a Job makes check_cancelled()/report_progress() work unchanged inside plugins
+    job = Job(0, manifest["name"], None, (), {}, DEFAULT_PRIORITY, {}, [], None,
+              lambda job, message: channel.send("progress", message=message))
+    threading.Thread(target=watch_for_cancel, args=(job.cancel_event,), daemon=True).start()
+
+    context = PluginContext(manifest, request["image_path"], request["output_dir"], channel)
+    sys.stdout = sys.stderr = _LineWriter(channel)
+    try:
+        module_name, class_name = manifest["entry_point"].split(":")
+        module = importlib.import_module(f"{manifest['package']}.{module_name}")
+        plugin = getattr(module, class_name)(request["image_path"], request["output_dir"], context)
+        job.func = plugin.run
+        result = job.run()
+    except BaseException as e:
+        if not isinstance(e, TaskCancelled):
+            traceback.print_exc()  # Reaches the application console through the line writer
+        context.flush()
+        channel.send("error", error=f"{type(e).__name__}: {e}", cancelled=isinstance(e, TaskCancelled))
+        return 1
+    context.flush()
+    channel.send("result", value=result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
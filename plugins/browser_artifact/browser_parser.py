@@ -1,28 +1,274 @@
 import os
+import csv
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import pytsk3
+
+from task_scheduler import check_cancelled, report_progress
+
+# --- Configuration & Constants ---
+READ_CHUNK_SIZE = 1024 * 1024          # Bytes per read_random() call when pulling a file out of the image
+IN_MEMORY_LIMIT = 256 * 1024 * 1024    # Larger databases are spooled to a temp file instead of RAM
+FETCH_BATCH_SIZE = 5000                # Rows per fetchmany() batch when streaming visits/downloads
+
+# Profile database locations, as path components below the filesystem root.
+# '*' matches any directory name (user names, profile names); matching is case-insensitive.
+BROWSER_PROFILE_PATTERNS = [
+    ("Chrome", "chromium", ["Users", "*", "AppData", "Local", "Google", "Chrome", "User Data", "*", "History"]),
+    ("Edge", "chromium", ["Users", "*", "AppData", "Local", "Microsoft", "Edge", "User Data", "*", "History"]),
+    ("Firefox", "firefox", ["Users", "*", "AppData", "Roaming", "Mozilla", "Firefox", "Profiles", "*", "places.sqlite"]),
+    ("Chrome", "chromium", ["Users", "*", "Library", "Application Support", "Google", "Chrome", "*", "History"]),
+    ("Edge", "chromium", ["Users", "*", "Library", "Application Support", "Microsoft Edge", "*", "History"]),
+    ("Firefox", "firefox", ["Users", "*", "Library", "Application Support", "Firefox", "Profiles", "*", "places.sqlite"]),
+    ("Chrome", "chromium", ["home", "*", ".config", "google-chrome", "*", "History"]),
+    ("Edge", "chromium", ["home", "*", ".config", "microsoft-edge", "*", "History"]),
+    ("Chromium", "chromium", ["home", "*", ".config", "chromium", "*", "History"]),
+    ("Firefox", "firefox", ["home", "*", ".mozilla", "firefox", "*", "places.sqlite"]),
+]
+
+CHROME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)  # WebKit timestamps: microseconds since 1601
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)    # Firefox PRTime: microseconds since 1970
+
+OUTPUT_COLUMNS = ["browser", "profile", "artifact", "timestamp_utc", "url", "title_or_target", "detail"]
+
+# Each query yields rows of (raw_time, url, title_or_target, detail)
+HISTORY_QUERIES = {
+    "chromium": {
+        "visit": "SELECT v.visit_time, u.url, u.title, v.transition FROM visits v JOIN urls u ON u.id = v.url",
+        "download": "SELECT start_time, tab_url, target_path, received_bytes || '/' || total_bytes FROM downloads",
+    },
+    "firefox": {
+        "visit": "SELECT v.visit_date, p.url, p.title, v.visit_type FROM moz_historyvisits v JOIN moz_places p ON p.id = v.place_id",
+        "download": ("SELECT a.dateAdded, p.url, a.content, NULL FROM moz_annos a "
+                     "JOIN moz_anno_attributes n ON n.id = a.anno_attribute_id "
+                     "JOIN moz_places p ON p.id = a.place_id WHERE n.name = 'downloads/destinationFileURI'"),
+    },
+}
+
+
+def convert_timestamp(family, raw):
+    """Converts a browser timestamp (microseconds) into an ISO-8601 UTC string."""
+    if not raw:
+        return ""
+    epoch = CHROME_EPOCH if family == "chromium" else UNIX_EPOCH
+    try:
+        return (epoch + timedelta(microseconds=int(raw))).strftime('%Y-%m-%d %H:%M:%S')
+    except (OverflowError, ValueError, TypeError):
+        return str(raw)
+
 
 class BrowserArtifactPlugin:
-    NAME = "Chrome History Extractor"
-    DESCRIPTION = "Extracts metadata from Chrome's SQLite history database."
+    NAME = "Browser History Extractor"
+    DESCRIPTION = "Extracts visits and downloads from every Chrome/Edge/Firefox profile inside a disk image."
     TARGET_TYPE = "disk_image" # Specifies this plugin works on a mounted disk image
 
-    def __init__(self, image_path, output_dir):
+    def __init__(self, image_path, output_dir, context=None):
         self.image_path = image_path
         self.output_dir = output_dir
+        self.context = context  # plugin_worker.PluginContext when run by the suite, None when run directly
+        self.output_lock = threading.Lock()
+        self.counts = {"visit": 0, "download": 0}
+
+    # --- Locating Profiles Inside the Image ---
+    def open_filesystems(self, img):
+        """Yields an FS_Info for every recognised partition (or the whole image when unpartitioned)."""
+        try:
+            volume = pytsk3.Volume_Info(img)
+            block_size = volume.info.block_size
+            partitions = [part for part in volume if part.flags == pytsk3.TSK_VS_PART_FLAG_ALLOC and part.len > 0]
+        except IOError:
+            partitions = []
+
+        if not partitions:
+            try:
+                yield "offset 0", pytsk3.FS_Info(img, offset=0)
+            except IOError as e:
+                print(f"[{self.NAME}] No file system found in image: {e}")
+            return
+
+        for part in partitions:
+            try:
+                yield part.desc.decode('utf-8', 'replace'), pytsk3.FS_Info(img, offset=part.start * block_size)
+            except IOError:
+                continue  # Unsupported or unformatted partition
+
+    def find_profile_databases(self, fs, components, directory=None, path=""):
+        """Case-insensitive glob over TSK directories. Yields (path, file_entry)."""
+        if directory is None:
+            directory = fs.open_dir(path="/")
+        wanted = components[0]
+
+        for entry in directory:
+            name = entry.info.name.name
+            if name in (b".", b"..") or entry.info.meta is None:
+                continue
+            name = name.decode('utf-8', 'replace')
+            if wanted != "*" and name.lower() != wanted.lower():
+                continue
+
+            entry_path = f"{path}/{name}"
+            if len(components) == 1:
+                if entry.info.meta.type == pytsk3.TSK_FS_META_TYPE_REG:
+                    yield entry_path, entry
+            elif entry.info.meta.type == pytsk3.TSK_FS_META_TYPE_DIR:
+                try:
+                    subdir = entry.as_directory()
+                except IOError:
+                    continue
+                yield from self.find_profile_databases(fs, components[1:], subdir, entry_path)
+
+    def open_in_image(self, fs, path):
+        """Opens a file by its path in the image's filesystem; None if it does not exist (e.g. no '-wal')."""
+        try:
+            return fs.open(path)
+        except IOError:
+            return None
+
+    # --- Reading Files Straight From the Image ---
+    def read_file(self, file_entry):
+        """Reads a file out of the image in chunks; small files stay in memory, large ones spool to disk."""
+        size = file_entry.info.meta.size
+        target = bytearray() if size <= IN_MEMORY_LIMIT else tempfile.TemporaryFile()
+        offset = 0
+        while offset < size:
+            chunk = file_entry.read_random(offset, min(READ_CHUNK_SIZE, size - offset))
+            if not chunk:
+                break
+            if isinstance(target, bytearray):
+                target += chunk
+            else:
+                target.write(chunk)
+            offset += len(chunk)
+        return target
+
+    def open_database(self, db_data, wal_data):
+        """
+        Returns (connection, temp_dir). Databases with a WAL are written to a private
+        temp directory so SQLite can replay the WAL; the rest are deserialized in memory.
+        """
+        if wal_data is None and isinstance(db_data, bytearray) and hasattr(sqlite3.Connection, "deserialize"):
+            if len(db_data) > 19 and db_data[18] == 2:
+                db_data[18] = db_data[19] = 1  # WAL-mode header flag; the in-memory copy is rollback-only
+            conn = sqlite3.connect(":memory:")
+            conn.deserialize(bytes(db_data))
+            return conn, None
+
+        temp_dir = tempfile.TemporaryDirectory(prefix="browser_artifact_")
+        db_file = os.path.join(temp_dir.name, "profile.db")
+        for path, data in ((db_file, db_data), (db_file + "-wal", wal_data)):
+            if data is None:
+                continue
+            with open(path, 'wb') as out_f:
+                if isinstance(data, bytearray):
+                    out_f.write(data)
+                else:
+                    data.seek(0)
+                    while True:
+                        chunk = data.read(READ_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        out_f.write(chunk)
+                    data.close()
+        return sqlite3.connect(db_file), temp_dir
+
+    # --- Parsing (runs concurrently per profile) ---
+    def parse_profile(self, browser, family, profile_path, db_data, wal_data, writer, in_flight):
+        parsed = {"visit": 0, "download": 0}
+        try:
+            conn, temp_dir = self.open_database(db_data, wal_data)
+        finally:
+            del db_data, wal_data
+            in_flight.release()
+        try:
+            for artifact, query in HISTORY_QUERIES[family].items():
+                try:
+                    cursor = conn.execute(query)
+                except sqlite3.Error as e:
+                    print(f"[{self.NAME}] {profile_path}: no {artifact} data ({e})")
+                    continue
+                while True:
+                    rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                    if not rows:
+                        break
+                    output = [
+                        [browser, profile_path, artifact, convert_timestamp(family, raw_time), url, title, detail]
+                        for raw_time, url, title, detail in rows
+                    ]
+                    with self.output_lock:
+                        writer.writerows(output)
+                    if self.context is not None:
+                        self.context.emit("browser_history", [dict(zip(OUTPUT_COLUMNS, row)) for row in output], "timestamp_utc")
+                    parsed[artifact] += len(rows)
+        finally:
+            conn.close()
+            if temp_dir is not None:
+                temp_dir.cleanup()
+
+        with self.output_lock:
+            for artifact, count in parsed.items():
+                self.counts[artifact] += count
+        print(f"[{self.NAME}] {browser} profile {profile_path}: {parsed['visit']} visits, {parsed['download']} downloads")
 
     def run(self):
         """The main execution method for the plugin."""
         print(f"\n[PLUGIN: {self.NAME}] Starting analysis on image: {self.image_path}")
-        
-        # --- Simulated Plugin Logic (P3/P4 Feature) ---
-        # In a real scenario, this would use pytsk3 to find the Chrome history file, 
-        # extract it, and use the 'sqlite3' module to parse it.
-        
-        simulated_files_found = 125
-        
-        print(f"[{self.NAME}] Found and processed {simulated_files_found} history entries.")
-        print(f"[{self.NAME}] Analysis successful. Results saved to {self.output_dir}/browser_log.txt")
-        return f"Browser artifact extraction completed. {simulated_files_found} entries processed."
+
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        output_path = os.path.join(self.output_dir, "browser_history.csv")
+
+        img = self.context.open_image() if self.context is not None else pytsk3.Img_Info(self.image_path)
+        profiles = 0
+
+        with open(output_path, 'w', newline='', encoding='utf-8') as out_f:
+            writer = csv.writer(out_f)
+            writer.writerow(OUTPUT_COLUMNS)
+
+            # The image is read sequentially in this thread (TSK handles are not shared across
+            # threads) while already-extracted profiles are parsed in the pool. The semaphore
+            # caps how many extracted databases wait in memory at once.
+            workers = min(8, os.cpu_count() or 1)
+            in_flight = threading.BoundedSemaphore(workers * 2)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = []
+                for partition, fs in self.open_filesystems(img):
+                    for browser, family, components in BROWSER_PROFILE_PATTERNS:
+                        try:
+                            matches = list(self.find_profile_databases(fs, components))
+                        except IOError:
+                            continue
+                        for path, entry in matches:
+                            check_cancelled()
+                            report_progress(f"Extracting {browser} profile {path}")
+                            wal_entry = self.open_in_image(fs, path + "-wal")
+                            profile_path = f"{partition}:{path}"
+                            in_flight.acquire()
+                            try:
+                                db_data = self.read_file(entry)
+                                wal_data = self.read_file(wal_entry) if wal_entry is not None else None
+                                futures.append(pool.submit(self.parse_profile, browser, family, profile_path, db_data, wal_data, writer, in_flight))
+                            except (IOError, RuntimeError) as e:
+                                # Deleted or damaged entries: skip this profile, keep going with the rest
+                                in_flight.release()
+                                print(f"[{self.NAME}] Skipping {browser} profile {profile_path}: cannot read it from the image ({e})")
+                                continue
+                            profiles += 1
+
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"[{self.NAME}] Failed to parse a profile: {e}")
+
+        print(f"[{self.NAME}] Processed {profiles} browser profiles: {self.counts['visit']} visits, {self.counts['download']} downloads.")
+        print(f"[{self.NAME}] Analysis successful. Results saved to {output_path}")
+        return (f"Browser artifact extraction completed. {self.counts['visit']} visits and "
+                f"{self.counts['download']} downloads from {profiles} profiles.")
 
 # --- Helper function for the main application to load it ---
 def get_plugin_class():
-    return BrowserArtifactPlugin
\ No newline at end of file
+    return BrowserArtifactPlugin
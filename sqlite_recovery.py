@@ -0,0 +1,929 @@
+import os
+import re
+import sys
+import csv
+import mmap
+import sqlite3
+import struct
+from array import array
+from task_scheduler import check_cancelled, report_progress
+from case_store import emit_artifacts, record_outputs, recording
+from instrumentation import stage, add_throughput
+
+# --- Configuration & Constants ---
+SQLITE_HEADER = b'SQLite format 3\x00'
+DB_HEADER_SIZE = 100
+PAGE_CHECK_INTERVAL = 1024  # Pages/frames scanned between cancellation checks and progress updates
+STORE_BATCH_SIZE = 5000     # Recovered records per batch handed to the case store
+
+PAGE_TYPE_TABLE_INTERIOR = 0x05
+PAGE_TYPE_TABLE_LEAF = 0x0D
+
+WAL_MAGIC = (0x377F0682, 0x377F0683)  # Checksums use little-endian words for ...82, big-endian for ...83
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+
+JOURNAL_MAGIC = b'\xd9\xd5\x05\xf9\x20\xa1\x63\xd7'
+JOURNAL_DEFAULT_SECTOR = 512
+
+TEXT_ENCODINGS = {1: 'utf-8', 2: 'utf-16-le', 3: 'utf-16-be'}
+
+# Which record serial types are plausible for each column affinity (heuristic carving filter).
+# 0 = NULL, 1-6 = integers, 7 = float, 8/9 = constant 0/1, 'text' and 'blob' are the variable types.
+AFFINITY_SERIAL_TYPES = {
+    "INTEGER": {"int", "real"},
+    "REAL": {"int", "real"},
+    "NUMERIC": {"int", "real", "text"},
+    "TEXT": {"text"},
+    "BLOB": {"int", "real", "text", "blob"},
+}
+
+_INT_SIZES = {1: 1, 2: 2, 3: 3, 4: 4, 5: 6, 6: 8}
+
+# First byte of a serial type varint, per class (0x80-0xFF starts a multi-byte varint: long text/blob)
+_SERIAL_FIRST_BYTES = {
+    "null": {0},
+    "int": {1, 2, 3, 4, 5, 6, 8, 9},
+    "real": {7},
+    "text": set(range(13, 128, 2)) | set(range(0x80, 0x100)),
+    "blob": set(range(12, 128, 2)) | set(range(0x80, 0x100)),
+}
+
+
+# --- Low-Level Record Decoding ---
+def _map_file(path):
+    """Memory-maps a file read-only; returns None when it is missing or empty."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+
+def read_varint(buf, offset, end):
+    """Decodes a SQLite varint. Returns (value, next_offset), or (None, offset) if it runs past end."""
+    if offset < end and buf[offset] < 0x80:
+        return buf[offset], offset + 1  # Single-byte varints (0..127) are by far the most common
+    value = 0
+    for i in range(9):
+        if offset + i >= end:
+            return None, offset
+        byte = buf[offset + i]
+        if i == 8:
+            return (value << 8) | byte, offset + 9
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, offset + i + 1
+    return None, offset
+
+
+def serial_type_class(serial_type):
+    if serial_type == 0:
+        return "null"
+    if serial_type <= 6 or serial_type in (8, 9):
+        return "int"
+    if serial_type == 7:
+        return "real"
+    if serial_type >= 12:
+        return "blob" if serial_type % 2 == 0 else "text"
+    return None  # 10 and 11 are reserved
+
+
+def serial_type_size(serial_type):
+    if serial_type >= 12:
+        return (serial_type - 12) // 2
+    if serial_type == 7:
+        return 8
+    return _INT_SIZES.get(serial_type, 0)
+
+
+def decode_value(buf, offset, serial_type, encoding):
+    """Decodes one record value. Raises ValueError/UnicodeDecodeError on garbage."""
+    if serial_type == 0:
+        return None
+    if serial_type == 8:
+        return 0
+    if serial_type == 9:
+        return 1
+    if serial_type == 7:
+        return struct.unpack_from('>d', buf, offset)[0]
+    size = serial_type_size(serial_type)
+    raw = bytes(buf[offset:offset + size])
+    if serial_type <= 6:
+        return int.from_bytes(raw, 'big', signed=True)
+    if serial_type % 2 == 1:
+        return raw.decode(encoding)
+    return raw
+
+
+def wal_checksum(buf, offset, length, big_endian, s0, s1):
+    """SQLite's cumulative WAL checksum over length bytes (a multiple of 8), continuing from (s0, s1)."""
+    words = struct.unpack_from(f"{'>' if big_endian else '<'}{length // 4}I", buf, offset)
+    for i in range(0, len(words), 2):
+        s0 = (s0 + words[i] + s1) & 0xFFFFFFFF
+        s1 = (s1 + words[i + 1] + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def row_key(values):
+    """Index key of a row: type and length of every value plus the first non-NULL value."""
+    shape = tuple((type(value).__name__, len(value) if isinstance(value, (str, bytes)) else 0) for value in values)
+    return hash((shape, next((value for value in values if value is not None), None)))
+
+
+def same_or_damaged(carved, live):
+    """Equal values, or carved text that matches live text up to where NULs overwrote the rest."""
+    if carved == live:
+        return True
+    if not isinstance(carved, str) or not isinstance(live, str) or len(carved) != len(live):
+        return False
+    cut = carved.find('\x00')
+    return cut != -1 and carved[:cut] == live[:cut]
+
+
+def is_damaged_copy(carved, live):
+    """
+    True when carved values are a copy of a live row: every value equal or cut short
+    by NULs, except that the last non-NULL text/blob may hold other bytes of the same
+    length, where the growing cell pointer array overwrote the end of the record.
+    """
+    if len(carved) != len(live):
+        return False
+    last = max((i for i, value in enumerate(live) if value is not None), default=-1)
+    for i, (value, live_value) in enumerate(zip(carved, live)):
+        if same_or_damaged(value, live_value):
+            continue
+        if i != last or type(value) is not type(live_value) or not isinstance(value, (str, bytes)) \
+                or len(value) != len(live_value):
+            return False
+    return True
+
+
+def _byte_class(values):
+    return b'[' + b''.join(re.escape(bytes([value])) for value in sorted(values)) + b']'
+
+
+def column_affinity(declared_type):
+    """SQLite's type affinity rules (section 3.1 of the datatype documentation)."""
+    declared = (declared_type or "").upper()
+    if "INT" in declared:
+        return "INTEGER"
+    if "CHAR" in declared or "CLOB" in declared or "TEXT" in declared:
+        return "TEXT"
+    if "BLOB" in declared or not declared:
+        return "BLOB"
+    if "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+        return "REAL"
+    return "NUMERIC"
+
+
+def decode_record(payload, encoding):
+    """Decodes a complete record payload into a list of values (None if malformed)."""
+    header_len, pos = read_varint(payload, 0, len(payload))
+    if header_len is None or header_len > len(payload):
+        return None
+    serial_types = []
+    while pos < header_len:
+        serial_type, pos = read_varint(payload, pos, header_len)
+        if serial_type is None or serial_type_class(serial_type) is None:
+            return None
+        serial_types.append(serial_type)
+    values = []
+    pos = header_len
+    try:
+        for serial_type in serial_types:
+            values.append(decode_value(payload, pos, serial_type, encoding))
+            pos += serial_type_size(serial_type)
+    except (ValueError, UnicodeDecodeError, struct.error):
+        return None
+    return values
+
+
+def record_matches_table(serial_types, table):
+    """Checks a candidate record header against a table's column count and affinities."""
+    if len(serial_types) != len(table["columns"]):
+        return False
+    has_value = False
+    for index, (serial_type, affinity) in enumerate(zip(serial_types, table["affinities"])):
+        kind = serial_type_class(serial_type)
+        if kind is None:
+            return False
+        if index == table["ipk"]:
+            if kind != "null":
+                return False
+            continue
+        if kind == "null":
+            continue
+        if kind not in AFFINITY_SERIAL_TYPES[affinity]:
+            return False
+        has_value = True
+    return has_value
+
+
+# --- Recovery Engine ---
+class SQLiteRecoveryEngine:
+    """
+    Recovers deleted records from a SQLite database and its -wal / -journal
+    companions. All files are memory-mapped and processed one page at a time,
+    so memory use stays bounded regardless of the database size.
+    """
+
+    def __init__(self, db_path, output_dir):
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self.writers = {}
+        self.counts = {}
+        self.store_rows = recording()  # Also hand records to the case store when a case run is active
+        self.pending = []
+        self.live_rows = {}    # Table name -> {row_key: [rowid, ...]} of its live rows (built on first carved record)
+        self.emitted = {}      # (table, row_key) -> values already written, so copies in other frames are skipped
+        self.seen_cells = set()  # (owner, rowid, payload hash) of historic cells already checked
+        self.skipped_live = 0
+        self.skipped_duplicates = 0
+
+        self.db = _map_file(db_path)
+        if self.db is None or self.db[:16] != SQLITE_HEADER:
+            raise ValueError("Not a SQLite database (bad header).")
+        page_size = struct.unpack_from('>H', self.db, 16)[0]
+        self.page_size = 65536 if page_size == 1 else page_size
+        self.usable_size = self.page_size - self.db[20]
+        self.encoding = TEXT_ENCODINGS.get(struct.unpack_from('>I', self.db, 56)[0], 'utf-8')
+        self.db_page_count = len(self.db) // self.page_size
+
+        self.wal = _map_file(db_path + "-wal")
+        self.journal = _map_file(db_path + "-journal")
+        self.wal_committed_end = WAL_HEADER_SIZE
+        self.wal_latest = self.index_wal()
+
+        self.tables = self.load_schema()
+        self.max_columns = max((len(table["columns"]) for table in self.tables), default=0)
+        self.owners = self.map_page_owners()
+        self.patterns = {}  # Candidate tables -> carving pre-filter regexes
+
+    def close(self):
+        for f, _ in self.writers.values():
+            f.close()
+        self.writers = {}
+        for mm in (self.db, self.wal, self.journal):
+            if mm is not None:
+                mm.close()
+
+    # --- Page Access ---
+    def index_wal(self):
+        """
+        Returns {page_no: page_offset_in_wal} for the newest committed frame of each page.
+        As in SQLite, frames are valid while their salts match the header and the
+        cumulative checksum holds, and they count only up to the last valid commit
+        frame. Later frames (uncommitted or torn transactions) start at wal_committed_end.
+        """
+        latest = {}
+        if self.wal is None or len(self.wal) < WAL_HEADER_SIZE:
+            return latest
+        magic, _, page_size, _, salt1, salt2, check1, check2 = struct.unpack_from('>IIIIIIII', self.wal, 0)
+        if magic not in WAL_MAGIC or page_size != self.page_size:
+            print("|-- WARNING: WAL header is invalid or does not match the database, ignoring overlay.")
+            return latest
+        big_endian = magic & 1
+        checksum = wal_checksum(self.wal, 0, 24, big_endian, 0, 0)
+        if checksum != (check1, check2):
+            print("|-- WARNING: WAL header checksum is invalid, ignoring overlay (all frames reported as uncommitted).")
+            return latest
+
+        pending = {}
+        offset = WAL_HEADER_SIZE
+        while offset + WAL_FRAME_HEADER_SIZE + page_size <= len(self.wal):
+            page_no, commit_size, frame_salt1, frame_salt2, check1, check2 = struct.unpack_from('>IIIIII', self.wal, offset)
+            if (frame_salt1, frame_salt2) != (salt1, salt2):
+                break
+            checksum = wal_checksum(self.wal, offset, 8, big_endian, *checksum)
+            checksum = wal_checksum(self.wal, offset + WAL_FRAME_HEADER_SIZE, page_size, big_endian, *checksum)
+            if checksum != (check1, check2):
+                break
+            pending[page_no] = offset + WAL_FRAME_HEADER_SIZE
+            offset += WAL_FRAME_HEADER_SIZE + page_size
+            if commit_size:
+                latest.update(pending)
+                pending = {}
+                self.wal_committed_end = offset
+        return latest
+
+    def page(self, page_no):
+        """Returns (buffer, page_offset) of the current version of a page (WAL overlay first)."""
+        if page_no in self.wal_latest:
+            return self.wal, self.wal_latest[page_no]
+        if 0 < page_no <= self.db_page_count:
+            return self.db, (page_no - 1) * self.page_size
+        return None, 0
+
+    def iter_table_cells(self, root_page):
+        """Yields (rowid, payload) for every cell of a table b-tree, following overflow chains."""
+        pending = [root_page]
+        visited = set()
+        while pending:
+            page_no = pending.pop()
+            buf, page_offset = self.page(page_no)
+            if buf is None or page_no in visited:
+                continue
+            visited.add(page_no)
+            header_offset = page_offset + (DB_HEADER_SIZE if page_no == 1 else 0)
+            page_type = buf[header_offset]
+            cell_count = struct.unpack_from('>H', buf, header_offset + 3)[0]
+
+            if page_type == PAGE_TYPE_TABLE_INTERIOR:
+                pending.append(struct.unpack_from('>I', buf, header_offset + 8)[0])
+                for i in range(cell_count):
+                    cell = page_offset + struct.unpack_from('>H', buf, header_offset + 12 + 2 * i)[0]
+                    pending.append(struct.unpack_from('>I', buf, cell)[0])
+            elif page_type == PAGE_TYPE_TABLE_LEAF:
+                for i in range(cell_count):
+                    cell = page_offset + struct.unpack_from('>H', buf, header_offset + 8 + 2 * i)[0]
+                    payload_size, pos = read_varint(buf, cell, page_offset + self.usable_size)
+                    rowid, pos = read_varint(buf, pos, page_offset + self.usable_size)
+                    if payload_size is not None and rowid is not None:
+                        yield rowid, self.read_payload(buf, pos, payload_size)
+
+    def read_payload(self, buf, offset, payload_size):
+        """Reads a cell payload, including the part spilled onto overflow pages."""
+        usable = self.usable_size
+        max_local = usable - 35
+        if payload_size <= max_local:
+            return bytes(buf[offset:offset + payload_size])
+        min_local = (usable - 12) * 32 // 255 - 23
+        local = min_local + (payload_size - min_local) % (usable - 4)
+        if local > max_local:
+            local = min_local
+
+        parts = [bytes(buf[offset:offset + local])]
+        remaining = payload_size - local
+        overflow = struct.unpack_from('>I', buf, offset + local)[0]
+        while remaining > 0 and overflow:
+            page_buf, page_offset = self.page(overflow)
+            if page_buf is None:
+                break
+            chunk = min(remaining, usable - 4)
+            parts.append(bytes(page_buf[page_offset + 4:page_offset + 4 + chunk]))
+            remaining -= chunk
+            overflow = struct.unpack_from('>I', page_buf, page_offset)[0]
+        return b''.join(parts)
+
+    def load_schema(self):
+        """
+        Reads sqlite_master straight from the pages (so schema that exists only in
+        the WAL is found too) and resolves column definitions by replaying each
+        CREATE TABLE statement in an in-memory database.
+        """
+        tables = []
+        scratch = sqlite3.connect(":memory:")
+        try:
+            for _, payload in self.iter_table_cells(1):
+                values = decode_record(payload, self.encoding)
+                if not values or len(values) < 5 or values[0] != "table" or not isinstance(values[4], str):
+                    continue
+                name, rootpage, sql = values[1], values[3], values[4]
+                if name.startswith("sqlite_") or "WITHOUT ROWID" in sql.upper() or sql.upper().startswith("CREATE VIRTUAL"):
+                    continue
+                try:
+                    scratch.execute(sql)
+                except sqlite3.Error:
+                    continue
+                info = scratch.execute(f'PRAGMA table_info("{name.replace(chr(34), chr(34) * 2)}")').fetchall()
+                primary_keys = [column for column in info if column[5]]
+                # A lone INTEGER PRIMARY KEY aliases the rowid and is stored as NULL in the record
+                ipk = primary_keys[0][0] if len(primary_keys) == 1 and primary_keys[0][2].upper() == "INTEGER" else None
+                tables.append({
+                    "name": name,
+                    "rootpage": rootpage or 0,
+                    "columns": [column[1] for column in info],
+                    "affinities": [column_affinity(column[2]) for column in info],
+                    "ipk": ipk,
+                })
+        finally:
+            scratch.close()
+        return tables
+
+    def map_page_owners(self):
+        """Walks every table b-tree from its root page; returns array[page] = table index + 1."""
+        page_count = max([self.db_page_count] + list(self.wal_latest))
+        owners = array('H', bytes(2 * (page_count + 1)))
+        for index, table in enumerate(self.tables, start=1):
+            pending = [table["rootpage"]]
+            while pending:
+                page_no = pending.pop()
+                buf, page_offset = self.page(page_no)
+                if buf is None or page_no > page_count or owners[page_no]:
+                    continue
+                owners[page_no] = index
+                header_offset = page_offset + (DB_HEADER_SIZE if page_no == 1 else 0)
+                if buf[header_offset] != PAGE_TYPE_TABLE_INTERIOR:
+                    continue
+                pending.append(struct.unpack_from('>I', buf, header_offset + 8)[0])
+                for i in range(struct.unpack_from('>H', buf, header_offset + 3)[0]):
+                    cell = page_offset + struct.unpack_from('>H', buf, header_offset + 12 + 2 * i)[0]
+                    pending.append(struct.unpack_from('>I', buf, cell)[0])
+        return owners
+
+    def owner_of(self, page_no):
+        return self.owners[page_no] if page_no < len(self.owners) else 0
+
+    def map_freelist(self):
+        """Returns bytearray[page] = 1 for freelist leaf pages and 2 for trunk pages of the main file."""
+        freelist = bytearray(self.db_page_count + 1)
+        trunk = struct.unpack_from('>I', self.db, 32)[0]
+        while 0 < trunk <= self.db_page_count and not freelist[trunk]:
+            freelist[trunk] = 2
+            offset = (trunk - 1) * self.page_size
+            next_trunk, leaf_count = struct.unpack_from('>II', self.db, offset)
+            leaf_count = min(leaf_count, (self.usable_size - 8) // 4)
+            for leaf in struct.unpack_from(f'>{leaf_count}I', self.db, offset + 8):
+                if 0 < leaf <= self.db_page_count:
+                    freelist[leaf] = 1
+            trunk = next_trunk
+        return freelist
+
+    # --- Output ---
+    def emit(self, table, values, rowid, source, page, offset, region):
+        """
+        Writes one recovered record to the per-table CSV (opened on first use).
+        Carved records that equal a live row are stale copies left by page rebuilds,
+        not deletions, and every record is written only once however many frames
+        or pages hold a copy. Returns True when the record was written.
+        """
+        name = table["name"]
+        if region != "cell" and self.matches_live_row(table, values):
+            self.skipped_live += 1
+            return False
+        written = self.emitted.setdefault((name, row_key(values)), [])
+        if any(is_damaged_copy(values, earlier) for earlier in written):
+            self.skipped_duplicates += 1
+            return False
+        written.append(values)
+        if name not in self.writers:
+            safe_name = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in name)
+            f = open(os.path.join(self.output_dir, f"recovered_{safe_name}.csv"), 'w', newline='', encoding='utf-8')
+            writer = csv.writer(f)
+            writer.writerow(["source", "page", "offset", "region", "rowid"] + table["columns"])
+            self.writers[name] = (f, writer)
+        row = [value.hex() if isinstance(value, bytes) else value for value in values]
+        self.writers[name][1].writerow([source, page, offset, region, rowid] + row)
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self.store_rows:
+            self.pending.append({"table": name, "source": source, "page": page, "offset": offset, "region": region,
+                                 "rowid": rowid, "values": dict(zip(table["columns"], row))})
+            if len(self.pending) >= STORE_BATCH_SIZE:
+                self.flush_artifacts()
+        return True
+
+    def flush_artifacts(self):
+        emit_artifacts("recovered_record", self.pending)
+        self.pending = []
+
+    def lookup_payload(self, table, rowid):
+        """Binary-searches the current (WAL-overlaid) table b-tree for a rowid; returns its record payload or None."""
+        page_no = table["rootpage"]
+        for _ in range(64):  # Depth guard against corrupt pointers
+            buf, page_offset = self.page(page_no)
+            if buf is None:
+                return None
+            header_offset = page_offset + (DB_HEADER_SIZE if page_no == 1 else 0)
+            page_type = buf[header_offset]
+            cell_count = struct.unpack_from('>H', buf, header_offset + 3)[0]
+            usable_end = page_offset + self.usable_size
+
+            if page_type == PAGE_TYPE_TABLE_INTERIOR:
+                low, high = 0, cell_count
+                while low < high:
+                    middle = (low + high) // 2
+                    cell = page_offset + struct.unpack_from('>H', buf, header_offset + 12 + 2 * middle)[0]
+                    if read_varint(buf, cell + 4, usable_end)[0] < rowid:
+                        low = middle + 1
+                    else:
+                        high = middle
+                if low == cell_count:
+                    page_no = struct.unpack_from('>I', buf, header_offset + 8)[0]
+                else:
+                    cell = page_offset + struct.unpack_from('>H', buf, header_offset + 12 + 2 * low)[0]
+                    page_no = struct.unpack_from('>I', buf, cell)[0]
+            elif page_type == PAGE_TYPE_TABLE_LEAF:
+                # Leaf cells are ordered by rowid as well
+                low, high = 0, cell_count
+                while low < high:
+                    middle = (low + high) // 2
+                    cell = page_offset + struct.unpack_from('>H', buf, header_offset + 8 + 2 * middle)[0]
+                    payload_size, pos = read_varint(buf, cell, usable_end)
+                    cell_rowid, pos = read_varint(buf, pos, usable_end)
+                    if payload_size is None or cell_rowid is None:
+                        return None
+                    if cell_rowid == rowid:
+                        return self.read_payload(buf, pos, payload_size)
+                    if cell_rowid < rowid:
+                        low = middle + 1
+                    else:
+                        high = middle
+                return None
+            else:
+                return None
+        return None
+
+    def is_live(self, table, rowid, values):
+        """True when an identical row still exists in the current table (i.e. not a deletion)."""
+        payload = self.lookup_payload(table, rowid)
+        return payload is not None and decode_record(payload, self.encoding) == values
+
+    def is_stale_copy(self, table, rowid, buf, offset):
+        """
+        True when a record carved at offset belongs to a live row: the table still has
+        its rowid with the identical record header. Page rebuilds leave such copies,
+        often partly overwritten, in free space; they are not deletions.
+        """
+        payload = self.lookup_payload(table, rowid)
+        if payload is None:
+            return False
+        header_len = read_varint(buf, offset, len(buf))[0]
+        return payload[:header_len] == bytes(buf[offset:offset + header_len])
+
+    def carved_rowid(self, buf, start, offset, payload_size):
+        """Rowid from the cell header in front of a carved record (payload size varint, rowid varint), if it survived."""
+        for cell in range(max(start, offset - 18), offset - 1):
+            size, pos = read_varint(buf, cell, offset)
+            if size != payload_size:
+                continue
+            rowid, pos = read_varint(buf, pos, offset)
+            if rowid is not None and pos == offset:
+                return rowid
+        return None
+
+    def matches_live_row(self, table, values):
+        """
+        True when carved values (no rowid) belong to a row of the current table: equal
+        values, or a copy whose end a later write overwrote (see is_damaged_copy).
+        """
+        name = table["name"]
+        if name not in self.live_rows:
+            index = {}
+            for rowid, payload in self.iter_table_cells(table["rootpage"]):
+                live = decode_record(payload, self.encoding)
+                if live is not None:
+                    index.setdefault(row_key(live), []).append(rowid)
+            self.live_rows[name] = index
+        for rowid in self.live_rows[name].get(row_key(values), ()):
+            payload = self.lookup_payload(table, rowid)
+            live = decode_record(payload, self.encoding) if payload is not None else None
+            if live is not None and is_damaged_copy(values, live):
+                return True
+        return False
+
+    # --- Record Parsing ---
+    def parse_record(self, buf, offset, end, candidates):
+        """
+        Parses a record (header length varint, serial types, body) at offset.
+        Returns (table, values, record_end) or None if it is not a plausible record.
+        """
+        header_len, pos = read_varint(buf, offset, end)
+        if header_len is None or header_len < 2 or header_len > 1 + 9 * self.max_columns:
+            return None
+        header_end = offset + header_len
+        if header_end > end:
+            return None
+
+        serial_types = []
+        while pos < header_end:
+            serial_type, pos = read_varint(buf, pos, header_end)
+            if serial_type is None:
+                return None
+            serial_types.append(serial_type)
+        if pos != header_end:
+            return None
+        return self.decode_body(buf, serial_types, header_end, end, candidates)
+
+    def parse_headerless_record(self, buf, offset, end, candidates, prefix):
+        """
+        Freeblock fallback: the first 4 bytes of a freed cell are overwritten by the
+        freeblock header, often destroying the record header length (and with it
+        the serial type of the INTEGER PRIMARY KEY). Serial types are read from
+        offset with the given known prefix prepended.
+        """
+        for table in candidates:
+            width = len(table["columns"]) - len(prefix)
+            if width <= 0 or (prefix and table["ipk"] != 0):
+                continue
+            serial_types = list(prefix)
+            pos = offset
+            for _ in range(width):
+                serial_type, pos = read_varint(buf, pos, end)
+                if serial_type is None:
+                    break
+                serial_types.append(serial_type)
+            else:
+                found = self.decode_body(buf, serial_types, pos, end, [table])
+                if found:
+                    return found
+        return None
+
+    def parse_freed_cell(self, buf, offset, start, end, candidates):
+        """
+        Tries the headerless fallbacks at offset when the 4 bytes before it look
+        like a freeblock header (next pointer, size). Freeblocks that were merged
+        into the unallocated gap still carry that header.
+        """
+        if offset - 4 < start:
+            return None
+        next_block, size = struct.unpack_from('>HH', buf, offset - 4)
+        if size < 8 or next_block >= self.usable_size or offset - 4 + size > end:
+            return None
+        block_end = offset - 4 + size
+        return (self.parse_headerless_record(buf, offset, block_end, candidates, ())
+                or self.parse_headerless_record(buf, offset, block_end, candidates, (0,)))
+
+    def decode_body(self, buf, serial_types, body_offset, end, candidates):
+        for table in candidates:
+            if not record_matches_table(serial_types, table):
+                continue
+            body_end = body_offset + sum(serial_type_size(t) for t in serial_types)
+            if body_end > end:
+                continue
+            values = []
+            pos = body_offset
+            try:
+                for serial_type in serial_types:
+                    values.append(decode_value(buf, pos, serial_type, self.encoding))
+                    pos += serial_type_size(serial_type)
+            except (ValueError, UnicodeDecodeError, struct.error):
+                continue
+            return table, values, body_end
+        return None
+
+    # --- Page Scanning ---
+    def carving_patterns(self, candidates):
+        """
+        Pre-filter regexes for carve_region(), so only plausible offsets reach the
+        Python parsers. A record starts with its header length (at least one byte
+        per column, at most nine) followed by the first column's serial type; a
+        freed cell follows a freeblock header whose fields point within the page.
+        """
+        key = tuple(id(table) for table in candidates)
+        patterns = self.patterns.get(key)
+        if patterns is None:
+            widths = [len(table["columns"]) for table in candidates] or [1]
+            max_header = 1 + 9 * max(widths)
+            first_types = set()
+            for table in candidates:
+                if table["ipk"] == 0:
+                    first_types |= _SERIAL_FIRST_BYTES["null"]
+                else:
+                    for kind in {"null"} | AFFINITY_SERIAL_TYPES[table["affinities"][0]]:
+                        first_types |= _SERIAL_FIRST_BYTES[kind]
+            record = _byte_class(range(max(2, 1 + min(widths)), min(max_header, 127) + 1)) + _byte_class(first_types)
+            if max_header > 127:
+                record += b'|[\x80-\xff][\x00-\xff]'  # Multi-byte header length
+            # Both freeblock header fields are offsets within the page: next pointer, then size (>= 8)
+            high = min(self.usable_size >> 8, 255)
+            freed = (_byte_class(range(high + 1)) + b'[\x00-\xff](?:\x00[\x08-\xff]|'
+                     + _byte_class(range(1, high + 1)) + b'[\x00-\xff])')
+            patterns = self.patterns[key] = (re.compile(record, re.DOTALL), re.compile(freed, re.DOTALL))
+        return patterns
+
+    def carve_region(self, buf, start, end, candidates, source, page_no, page_offset, region):
+        """Scans an unallocated byte range for record headers matching the schema."""
+        record_pattern, freed_pattern = self.carving_patterns(candidates)
+        # Zeroed space cannot start a record or hold a freeblock size: search only between
+        # the first and last non-zero bytes (records may still run on into the zeros)
+        raw = bytes(buf[start:end])
+        leading = len(raw) - len(raw.lstrip(b'\x00'))
+        if leading == len(raw):
+            return 0
+        search_start = max(start, start + leading - 3)
+        search_end = min(end, start + len(raw.rstrip(b'\x00')) + 2)
+
+        found = 0
+        offset = search_start
+        next_record = next_freed = start - 1
+        while offset < end - 1:
+            # Next offset that may hold a record header, or a freed cell whose header was
+            # overwritten by a freeblock header (a zero byte there can be the surviving
+            # NULL serial type of an INTEGER PRIMARY KEY)
+            if next_record < offset:
+                match = record_pattern.search(buf, offset, search_end)
+                next_record = match.start() if match else end
+            if next_freed < offset:
+                match = freed_pattern.search(buf, max(offset - 4, search_start), search_end)
+                next_freed = match.start() + 4 if match else end
+            offset = min(next_record, next_freed)
+            if offset >= end - 1:
+                break
+            record = ((offset == next_record and self.parse_record(buf, offset, end, candidates))
+                      or (offset == next_freed and self.parse_freed_cell(buf, offset, start, end, candidates)))
+            if record:
+                table, values, record_end = record
+                rowid = self.carved_rowid(buf, start, offset, record_end - offset)
+                if rowid is not None and self.is_stale_copy(table, rowid, buf, offset):
+                    self.skipped_live += 1
+                else:
+                    found += self.emit(table, values, rowid, source, page_no, offset - page_offset, region)
+                offset = record_end
+            else:
+                offset += 1
+        return found
+
+    def scan_freeblocks(self, buf, page_offset, header_offset, candidates, source, page_no):
+        found = 0
+        usable_end = page_offset + self.usable_size
+        freeblock = struct.unpack_from('>H', buf, header_offset + 1)[0]
+        visited = set()
+        while freeblock and freeblock not in visited and page_offset + freeblock + 4 <= usable_end:
+            visited.add(freeblock)
+            next_block, size = struct.unpack_from('>HH', buf, page_offset + freeblock)
+            # Carving from the freeblock header lets parse_freed_cell() handle the overwritten cell start
+            start = page_offset + freeblock
+            end = min(page_offset + freeblock + size, usable_end)
+            found += self.carve_region(buf, start, end, candidates, source, page_no, page_offset, "freeblock")
+            freeblock = next_block
+        return found
+
+    def scan_leaf_page(self, buf, page_offset, page_no, source, include_cells):
+        """
+        Scans a table leaf page: unallocated gap and freeblocks always; allocated
+        cells too when the page image is historic (freelist, older WAL frame, journal).
+        """
+        # Page 1 starts with the 100-byte database header, in the file and in WAL/journal images alike
+        header_offset = page_offset + (DB_HEADER_SIZE if page_no == 1 else 0)
+        usable_end = page_offset + self.usable_size
+        owner = self.owner_of(page_no)
+        candidates = [self.tables[owner - 1]] if owner else self.tables
+        cell_count = struct.unpack_from('>H', buf, header_offset + 3)[0]
+        content_start = struct.unpack_from('>H', buf, header_offset + 5)[0] or 65536
+        pointer_end = header_offset + 8 + 2 * cell_count
+        if pointer_end > usable_end:
+            return 0
+
+        found = 0
+        if include_cells:
+            for i in range(cell_count):
+                cell = page_offset + struct.unpack_from('>H', buf, header_offset + 8 + 2 * i)[0]
+                if not pointer_end <= cell < usable_end:
+                    continue
+                payload_size, pos = read_varint(buf, cell, usable_end)
+                rowid, pos = read_varint(buf, pos, usable_end)
+                if payload_size is None or rowid is None or pos + payload_size > usable_end:
+                    continue  # Overflowing payloads are not reconstructed from historic pages
+                # Most WAL frames repeat cells that earlier frames already held
+                cell_key = (owner, rowid, hash(bytes(buf[pos:pos + payload_size])))
+                if cell_key in self.seen_cells:
+                    continue
+                self.seen_cells.add(cell_key)
+                record = self.parse_record(buf, pos, pos + payload_size, candidates)
+                if record and not self.is_live(record[0], rowid, record[1]):
+                    found += self.emit(record[0], record[1], rowid, source, page_no, cell - page_offset, "cell")
+
+        found += self.carve_region(buf, pointer_end, min(page_offset + content_start, usable_end),
+                                   candidates, source, page_no, page_offset, "unallocated")
+        found += self.scan_freeblocks(buf, page_offset, header_offset, candidates, source, page_no)
+        return found
+
+    # --- File Scanners ---
+    def scan_database(self):
+        """Scans freelist pages and the free space of every live table leaf page of the main file."""
+        freelist = self.map_freelist()
+        found = 0
+        for page_no in range(1, self.db_page_count + 1):
+            if page_no % PAGE_CHECK_INTERVAL == 0:
+                check_cancelled()
+                report_progress(f"Scanned {page_no} of {self.db_page_count} pages, {found} records recovered")
+            page_offset = (page_no - 1) * self.page_size
+            header_offset = page_offset + (DB_HEADER_SIZE if page_no == 1 else 0)
+            if freelist[page_no] == 1 and self.db[header_offset] == PAGE_TYPE_TABLE_LEAF:
+                # Freed leaf pages keep their cells unless secure_delete zeroed them
+                found += self.scan_leaf_page(self.db, page_offset, page_no, "db:freelist", True)
+            elif freelist[page_no]:
+                start = page_offset
+                if freelist[page_no] == 2:
+                    leaf_count = min(struct.unpack_from('>I', self.db, page_offset + 4)[0], (self.usable_size - 8) // 4)
+                    start += 8 + 4 * leaf_count
+                found += self.carve_region(self.db, start, page_offset + self.usable_size,
+                                           self.tables, "db:freelist", page_no, page_offset, "freelist")
+            elif self.db[header_offset] == PAGE_TYPE_TABLE_LEAF:
+                found += self.scan_leaf_page(self.db, page_offset, page_no, "db", False)
+        return found
+
+    def scan_wal(self):
+        """Every WAL frame is a full page image; superseded frames hold pre-deletion versions."""
+        if self.wal is None or len(self.wal) < WAL_HEADER_SIZE:
+            return 0
+        magic, _, page_size = struct.unpack_from('>III', self.wal, 0)
+        if magic not in WAL_MAGIC or page_size != self.page_size:
+            return 0
+        found = 0
+        frame = 0
+        offset = WAL_HEADER_SIZE
+        uncommitted = 0
+        while offset + WAL_FRAME_HEADER_SIZE + page_size <= len(self.wal):
+            frame += 1
+            if frame % PAGE_CHECK_INTERVAL == 0:
+                check_cancelled()
+            page_no = struct.unpack_from('>I', self.wal, offset)[0]
+            page_offset = offset + WAL_FRAME_HEADER_SIZE
+            header_offset = page_offset + (DB_HEADER_SIZE if page_no == 1 else 0)
+            # Frames past the last valid commit never became part of the database
+            source = f"wal:frame{frame}" if offset < self.wal_committed_end else f"wal:frame{frame}:uncommitted"
+            uncommitted += offset >= self.wal_committed_end
+            if self.wal[header_offset] == PAGE_TYPE_TABLE_LEAF:
+                historic = self.wal_latest.get(page_no) != page_offset
+                found += self.scan_leaf_page(self.wal, page_offset, page_no, source, historic)
+            offset = page_offset + page_size
+        if uncommitted:
+            print(f"|-- WAL: {uncommitted} of {frame} frames are past the last valid commit (uncommitted or torn); "
+                  f"their records are labelled ':uncommitted'")
+        return found
+
+    def scan_journal(self):
+        """A rollback journal holds the original content of the pages a transaction changed."""
+        if self.journal is None or len(self.journal) < 28:
+            return 0
+        sector_size, page_size = struct.unpack_from('>II', self.journal, 20)
+        if self.journal[:8] != JOURNAL_MAGIC or page_size != self.page_size:
+            # Zeroed header (journal_mode=PERSIST after commit): assume the database geometry
+            sector_size, page_size = JOURNAL_DEFAULT_SECTOR, self.page_size
+        found = 0
+        offset = sector_size or JOURNAL_DEFAULT_SECTOR
+        while offset + 4 + page_size <= len(self.journal):
+            page_no = struct.unpack_from('>I', self.journal, offset)[0]
+            page_offset = offset + 4
+            header_offset = page_offset + (DB_HEADER_SIZE if page_no == 1 else 0)
+            if page_no and self.journal[header_offset] == PAGE_TYPE_TABLE_LEAF:
+                found += self.scan_leaf_page(self.journal, page_offset, page_no, "journal", True)
+            offset = page_offset + page_size + 4  # Page record: number, image, checksum
+        return found
+
+
+# --- Main Recovery Function ---
+def recover_deleted_records(db_path, output_dir):
+    """
+    Recovers deleted records from a SQLite database (freelist pages, unallocated
+    space, freeblocks) and from its -wal / -journal companions, writing one
+    CSV per table into output_dir.
+    """
+    print(f"\n[+] Starting Deleted Record Recovery on: {db_path}")
+
+    if not os.path.exists(db_path):
+        print(f"ERROR: Database file not found at {db_path}")
+        return f"ERROR: Database file not found at {db_path}"
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    try:
+        engine = SQLiteRecoveryEngine(db_path, output_dir)
+    except (sqlite3.Error, ValueError, OSError, struct.error) as e:
+        print(f"DATABASE ERROR: Cannot open database for recovery: {e}")
+        return f"DATABASE ERROR: Cannot open database for recovery: {e}"
+
+    try:
+        print(f"Schema: {len(engine.tables)} tables ({', '.join(t['name'] for t in engine.tables)})")
+
+        with stage("scan database pages"):
+            found = engine.scan_database()
+            add_throughput(bytes_read=len(engine.db), items=found)
+        print(f"|-- Database pages: {found} records recovered")
+
+        for suffix, mapped, scanner in (("-wal", engine.wal, engine.scan_wal), ("-journal", engine.journal, engine.scan_journal)):
+            if mapped is not None:
+                with stage(f"scan {suffix[1:]}"):
+                    companion_found = scanner()
+                    add_throughput(bytes_read=len(mapped), items=companion_found)
+                print(f"|-- {os.path.basename(db_path + suffix)}: {companion_found} records recovered")
+                found += companion_found
+
+        engine.flush_artifacts()
+        record_outputs([f.name for f, _ in engine.writers.values()])
+        if engine.skipped_live or engine.skipped_duplicates:
+            print(f"|-- Skipped {engine.skipped_live} carved copies of live rows and "
+                  f"{engine.skipped_duplicates} further copies of records already recovered")
+        print("\n--- RECOVERED RECORDS PER TABLE ---")
+        for table, count in sorted(engine.counts.items()):
+            print(f"{table:<24}: {count}")
+        print(f"Results saved to: {output_dir}")
+
+        return f"SQLite recovery complete. {found} deleted records recovered from {os.path.basename(db_path)}."
+
+    except Exception as e:
+        print(f"An error occurred during SQLite recovery: {e}")
+        return f"SQLite recovery failed: {e}"
+    finally:
+        engine.close()
+
+
+# --- Example Execution ---
+if __name__ == '__main__':
+    from android_analysis import MOCK_ANDROID_DB, setup_mock_android_db
+
+    TARGET_DB = sys.argv[1] if len(sys.argv) > 1 else MOCK_ANDROID_DB
+
+    if TARGET_DB == MOCK_ANDROID_DB and not os.path.exists(MOCK_ANDROID_DB):
+        setup_mock_android_db()
+        # Delete a row without secure_delete so its cell survives in the page's free space
+        conn = sqlite3.connect(MOCK_ANDROID_DB)
+        conn.execute("PRAGMA secure_delete = OFF")
+        conn.execute("DELETE FROM messages WHERE status = 'DELETED'")
+        conn.commit()
+        conn.close()
+
+    recover_deleted_records(TARGET_DB, "recovered_records_output")
@@ -0,0 +1,265 @@
+import os
+import heapq
+import itertools
+import threading
+
+# --- Configuration & Constants ---
+CPU_SLOTS = os.cpu_count() or 1
+
+DEFAULT_PRIORITY = 10   # Lower numbers run first
+DISK_SLOTS = 1          # Concurrent jobs allowed per "disk:" resource (one reader per physical image)
+
+# Job states
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+_context = threading.local()
+
+
+class TaskCancelled(BaseException):
+    """
+    Raised inside a job when cancellation was requested. Derives from BaseException
+    (like KeyboardInterrupt) so the broad 'except Exception' handlers in the
+    analysis functions do not swallow it.
+    """
+
+
+# --- Cooperative Job Context (used by the analysis modules) ---
+def current_job():
+    """Returns the Job running on this thread, or None outside the scheduler."""
+    return getattr(_context, 'job', None)
+
+
+def check_cancelled():
+    """Cancellation point for long loops: raises TaskCancelled if the current job was cancelled."""
+    job = getattr(_context, 'job', None)
+    if job is not None and job.cancel_event.is_set():
+        raise TaskCancelled(f"Task {job.name} cancelled.")
+
+
+def report_progress(message):
+    """Forwards a progress message to the current job's listener (no-op outside the scheduler)."""
+    job = getattr(_context, 'job', None)
+    if job is not None and job.on_progress is not None:
+        job.on_progress(job, message)
+
+
+def disk_resource(path):
+    """Resource key that serialises disk-bound jobs reading the same image or device."""
+    return f"disk:{os.path.realpath(path)}"
+
+
+class Job:
+    """A unit of work: a function call plus its scheduling constraints."""
+
+    def __init__(self, job_id, name, func, args, kwargs, priority, resources, depends_on, on_finished, on_progress):
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.resources = resources
+        self.depends_on = depends_on
+        self.on_finished = on_finished
+        self.on_progress = on_progress
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.metrics = []  # Stage metrics appended by instrumentation.stage() while the job runs
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        """Executes the job function with this job bound as the thread's current job."""
+        _context.job = self
+        try:
+            check_cancelled()
+            return self.func(*self.args, **self.kwargs)
+        finally:
+            _context.job = None
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.name} {self.state}>"
+
+
+def thread_runner(job, done):
+    """Default runner: one plain thread per job (used headless; the GUI supplies a QThread runner)."""
+    def target():
+        try:
+            result = job.run()
+        except BaseException as e:
+            done(job, None, e)
+        else:
+            done(job, result, None)
+
+    threading.Thread(target=target, name=f"JOB-{job.name.upper()}", daemon=True).start()
+
+
+# --- Scheduler ---
+class TaskScheduler:
+    """
+    Priority queue of jobs with per-resource concurrency limits, dependency chains
+    and cooperative cancellation.
+
+    Resources are named slots: "cpu" (defaults to the core count) and
+    "disk:<path>" keys (one at a time per image). A job starts once all jobs it
+    depends on are DONE and all of its resources have a free slot. If a
+    dependency fails or is cancelled, its dependents are cancelled too.
+
+    runner(job, done) starts a job and must eventually call done(job, result, error).
+    """
+
+    def __init__(self, limits=None, runner=None):
+        self.limits = {"cpu": CPU_SLOTS}
+        self.limits.update(limits or {})
+        self.runner = runner or thread_runner
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.queue = []
+        self.jobs = {}
+        self.in_use = {}
+        self.ids = itertools.count(1)
+
+    def limit_for(self, resource):
+        if resource in self.limits:
+            return self.limits[resource]
+        return DISK_SLOTS if resource.startswith("disk:") else 1
+
+    # --- Submission ---
+    def submit(self, func, *args, name=None, priority=DEFAULT_PRIORITY, resources=("cpu",),
+               depends_on=(), on_finished=None, on_progress=None, **kwargs):
+        """Queues func(*args, **kwargs). depends_on takes Job objects or ids. Returns the Job."""
+        if isinstance(resources, dict):
+            resources = dict(resources)
+        else:
+            resources = {resource: 1 for resource in resources}
+
+        with self.lock:
+            job = Job(next(self.ids), name or func.__name__, func, args, kwargs, priority, resources,
+                      [dep.id if isinstance(dep, Job) else dep for dep in depends_on], on_finished, on_progress)
+            self.jobs[job.id] = job
+            heapq.heappush(self.queue, (job.priority, job.id, job))
+
+        # A dependency may already have failed before this job was queued
+        failed = [self.jobs[dep] for dep in job.depends_on if dep in self.jobs and self.jobs[dep].state in (FAILED, CANCELLED)]
+        if failed:
+            self.cancel(job.id, reason=f"dependency {failed[0].name} {failed[0].state.lower()}")
+        else:
+            self.dispatch()
+        return job
+
+    # --- Dispatching ---
+    def dispatch(self):
+        """Starts every queued job whose dependencies are done and whose resources are free."""
+        to_start = []
+        with self.lock:
+            waiting = []
+            while self.queue:
+                entry = heapq.heappop(self.queue)
+                job = entry[2]
+                if job.state != PENDING:
+                    continue
+                if self.ready(job) and self.acquire(job.resources):
+                    job.state = RUNNING
+                    to_start.append(job)
+                else:
+                    waiting.append(entry)
+            for entry in waiting:
+                heapq.heappush(self.queue, entry)
+
+        for job in to_start:
+            self.runner(job, self.job_done)
+
+    def ready(self, job):
+        return all(self.jobs[dep].state == DONE for dep in job.depends_on if dep in self.jobs)
+
+    def acquire(self, resources):
+        for resource, amount in resources.items():
+            used = self.in_use.get(resource, 0)
+            # An oversized request may still run alone rather than wait forever
+            if used and used + amount > self.limit_for(resource):
+                return False
+        for resource, amount in resources.items():
+            self.in_use[resource] = self.in_use.get(resource, 0) + amount
+        return True
+
+    def release(self, resources):
+        for resource, amount in resources.items():
+            self.in_use[resource] = self.in_use.get(resource, 0) - amount
+
+    def job_done(self, job, result, error):
+        """Called by the runner when a job's function has returned or raised."""
+        with self.lock:
+            self.release(job.resources)
+            job.result = result
+            job.error = error
+            if isinstance(error, TaskCancelled):
+                job.state = CANCELLED
+            elif error is not None:
+                job.state = FAILED
+            else:
+                job.state = DONE
+            dependents = [] if job.state == DONE else self.dependents_of(job.id)
+            self.changed.notify_all()
+
+        self.notify_finished(job)
+        for dependent in dependents:
+            self.cancel(dependent.id, reason=f"dependency {job.name} {job.state.lower()}")
+        self.dispatch()
+
+    def notify_finished(self, job):
+        # A failing listener must not leave the job's dependents and waiters hanging
+        if job.on_finished is None:
+            return
+        try:
+            job.on_finished(job)
+        except Exception as e:
+            print(f"[Scheduler] on_finished listener for {job.name} failed: {e}")
+
+    def dependents_of(self, job_id):
+        return [job for job in self.jobs.values() if job_id in job.depends_on and job.state == PENDING]
+
+    # --- Cancellation ---
+    def cancel(self, job_id, reason="cancelled by user"):
+        """Cancels a queued job immediately, or asks a running job to stop at its next cancellation point."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.cancel_event.set()
+            if job.state == RUNNING:
+                return True
+            job.state = CANCELLED
+            job.error = TaskCancelled(reason)
+            dependents = self.dependents_of(job_id)
+            self.changed.notify_all()
+
+        self.notify_finished(job)
+        for dependent in dependents:
+            self.cancel(dependent.id, reason=f"dependency {job.name} cancelled")
+        return True
+
+    def cancel_all(self):
+        with self.lock:
+            job_ids = [job.id for job in self.jobs.values() if job.state not in FINISHED_STATES]
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    # --- Introspection ---
+    def snapshot(self):
+        """Returns all known jobs ordered by id (for status displays)."""
+        with self.lock:
+            return sorted(self.jobs.values(), key=lambda job: job.id)
+
+    def active_count(self):
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job.state not in FINISHED_STATES)
+
+    def wait(self, timeout=None):
+        """Blocks until no job is pending or running (headless use). Returns True when idle."""
+        with self.changed:
+            return self.changed.wait_for(lambda: self.active_count() == 0, timeout)
@@ -0,0 +1,359 @@
+import os
+import csv
+import heapq
+import shutil
+import sqlite3
+import tempfile
+from operator import itemgetter
+
+from case_store import CaseStore, normalise_timestamp
+from task_scheduler import check_cancelled, report_progress
+from instrumentation import stage, add_throughput
+
+# --- Configuration & Constants ---
+TIMELINE_DIRECTORY = "timeline_output"
+TIMELINE_DB_NAME = "timeline.db"
+MEMORY_BUDGET_EVENTS = 500000  # Events held in memory before a sorted run is spilled to disk
+MERGE_FAN_IN = 64              # Spilled runs merged per pass (bounds the number of open files)
+PAGE_SIZE = 1000               # Events per page in timeline.db (the viewer's scroll unit)
+CSV_PAGE_ROWS = 100000         # Rows per timeline_NNNNN.csv file
+INSERT_BATCH_SIZE = 5000
+CHECK_INTERVAL = 10000         # Events between cancellation checks / progress reports
+
+# Every event is a tuple of strings in this order; sorting the tuple sorts by time first
+EVENT_COLUMNS = ["timestamp_utc", "source", "event_type", "description", "detail"]
+
+# mactime-style flags: one event per distinct time, e.g. "m.c." when mtime == ctime
+MACB_FIELDS = (("mtime", "m"), ("atime", "a"), ("ctime", "c"), ("crtime", "b"))
+
+TIMELINE_SCHEMA = """
+CREATE TABLE events (
+    id INTEGER PRIMARY KEY,  -- Position in time order
+    ts TEXT NOT NULL,
+    source TEXT,
+    event_type TEXT,
+    description TEXT,
+    detail TEXT
+);
+CREATE TABLE pages (
+    page INTEGER PRIMARY KEY,
+    first_id INTEGER,
+    last_id INTEGER,
+    first_ts TEXT,
+    last_ts TEXT
+);
+"""
+
+
+def describe_shimcache(row):
+    return "Registry", "Shimcache entry modified", str(row.get("path", "")), ""
+
+
+def describe_android_message(row):
+    return ("Android", "Message", f"{row.get('sender')} -> {row.get('recipient')}: {row.get('content')}",
+            f"status {row.get('status')}")
+
+
+def describe_protocol_artifact(row):
+    return ("Network", str(row.get("protocol")), f"{row.get('src')}:{row.get('sport')} -> {row.get('dst')}:{row.get('dport')}",
+            " ".join(str(row[key]) for key in ("domain", "detail") if row.get(key)))
+
+
+def describe_browser_history(row):
+    return (f"Browser ({row.get('browser')})", str(row.get("artifact")), str(row.get("url", "")),
+            str(row.get("title_or_target") or ""))
+
+
+def describe_memory_process(row):
+    return "Memory", "Process created", f"{row.get('ImageFileName')} (PID {row.get('PID')})", f"PPID {row.get('PPID')}"
+
+
+# Case store artifact kinds that become timeline sources: kind -> row -> (source, event_type, description, detail)
+STORE_SOURCES = {
+    "shimcache": describe_shimcache,
+    "android_message": describe_android_message,
+    "protocol_artifact": describe_protocol_artifact,
+    "browser_history": describe_browser_history,
+    "memory_process": describe_memory_process,
+}
+
+
+# --- External Merge Sort ---
+class ExternalSorter:
+    """
+    Sorts an unbounded stream of events within a fixed memory budget. Once the
+    budget is reached the buffer is sorted and spilled to a temporary CSV run;
+    sorted_events() then k-way merges the runs with a heap, in several passes
+    when there are more runs than MERGE_FAN_IN.
+    """
+
+    def __init__(self, budget=MEMORY_BUDGET_EVENTS, fan_in=MERGE_FAN_IN, temp_dir=None):
+        self.budget = budget
+        self.fan_in = fan_in
+        self.temp_dir = tempfile.mkdtemp(prefix="timeline_sort_", dir=temp_dir)
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+        self.written = 0
+
+    def add(self, event):
+        self.buffer.append(event)
+        self.count += 1
+        if len(self.buffer) >= self.budget:
+            self.spill()
+
+    def spill(self):
+        self.buffer.sort()
+        self.runs.append(self.write_run(self.buffer))
+        self.buffer = []
+
+    def write_run(self, events):
+        path = os.path.join(self.temp_dir, f"run_{self.written:06d}.csv")
+        self.written += 1
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(events)
+        return path
+
+    @staticmethod
+    def read_run(path):
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                yield tuple(row)
+
+    def sorted_events(self):
+        """Yields every added event in order. Call once, after the last add()."""
+        if not self.runs:
+            self.buffer.sort()
+            yield from self.buffer
+            self.buffer = []
+            return
+
+        if self.buffer:
+            self.spill()
+        while len(self.runs) > self.fan_in:
+            check_cancelled()
+            report_progress(f"Merging {len(self.runs)} sorted runs...")
+            groups = [self.runs[i:i + self.fan_in] for i in range(0, len(self.runs), self.fan_in)]
+            self.runs = []
+            for group in groups:
+                self.runs.append(self.write_run(heapq.merge(*[self.read_run(path) for path in group])))
+                for path in group:
+                    os.remove(path)
+        yield from heapq.merge(*[self.read_run(path) for path in self.runs])
+
+    def close(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+# --- Event Sources ---
+def fs_events(entry):
+    """MACB events for one file system entry (dict with path, inode, size and epoch times)."""
+    times = {}
+    for field, flag in MACB_FIELDS:
+        value = entry.get(field)
+        if value:  # 0 means the file system does not record this time
+            times.setdefault(value, []).append(flag)
+    detail = f"inode {entry.get('inode')}, {entry.get('size')} bytes"
+    for value, flags in times.items():
+        ts = normalise_timestamp(value)
+        if ts is not None:
+            macb = "".join(flag if flag in flags else "." for _, flag in MACB_FIELDS)
+            yield ts, "File System", macb, str(entry.get("path", "")), detail
+
+
+def walk_image(image_path):
+    """Opens the image's file system (errors surface here) and returns its entry stream."""
+    import pytsk3
+
+    img = pytsk3.Img_Info(image_path)
+    return walk_file_system(pytsk3.FS_Info(img, offset=0))
+
+
+def walk_file_system(fs):
+    """Streams file system entries (iterative walk, no per-entry output)."""
+    import pytsk3
+
+    stack = [(fs.open_dir(path="/"), "")]
+    while stack:
+        directory, parent_path = stack.pop()
+        for entry in directory:
+            check_cancelled()
+            name = entry.info.name.name
+            if name in [b".", b".."] or not entry.info.meta:
+                continue
+            try:
+                file_name = name.decode('utf-8')
+            except UnicodeDecodeError:
+                file_name = name.decode('latin-1')
+            meta = entry.info.meta
+            path = f"{parent_path}/{file_name}"
+            yield {"path": path, "inode": meta.addr, "size": meta.size, "mtime": meta.mtime,
+                   "atime": meta.atime, "ctime": meta.ctime, "crtime": meta.crtime}
+            if meta.type == pytsk3.TSK_FS_META_TYPE_DIR:
+                try:
+                    stack.append((fs.open_dir(inode=meta.addr), path))
+                except Exception as e:
+                    print(f"|-- ERROR: Cannot open subdirectory {path}: {e}")
+
+
+def store_events(store, kind, describe):
+    """One case store artifact kind as a time-ordered event stream (the store indexes kind, ts)."""
+    for _, ts, row in store.iter_artifacts(kind=kind):
+        if ts is not None:
+            yield (ts,) + tuple(describe(row))
+
+
+# --- Output ---
+def write_timeline(events, output_dir):
+    """Writes the ordered events to timeline.db (with time-range pages) and paged CSV files."""
+    db_path = os.path.join(output_dir, TIMELINE_DB_NAME)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    for name in os.listdir(output_dir):
+        if name.startswith("timeline_") and name.endswith(".csv"):
+            os.remove(os.path.join(output_dir, name))
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(TIMELINE_SCHEMA)
+
+    total, batch, pages = 0, [], []
+    page_start = last_ts = None
+    csv_file = writer = None
+    try:
+        for event in events:
+            total += 1
+            if total % CHECK_INTERVAL == 0:
+                check_cancelled()
+                add_throughput(items=CHECK_INTERVAL)
+            if (total - 1) % CSV_PAGE_ROWS == 0:
+                if csv_file is not None:
+                    csv_file.close()
+                csv_file = open(os.path.join(output_dir, f"timeline_{(total - 1) // CSV_PAGE_ROWS + 1:05d}.csv"), 'w', newline='', encoding='utf-8')
+                writer = csv.writer(csv_file)
+                writer.writerow(EVENT_COLUMNS)
+            writer.writerow(event)
+
+            if (total - 1) % PAGE_SIZE == 0:
+                page_start = event[0]
+            last_ts = event[0]
+            if total % PAGE_SIZE == 0:
+                pages.append(((total - 1) // PAGE_SIZE, total - PAGE_SIZE + 1, total, page_start, event[0]))
+            batch.append((total,) + tuple(event))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", batch)
+        if total % PAGE_SIZE:
+            pages.append((total // PAGE_SIZE, total - total % PAGE_SIZE + 1, total, page_start, last_ts))
+        conn.executemany("INSERT INTO pages VALUES (?, ?, ?, ?, ?)", pages)
+        # Indexes are built once after the bulk load; rows already arrive in time order
+        conn.execute("CREATE INDEX idx_events_ts ON events (ts)")
+        conn.execute("CREATE INDEX idx_events_source ON events (source, ts)")
+        conn.commit()
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+        conn.close()
+    return db_path, total, len(pages)
+
+
+# --- Viewer Queries ---
+def read_timeline_page(db_path, page):
+    """Events of one page (PAGE_SIZE rows) as tuples in EVENT_COLUMNS order."""
+    conn = sqlite3.connect(db_path)
+    try:
+        bounds = conn.execute("SELECT first_id, last_id FROM pages WHERE page = ?", (page,)).fetchone()
+        if bounds is None:
+            return []
+        return conn.execute("SELECT ts, source, event_type, description, detail FROM events WHERE id BETWEEN ? AND ? ORDER BY id",
+                            bounds).fetchall()
+    finally:
+        conn.close()
+
+
+def page_for_time(db_path, timestamp):
+    """Page holding the first event at or after timestamp ('YYYY-MM-DD HH:MM:SS'), or None past the end."""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT page FROM pages WHERE last_ts >= ? ORDER BY page LIMIT 1", (timestamp,)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+# --- Super Timeline Function ---
+def generate_super_timeline(image_path=None, output_dir=TIMELINE_DIRECTORY, case_store_path=None, memory_budget=MEMORY_BUDGET_EVENTS):
+    """
+    Builds a super timeline from the image's file system MACB times plus the
+    timestamped artifacts of an open case store (registry, Android messages,
+    network flows, browser history, memory). Without an image, file system
+    events come from the case store's recorded file listings.
+    """
+    print(f"\n[+] Starting Super Timeline Generation (output: {output_dir})")
+    os.makedirs(output_dir, exist_ok=True)
+
+    store = CaseStore(case_store_path, reader=True) if case_store_path else None
+    sorter = ExternalSorter(memory_budget, temp_dir=output_dir)
+    try:
+        # --- 1. File system events (unordered: sorted externally) ---
+        fs_entries = []
+        if image_path:
+            print(f"|-- Walking file system of {image_path}")
+            try:
+                fs_entries = walk_image(image_path)
+            except ImportError:
+                print("|-- WARNING: pytsk3 is not installed; file system events are skipped.")
+            except IOError as e:
+                print(f"|-- WARNING: No file system readable at offset 0 ({e}); file system events are skipped.")
+        elif store is not None:
+            print("|-- Using file system listings recorded in the case store")
+            fs_entries = (row for _, _, row in store.iter_artifacts(kind="fs_entry"))
+
+        with stage("timeline file system collection"):
+            for entry in fs_entries:
+                for event in fs_events(entry):
+                    sorter.add(event)
+                    if sorter.count % CHECK_INTERVAL == 0:
+                        check_cancelled()
+                        report_progress(f"{sorter.count} file system events collected")
+        print(f"|-- File System: {sorter.count} events ({len(sorter.runs)} runs spilled to disk)")
+
+        # --- 2. Per-source sorted streams, k-way merged on time ---
+        streams = [sorter.sorted_events()]
+        if store is not None:
+            counts = store.artifact_counts()
+            for kind, describe in STORE_SOURCES.items():
+                if counts.get(kind):
+                    print(f"|-- {kind}: {counts[kind]} artifacts")
+                    streams.append(store_events(store, kind, describe))
+
+        with stage("timeline merge and write"):
+            db_path, total, page_count = write_timeline(heapq.merge(*streams, key=itemgetter(0)), output_dir)
+            add_throughput(items=total % CHECK_INTERVAL)
+    finally:
+        sorter.close()
+        if store is not None:
+            store.close()
+
+    summary = f"Super timeline complete. {total} events in {page_count} pages written to {db_path}."
+    print(f"\n[+] {summary}")
+    return summary
+
+
+if __name__ == '__main__':
+    # Demo: orders a synthetic, shuffled event stream with a tiny memory budget to exercise the spill/merge path
+    import random
+
+    demo_dir = "timeline_demo"
+    os.makedirs(demo_dir, exist_ok=True)
+    sorter = ExternalSorter(budget=1000, fan_in=4, temp_dir=demo_dir)
+    for i in random.sample(range(50000), 50000):
+        for event in fs_events({"path": f"/demo/file_{i}", "inode": i, "size": i * 10, "mtime": 1600000000 + i * 60}):
+            sorter.add(event)
+    print(f"{sorter.count} events, {len(sorter.runs)} runs spilled")
+    print(write_timeline(sorter.sorted_events(), demo_dir))
+    sorter.close()
+    print(read_timeline_page(os.path.join(demo_dir, TIMELINE_DB_NAME), page_for_time(os.path.join(demo_dir, TIMELINE_DB_NAME), "2020-10-01 00:00:00"))[:3])